@@ -0,0 +1,106 @@
+"""
+VELA SYSTEM - Benchmark Data Generator
+
+Builds a deterministic synthetic dataset: the same options and seed always give the same users,
+categories and transactions (dates are relative to the given day). seed_database inserts it
+in bulk and then brings the stored balance state, day capacity and category rollups up to date,
+so the database looks as if every transaction had gone through the API.
+"""
+
+import random
+from datetime import timedelta
+
+from flask import current_app
+from models import db, Category, Transaction, TransactionType, User
+import utils
+
+# The default categories created for every new user; income is drawn from the first three
+INCOME_CATEGORIES = ["Salary", "Freelance", "Investment"]
+EXPENSE_CATEGORIES = ["Food", "Housing", "Transportation", "Entertainment", "Other"]
+
+PASSWORD = "benchmark"
+
+
+def parse_mix(value):
+    """Parse a single:recurring:continuous mix such as 70:15:15 into fractions summing to 1."""
+    try:
+        weights = [float(part) for part in value.split(":")]
+    except ValueError:
+        raise ValueError(f"Invalid mix '{value}', use single:recurring:continuous, e.g. 70:15:15")
+    if len(weights) != 3 or min(weights) < 0 or sum(weights) <= 0:
+        raise ValueError(f"Invalid mix '{value}', use single:recurring:continuous, e.g. 70:15:15")
+    return tuple(weight / sum(weights) for weight in weights)
+
+
+def generate_transactions(count, mix, spread_days, today, seed):
+    """Transaction field dicts starting within the spread_days days up to today.
+
+    category is a category name (or None for an uncategorized transaction). Single transactions
+    are 30% income; recurring ones are income and continuous ones are expenses, as the API requires.
+    """
+    rng = random.Random(seed)
+    single_share, recurring_share, _ = mix
+    transactions = []
+    for _ in range(count):
+        start_date = today - timedelta(days=rng.randint(0, spread_days))
+        amount = round(rng.uniform(1, 2000), 2)
+        kind = rng.random()
+
+        if kind < single_share:
+            is_income = rng.random() < 0.3
+            transaction = dict(transaction_type=TransactionType.INCOME if is_income else TransactionType.EXPENSE,
+                               is_recurring=False, cycle_days=None, duration_days=None, end_date=None)
+        elif kind < single_share + recurring_share:
+            is_income = True
+            transaction = dict(transaction_type=TransactionType.INCOME, is_recurring=True,
+                               cycle_days=rng.choice([7, 14, 30]), duration_days=None, end_date=None)
+        else:
+            is_income = False
+            duration_days = rng.randint(1, 90)
+            transaction = dict(transaction_type=TransactionType.EXPENSE, is_recurring=False, cycle_days=None,
+                               duration_days=duration_days, end_date=start_date + timedelta(days=duration_days))
+
+        names = INCOME_CATEGORIES if is_income else EXPENSE_CATEGORIES
+        transaction.update(amount=amount, start_date=start_date,
+                           category=rng.choice(names) if rng.random() < 0.95 else None)
+        transactions.append(transaction)
+    return transactions
+
+
+def seed_database(users, transactions_per_user, mix, spread_days, today, seed=42):
+    """Insert the dataset into the app's database; returns the ids of the users created.
+
+    Usernames are bench_<n>, all with the password PASSWORD.
+    """
+    password_hash = utils.hash_password(PASSWORD, current_app.config['PASSWORD_HASH_ITERATIONS'])
+    horizon = today + timedelta(days=current_app.config['CAPACITY_HORIZON_DAYS'])
+    user_ids = []
+
+    for index in range(users):
+        user = User(username=f"bench_{index}", password_hash=password_hash, initial_balance=1000.0)
+        db.session.add(user)
+        db.session.flush()
+        user_ids.append(user.id)
+
+        category_ids = {}
+        for name in INCOME_CATEGORIES + EXPENSE_CATEGORIES:
+            category = Category(user_id=user.id, name=name)
+            db.session.add(category)
+            db.session.flush()
+            category_ids[name] = category.id
+
+        transactions = generate_transactions(transactions_per_user, mix, spread_days, today, seed=f"{seed}-{index}")
+        db.session.execute(db.insert(Transaction), [
+            dict({key: value for key, value in t.items() if key != "category"},
+                 user_id=user.id, category_id=category_ids.get(t["category"]))
+            for t in transactions
+        ])
+
+        # Derived state, as the API would have maintained it
+        user.single_balance = utils.calculate_balances(user, today)["single_balance"]
+        user.refresh_scheduled_balance(today)
+        utils.extend_day_capacity(user, horizon, rebuild=True)
+        utils.rebuild_category_rollup(user)
+        db.session.commit()
+
+    return user_ids
@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+"""
+VELA SYSTEM - Load Test
+
+Starts the production server (src/serve.py) on a temporary SQLite file seeded by datagen.py, or
+targets a running server with --url, and drives it with concurrent virtual users. Each virtual
+user is a thread with its own keep-alive connection that logs in and runs scripted journeys
+mirroring the calls of the web client (templete/js/api.js): dashboard reads, browsing and
+recording transactions, reports, managing categories and registering new accounts.
+
+Reports throughput, p50/p95/p99 latency and error rates per endpoint, counting "database is
+locked" failures separately (from the response body, and for a local server from the tracebacks in
+its log), writes the results as JSON and exits with status 1 if the error rate exceeds
+--max-error-rate. Runs fully offline.
+
+Usage:
+    python benchmarks/load.py                                    # 8 virtual users for 30 s
+    python benchmarks/load.py --concurrency 32 --duration 60 --workers 2 --threads 16
+    python benchmarks/load.py --url http://127.0.0.1:5000 --concurrency 8
+"""
+
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+
+import datagen  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, "load_results.json")
+
+LOCKED = "database is locked"
+
+# Relative frequency of the journeys a logged-in user runs
+JOURNEY_WEIGHTS = {
+    "dashboard": 40,
+    "browse": 20,
+    "record": 25,
+    "reports": 10,
+    "organize": 5,
+}
+
+# Share of sessions that start by registering a new account instead of logging in
+REGISTER_SHARE = 0.05
+
+
+def endpoint_label(method, path):
+    """The endpoint a request belongs to: its method and path, without the query and with ids as <id>."""
+    path = urlsplit(path).path
+    if path.startswith("/api"):
+        path = path[len("/api"):]
+    return f"{method} {re.sub(r'/[0-9]+(?=/|$)', '/<id>', path)}"
+
+
+class Stats:
+    """Latencies and failures per endpoint, shared by the virtual users."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)  # endpoint -> seconds of the successful requests
+        self.errors = defaultdict(lambda: defaultdict(int))  # endpoint -> kind -> count
+
+    def record(self, endpoint, elapsed, error=None):
+        with self.lock:
+            if error is None:
+                self.latencies[endpoint].append(elapsed)
+            else:
+                self.errors[endpoint][error] += 1
+
+    def endpoints(self):
+        return sorted(set(self.latencies) | set(self.errors))
+
+
+class RequestFailed(Exception):
+    """A request that did not return the expected status; ends the current journey."""
+
+
+class Client:
+    """One virtual user's keep-alive connection to the API, recording every request in the stats."""
+
+    def __init__(self, base_url, stats, timeout):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.stats = stats
+        self.timeout = timeout
+        self.connection = None
+        self.token = None
+
+    def request(self, method, path, body=None, query=None, expect=200):
+        """Send a request; returns the decoded JSON body, raising RequestFailed on any other status."""
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        payload = json.dumps(body).encode() if body is not None else None
+        endpoint = endpoint_label(method, path)
+
+        started = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.connection.request(method, f"/api{path}", body=payload, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.close()
+            self.stats.record(endpoint, time.perf_counter() - started, error=type(e).__name__)
+            raise RequestFailed(f"{method} {path}: {e}")
+        elapsed = time.perf_counter() - started
+
+        if response.status != expect:
+            error = "locked" if LOCKED.encode() in data else str(response.status)
+            self.stats.record(endpoint, elapsed, error=error)
+            raise RequestFailed(f"{method} {path} returned {response.status}")
+        self.stats.record(endpoint, elapsed)
+        return json.loads(data) if data else None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class VirtualUser:
+    """Runs sessions (log in, then a few journeys) until the deadline."""
+
+    def __init__(self, client, credentials, rng, today, think_time, register_prefix):
+        self.client = client
+        self.username, self.password = credentials
+        self.rng = rng
+        self.today = today
+        self.think_time = think_time
+        self.register_prefix = register_prefix
+        self.registered = 0
+        self.category_ids = []
+        self.transaction_ids = []
+
+    def run(self, deadline):
+        while time.monotonic() < deadline:
+            try:
+                self.start_session()
+                for _ in range(self.rng.randint(3, 10)):
+                    if time.monotonic() >= deadline:
+                        break
+                    journey = self.rng.choices(list(JOURNEY_WEIGHTS), weights=list(JOURNEY_WEIGHTS.values()))[0]
+                    getattr(self, f"journey_{journey}")()
+                    self.pause()
+            except RequestFailed:
+                self.pause()
+        self.client.close()
+
+    def pause(self):
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+    def day(self, days_ago=0):
+        return (self.today - timedelta(days=days_ago)).isoformat()
+
+    def start_session(self):
+        """Log in (after registering a new account, now and then) and load the categories."""
+        self.client.token = None
+        if self.rng.random() < REGISTER_SHARE:
+            self.registered += 1
+            self.username = f"{self.register_prefix}_{self.registered}"
+            self.client.request("POST", "/register", {"username": self.username, "password": self.password,
+                                                      "initial_balance": 1000}, expect=201)
+            self.transaction_ids = []
+
+        login = self.client.request("POST", "/login", {"username": self.username, "password": self.password})
+        self.client.token = login["token"]
+        categories = self.client.request("GET", "/categories")["categories"]
+        self.category_ids = [category["id"] for category in categories]
+
+    def journey_dashboard(self):
+        self.client.request("GET", "/dashboard", query={"date": self.day()})
+        self.client.request("GET", "/transactions", query={"limit": 20, "include_balances": "true"})
+
+    def journey_browse(self):
+        page = self.client.request("GET", "/transactions", query={"limit": 50, "include_balances": "true"})
+        if page["next_cursor"]:
+            self.client.request("GET", "/transactions", query={"limit": 50, "after": page["next_cursor"]})
+        if page["transactions"]:
+            transaction = self.rng.choice(page["transactions"])
+            self.client.request("GET", f"/transactions/{transaction['id']}")
+        if self.category_ids:
+            self.client.request("GET", "/transactions", query={
+                "start": self.day(90), "end": self.day(), "category_id": self.rng.choice(self.category_ids)
+            })
+
+    def journey_record(self):
+        """Add a transaction, correct it, recategorize it and sometimes delete it again."""
+        transaction = {
+            "amount": round(self.rng.uniform(1, 300), 2),
+            "transaction_type": self.rng.choice(["income", "expense", "expense"]),
+            "start_date": self.day(self.rng.randint(0, 30)),
+        }
+        if self.category_ids:
+            transaction["category_id"] = self.rng.choice(self.category_ids)
+        if self.rng.random() < 0.2:
+            transaction.update(transaction_type="expense", transaction_mode="continuous",
+                               duration_days=self.rng.randint(2, 30))
+
+        transaction_id = self.client.request("POST", "/transactions", transaction, expect=201)["transaction_id"]
+        self.transaction_ids.append(transaction_id)
+        self.client.request("PUT", f"/transactions/{transaction_id}",
+                            {"amount": round(transaction["amount"] * self.rng.uniform(0.8, 1.2), 2)})
+        if self.category_ids:
+            self.client.request("PUT", f"/transactions/{transaction_id}/category",
+                                {"category_id": self.rng.choice(self.category_ids)})
+        self.client.request("GET", "/reports/day_capacity", query={"date": self.day()})
+
+        if self.rng.random() < 0.5:
+            transaction_id = self.transaction_ids.pop(self.rng.randrange(len(self.transaction_ids)))
+            self.client.request("DELETE", f"/transactions/{transaction_id}")
+
+    def journey_reports(self):
+        month = self.today.replace(day=1)
+        self.client.request("GET", "/reports/summary", query={"start": self.day(29), "end": self.day()})
+        self.client.request("GET", "/reports/categories/daily", query={"date": self.day()})
+        self.client.request("GET", "/reports/categories/monthly", query={"year": month.year, "month": month.month})
+        self.client.request("GET", "/reports/periods", query={
+            "start": (month - timedelta(days=335)).replace(day=1).isoformat(), "end": self.day(),
+            "granularity": "month"
+        })
+
+    def journey_organize(self):
+        """Create a category, rename it and delete it (its transactions would move to Other)."""
+        name = f"Load {self.rng.randrange(10 ** 9)}"
+        category_id = self.client.request("POST", "/categories", {"name": name}, expect=201)["category_id"]
+        self.client.request("PUT", f"/categories/{category_id}", {"description": "Created by the load test"})
+        self.client.request("DELETE", f"/categories/{category_id}")
+
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    if not ordered:
+        return None
+    rank = max(1, round(fraction * len(ordered) + 0.5))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(stats, elapsed, server_locked):
+    """Per-endpoint and overall results; server_locked counts the locked failures found in the server log."""
+    def summary(latencies, errors):
+        ordered = sorted(latencies)
+        failed = sum(errors.values())
+        total = len(ordered) + failed
+        return {
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2),
+            "errors": failed,
+            "error_rate": round(failed / total, 4) if total else 0.0,
+            "locked": errors.get("locked", 0),
+            "error_kinds": dict(sorted(errors.items())),
+            **{f"p{int(q * 100)}_ms": round(percentile(ordered, q) * 1000, 2) if ordered else None
+               for q in (0.5, 0.95, 0.99)},
+        }
+
+    endpoints = {}
+    all_latencies, all_errors = [], defaultdict(int)
+    for endpoint in stats.endpoints():
+        errors = dict(stats.errors.get(endpoint, {}))
+        # A failure the client saw as a bare 500 but the server logged as a lock timeout
+        moved = min(server_locked.get(endpoint, 0), errors.get("500", 0))
+        if moved:
+            errors["500"] -= moved
+            errors["locked"] = errors.get("locked", 0) + moved
+            if not errors["500"]:
+                del errors["500"]
+        endpoints[endpoint] = summary(stats.latencies.get(endpoint, []), errors)
+        all_latencies.extend(stats.latencies.get(endpoint, []))
+        for kind, count in errors.items():
+            all_errors[kind] += count
+    return endpoints, summary(all_latencies, all_errors)
+
+
+def print_report(endpoints, overall, elapsed):
+    def row(name, result):
+        latencies = " ".join(f"{result[key]:>9.1f}" if result[key] is not None else f"{'-':>9}"
+                             for key in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"{name:<38} {result['requests']:>8} {result['throughput_rps']:>8.1f} {latencies} "
+              f"{result['error_rate']:>7.2%} {result['locked']:>7}")
+
+    print(f"\n{'Endpoint':<38} {'Requests':>8} {'Req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'Errors':>7} {'Locked':>7}")
+    for endpoint, result in endpoints.items():
+        row(endpoint, result)
+    row("Total", overall)
+    print(f"\n{overall['requests']} requests in {elapsed:.1f} s")
+    if overall["error_kinds"]:
+        print("Errors: " + ", ".join(f"{kind} x{count}" for kind, count in overall["error_kinds"].items()))
+
+
+def locked_failures(log_path):
+    """Requests that failed with "database is locked", per endpoint, from the tracebacks in a server log.
+
+    Flask logs an unhandled exception as "Exception on <path> [<method>]" followed by the traceback.
+    """
+    counts = defaultdict(int)
+    with open(log_path, errors="replace") as file:
+        blocks = re.split(r"(?=Exception on \S+ \[[A-Z]+\])", file.read())
+    for block in blocks:
+        match = re.match(r"Exception on (\S+) \[([A-Z]+)\]", block)
+        if match and LOCKED in block:
+            counts[endpoint_label(match.group(2), match.group(1))] += 1
+    return counts
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed(database_path, args, today):
+    """Create the schema and the datagen users in the database the server will use."""
+    from config import get_config
+    from models import db
+    from app import create_app
+
+    logging.disable(logging.CRITICAL)
+    config = type("LoadTestConfig", (get_config(),), {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{database_path}",
+        "SQLALCHEMY_ECHO": False,
+    })
+    app = create_app(config)
+    with app.app_context():
+        datagen.seed_database(args.users, args.transactions, datagen.parse_mix(args.mix), args.spread_days, today,
+                              seed=args.seed)
+        db.session.remove()
+        db.engine.dispose()
+    logging.disable(logging.NOTSET)
+
+
+def start_server(database_path, log_file, args):
+    """Start src/serve.py on a free port; returns the process and its base URL once it answers."""
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database_path}", FLASK_ENV="production",
+               FLASK_DEBUG="false", VELA_SHARD_COUNT="0")
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(PROJECT_ROOT, "src", "serve.py"), "--bind", f"127.0.0.1:{port}",
+         "--workers", str(args.workers), "--threads", str(args.threads)],
+        cwd=PROJECT_ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT
+    )
+
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server exited with status {process.returncode}, see {log_file.name}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/api/health")
+            if connection.getresponse().status == 200:
+                connection.close()
+                return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError("The server did not start within 60 s")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_load(base_url, args, today, run_id):
+    """Run the virtual users until the duration is over; returns the stats and the elapsed seconds."""
+    stats = Stats()
+    users = []
+    for index in range(args.concurrency):
+        rng = random.Random(f"{args.seed}-load-{index}")
+        if args.url:
+            credentials = (f"load_{run_id}_{index}", datagen.PASSWORD)
+        else:
+            credentials = (f"bench_{index % args.users}", datagen.PASSWORD)
+        users.append(VirtualUser(Client(base_url, stats, args.timeout), credentials, rng, today, args.think_time,
+                                 register_prefix=f"load_{run_id}_{index}"))
+
+    if args.url:
+        # A running server has none of the datagen users, so every virtual user starts with its own account
+        setup = Client(base_url, Stats(), args.timeout)
+        for user in users:
+            setup.request("POST", "/register", {"username": user.username, "password": user.password,
+                                                "initial_balance": 1000}, expect=201)
+        setup.close()
+
+    started = time.monotonic()
+    deadline = started + args.duration
+    threads = [threading.Thread(target=user.run, args=(deadline,), name=f"virtual-user-{index}")
+               for index, user in enumerate(users)]
+    for thread in threads:
+        # Spread the logins out over the ramp-up
+        thread.start()
+        time.sleep(args.ramp_up / len(threads))
+    for thread in threads:
+        thread.join()
+    return stats, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the VELA SYSTEM API with concurrent virtual users")
+    parser.add_argument("--url", help="Base URL of a running server (default: start one on a temporary database)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Virtual users (default: 8)")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run (default: 30)")
+    parser.add_argument("--ramp-up", type=float, default=2, help="Seconds over which the users start (default: 2)")
+    parser.add_argument("--think-time", type=float, default=0,
+                        help="Mean seconds a user pauses between journeys (default: 0)")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds before a request fails (default: 30)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes of the local server (default: one per CPU)")
+    parser.add_argument("--threads", type=int, default=8, help="Threads per worker of the local server (default: 8)")
+    parser.add_argument("--users", type=int, default=4, help="Seeded users the virtual users log in as (default: 4)")
+    parser.add_argument("--transactions", type=int, default=500, help="Seeded transactions per user (default: 500)")
+    parser.add_argument("--mix", default="70:15:15",
+                        help="Share of single:recurring:continuous seeded transactions (default: 70:15:15)")
+    parser.add_argument("--spread-days", type=int, default=365,
+                        help="Seeded transactions start within this many days before today (default: 365)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the data and journeys (default: 42)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01,
+                        help="Exit with status 1 above this share of failed requests (default: 0.01)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the results JSON")
+    args = parser.parse_args()
+
+    try:
+        datagen.parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.concurrency < 1 or args.users < 1 or args.transactions < 0 or args.duration <= 0:
+        parser.error("--concurrency and --users must be at least 1, --transactions at least 0, --duration positive")
+
+    today = date.today()
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    server_locked = {}
+    with tempfile.TemporaryDirectory() as directory:
+        if args.url:
+            stats, elapsed = run_load(args.url.rstrip("/"), args, today, run_id)
+        else:
+            database_path = os.path.join(directory, "load.db")
+            started = time.perf_counter()
+            seed(database_path, args, today)
+            print(f"Seeded {args.users} users x {args.transactions} transactions in "
+                  f"{time.perf_counter() - started:.1f} s")
+
+            log_path = os.path.join(directory, "server.log")
+            with open(log_path, "w") as log_file:
+                process, base_url = start_server(database_path, log_file, args)
+                print(f"Server on {base_url} with {args.workers} workers x {args.threads} threads; "
+                      f"{args.concurrency} virtual users for {args.duration:g} s")
+                try:
+                    stats, elapsed = run_load(base_url, args, today, run_id)
+                finally:
+                    stop_server(process)
+            server_locked = locked_failures(log_path)
+
+    endpoints, overall = summarize(stats, elapsed, server_locked)
+    print_report(endpoints, overall, elapsed)
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "target": args.url or {"workers": args.workers, "threads": args.threads, "users": args.users,
+                               "transactions_per_user": args.transactions, "mix": args.mix,
+                               "spread_days": args.spread_days},
+        "concurrency": args.concurrency,
+        "duration_s": round(elapsed, 2),
+        "think_time_s": args.think_time,
+        "seed": args.seed,
+        "overall": overall,
+        "endpoints": endpoints,
+    }
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if overall["error_rate"] > args.max_error_rate:
+        print(f"Error rate {overall['error_rate']:.2%} is above {args.max_error_rate:.2%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+VELA SYSTEM - Micro-benchmarks
+
+Seeds a temporary SQLite database with a deterministic synthetic dataset (see datagen.py), times
+the hot calculation functions and every report endpoint (through the Flask test client, with the
+report cache cleared before each request), and writes the results as JSON. Given a baseline
+(results of an earlier run, e.g. on the main branch) it compares the median times and exits with
+status 1 if any case got slower by more than the threshold.
+
+Usage:
+    python benchmarks/run.py --save-baseline                 # record benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json [--threshold 0.25]
+    python benchmarks/run.py --users 3 --transactions 5000 --mix 60:20:20 --spread-days 365 --cases report
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+
+from config import get_config  # noqa: E402
+from models import db, User  # noqa: E402
+import proration  # noqa: E402
+import utils  # noqa: E402
+import datagen  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, "results.json")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+
+def function_cases(today):
+    """(name, prepare, run) for the hot functions; prepare(user) runs untimed before run(user)."""
+    month = today.replace(day=1)
+    trend_start = today - timedelta(days=29)
+    year_start = (month - timedelta(days=335)).replace(day=1)
+
+    def stale(user):
+        user.scheduled_as_of = None
+
+    return [
+        ("calculate_day_capacity", None, lambda user: utils.calculate_day_capacity(user, today)),
+        ("read_day_capacity", None, lambda user: utils.read_day_capacity(user, today)),
+        ("calculate_day_capacity_trend[30d]", None,
+         lambda user: utils.calculate_day_capacity_trend(user, trend_start, today)),
+        ("read_day_capacity_trend[30d]", None, lambda user: utils.read_day_capacity_trend(user, trend_start, today)),
+        ("calculate_category_stats[month]", None,
+         lambda user: utils.calculate_category_stats(user, month, utils.month_end(month))),
+        ("read_monthly_category_stats", None,
+         lambda user: utils.read_monthly_category_stats(user, month, utils.month_end(month), today)),
+        ("calculate_period_stats[12 months]", None,
+         lambda user: utils.calculate_period_stats(user, year_start, utils.month_end(month), "month", today)),
+        ("User.current_total_balance", None, lambda user: user.current_total_balance),
+        ("User.long_term_balance", None, lambda user: user.long_term_balance),
+        ("User.long_term_balance[stale]", stale, lambda user: user.long_term_balance),
+        ("calculate_balances", None, lambda user: utils.calculate_balances(user, today)),
+        ("query_user_balances[all users]", None, lambda user: utils.query_user_balances()),
+    ]
+
+
+def endpoint_cases(today):
+    """(name, url) of the report endpoints."""
+    day = today.isoformat()
+    month_start = today.replace(day=1)
+    year_start = (month_start - timedelta(days=335)).replace(day=1).isoformat()
+    thirty_days_ago = (today - timedelta(days=29)).isoformat()
+    return [
+        ("GET /reports/day_capacity", f"/api/reports/day_capacity?date={day}"),
+        ("GET /reports/summary[30d]", f"/api/reports/summary?start={thirty_days_ago}&end={day}"),
+        ("GET /reports/categories/daily", f"/api/reports/categories/daily?date={day}"),
+        ("GET /reports/categories/monthly", f"/api/reports/categories/monthly?year={today.year}&month={today.month}"),
+        ("GET /reports/periods[12 months]", f"/api/reports/periods?start={year_start}&end={day}&granularity=month"),
+        ("GET /dashboard", f"/api/dashboard?date={day}"),
+        ("GET /transactions", "/api/transactions?limit=100&include_balances=true"),
+        ("GET /transactions/export", "/api/transactions/export?format=ndjson"),
+    ]
+
+
+def summarize(times):
+    return {
+        "min_ms": round(min(times) * 1000, 3),
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "mean_ms": round(statistics.fmean(times) * 1000, 3),
+    }
+
+
+def time_function(user_id, prepare, run, repeat):
+    """Time run(user) on a fresh session each time, as in a request, after one warm-up run."""
+    times = []
+    for iteration in range(repeat + 1):
+        db.session.remove()
+        user = db.session.get(User, user_id)
+        if prepare:
+            prepare(user)
+
+        started = time.perf_counter()
+        run(user)
+        elapsed = time.perf_counter() - started
+        if iteration:
+            times.append(elapsed)
+    db.session.remove()
+    return summarize(times)
+
+
+def time_endpoint(client, headers, url, repeat):
+    """Time a GET request with the report cache cleared, after one warm-up request."""
+    from routes import report_cache
+
+    times = []
+    for iteration in range(repeat + 1):
+        report_cache.clear()
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        response.get_data()  # Streamed responses are produced while they are read
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        if iteration:
+            times.append(elapsed)
+    return summarize(times)
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "numpy": proration.numpy_available(),
+        "proration_engine": get_config().PRORATION_ENGINE,
+    }
+
+
+def run_benchmarks(args, today):
+    from app import create_app
+
+    logging.disable(logging.CRITICAL)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        config = type("BenchmarkConfig", (get_config(),), {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(directory, 'benchmark.db')}",
+            "SQLALCHEMY_ECHO": False,
+        })
+        app = create_app(config)
+        with app.app_context():
+            started = time.perf_counter()
+            user_ids = datagen.seed_database(args.users, args.transactions, args.mix, args.spread_days, today,
+                                             seed=args.seed)
+            print(f"Seeded {args.users} users x {args.transactions} transactions in "
+                  f"{time.perf_counter() - started:.1f} s")
+
+            # The cases run against the first user; the others make the tables realistically shared
+            user_id = user_ids[0]
+            if "function" in args.cases:
+                for name, prepare, run in function_cases(today):
+                    results[name] = time_function(user_id, prepare, run, args.repeat)
+                    print(f"  {name:<40} {results[name]['median_ms']:>10.2f} ms")
+
+            if "report" in args.cases:
+                client = app.test_client()
+                login = client.post("/api/login", json={"username": "bench_0", "password": datagen.PASSWORD})
+                headers = {"Authorization": f"Bearer {login.get_json()['token']}"}
+                for name, url in endpoint_cases(today):
+                    results[name] = time_endpoint(client, headers, url, args.repeat)
+                    print(f"  {name:<40} {results[name]['median_ms']:>10.2f} ms")
+
+            db.session.remove()
+            db.engine.dispose()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the change of each case against the baseline; returns the names of the regressions."""
+    regressions = []
+    print(f"\n{'Case':<40} {'Baseline (ms)':>14} {'Current (ms)':>13} {'Change':>8}")
+    for name, current in results["cases"].items():
+        previous = baseline["cases"].get(name)
+        if previous is None:
+            print(f"{name:<40} {'-':>14} {current['median_ms']:>13.2f} {'new':>8}")
+            continue
+
+        change = current["median_ms"] / previous["median_ms"] - 1 if previous["median_ms"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<40} {previous['median_ms']:>14.2f} {current['median_ms']:>13.2f} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the VELA SYSTEM micro-benchmarks")
+    parser.add_argument("--users", type=int, default=3, help="Users to generate (default: 3)")
+    parser.add_argument("--transactions", type=int, default=2000, help="Transactions per user (default: 2000)")
+    parser.add_argument("--mix", default="70:15:15",
+                        help="Share of single:recurring:continuous transactions (default: 70:15:15)")
+    parser.add_argument("--spread-days", type=int, default=730,
+                        help="Transactions start within this many days before today (default: 730)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the data generator (default: 42)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case (default: 5)")
+    parser.add_argument("--cases", nargs="+", choices=["function", "report"], default=["function", "report"],
+                        help="Which cases to run (default: both)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the results JSON")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Fail if a case's median is this much slower than the baseline (default: 0.25)")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Also write the results to {DEFAULT_BASELINE}")
+    args = parser.parse_args()
+
+    try:
+        mix = datagen.parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.users < 1 or args.transactions < 1 or args.spread_days < 0 or args.repeat < 1:
+        parser.error("--users, --transactions and --repeat must be at least 1, --spread-days at least 0")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    dataset = {
+        "users": args.users,
+        "transactions_per_user": args.transactions,
+        "mix": args.mix,
+        "spread_days": args.spread_days,
+        "seed": args.seed,
+    }
+    if baseline and baseline["dataset"] != dataset:
+        parser.error(f"The baseline was recorded with another dataset: {baseline['dataset']}")
+
+    args.mix = mix
+    today = date.today()
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "dataset": dataset,
+        "repeat": args.repeat,
+        "cases": run_benchmarks(args, today),
+    }
+
+    outputs = [args.output] + ([DEFAULT_BASELINE] if args.save_baseline else [])
+    for path in outputs:
+        with open(path, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Results written to {path}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} cases are more than {args.threshold:.0%} slower than the baseline")
+            sys.exit(1)
+        print(f"\nNo case is more than {args.threshold:.0%} slower than the baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+VELA SYSTEM - Proration Benchmark
+
+Times the pure-Python and NumPy proration engines on synthetic transactions, for a single
+range (one monthly category report) and for the twelve months of a year (one period report):
+first on transactions already in memory, then end to end from a temporary SQLite database
+(the ORM column query for the Python engine, the numeric cursor load for the NumPy engine).
+
+Usage: python scripts/benchmark_proration.py [--sizes 10000 100000] [--repeat 3]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+
+from config import get_config  # noqa: E402
+from models import db, Category, Transaction, TransactionType, User  # noqa: E402
+import proration  # noqa: E402
+import utils  # noqa: E402
+
+CATEGORY_MAP = {1: "Salary", 2: "Freelance", 3: "Investment", 4: "Food", 5: "Housing",
+                6: "Transportation", 7: "Entertainment", 8: "Other"}
+
+
+def generate_transactions(count, today, seed=42):
+    """Synthetic transactions over the two years before today: 70% single, 15% recurring, 15% continuous."""
+    rng = random.Random(seed)
+    transactions = []
+    for index in range(count):
+        start_date = today - timedelta(days=rng.randint(0, 730))
+        kind = rng.random()
+        transaction = SimpleNamespace(
+            id=index + 1, category_id=rng.choice(list(CATEGORY_MAP) + [None]),
+            amount=round(rng.uniform(1, 2000), 2), transaction_type=TransactionType.EXPENSE,
+            is_recurring=False, cycle_days=None, duration_days=None, start_date=start_date
+        )
+        if kind < 0.15:
+            transaction.is_recurring = True
+            transaction.cycle_days = rng.choice([7, 14, 30])
+            transaction.transaction_type = TransactionType.INCOME
+        elif kind < 0.30:
+            transaction.duration_days = rng.randint(1, 90)
+        elif kind < 0.50:
+            transaction.transaction_type = TransactionType.INCOME
+        transactions.append(transaction)
+    return transactions
+
+
+def year_of_months(today):
+    """The twelve calendar months ending with the current one."""
+    ranges = []
+    first = today.replace(day=1)
+    for _ in range(12):
+        ranges.append((first, utils.month_end(first)))
+        first = (first - timedelta(days=1)).replace(day=1)
+    return list(reversed(ranges))
+
+
+def run_engine(engine, transactions, ranges, today):
+    """Category statistics of every range with the given engine, from the rows SQL would return."""
+    get_config().PRORATION_ENGINE = engine
+    return utils.category_stats_for_periods(transactions, CATEGORY_MAP, ranges, today)
+
+
+def seed_database(transactions):
+    """Insert a benchmark user with the transactions; returns the user."""
+    user = User(username="benchmark", password_hash="-")
+    db.session.add(user)
+    db.session.flush()
+
+    category_ids = {}
+    for category_id, name in CATEGORY_MAP.items():
+        category = Category(user_id=user.id, name=name)
+        db.session.add(category)
+        db.session.flush()
+        category_ids[category_id] = category.id
+
+    db.session.execute(db.insert(Transaction), [
+        dict(user_id=user.id, category_id=category_ids.get(t.category_id), amount=t.amount,
+             transaction_type=t.transaction_type, is_recurring=t.is_recurring, cycle_days=t.cycle_days,
+             duration_days=t.duration_days, start_date=t.start_date)
+        for t in transactions
+    ])
+    db.session.commit()
+    return user
+
+
+def best_time(function, repeat):
+    """Best wall-clock time of several runs, and the result of the last one."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def benchmark_in_memory(sizes, workloads, today, repeat):
+    print("In memory")
+    print(f"{'Transactions':>12}  {'Ranges':<10} {'In span':>8} {'Python (ms)':>12} {'NumPy (ms)':>11} "
+          f"{'Speedup':>8}")
+    for size in sizes:
+        transactions = generate_transactions(size, today)
+        for name, ranges in workloads:
+            # The reports only load the transactions starting within the requested span
+            in_span = [t for t in transactions if ranges[0][0] <= t.start_date <= ranges[-1][1]]
+            python_time, expected = best_time(lambda: run_engine("python", in_span, ranges, today), repeat)
+            numpy_time, actual = best_time(lambda: run_engine("numpy", in_span, ranges, today), repeat)
+
+            if actual != expected:
+                print(f"Engines disagree for {size} transactions, {name}")
+                sys.exit(1)
+            print(f"{size:>12}  {name:<10} {len(in_span):>8} {python_time * 1000:>12.1f} {numpy_time * 1000:>11.1f} "
+                  f"{python_time / numpy_time:>7.1f}x")
+
+
+def benchmark_database(sizes, workloads, today, repeat):
+    from app import create_app
+
+    logging.disable(logging.CRITICAL)
+    print("\nFrom SQLite (query and proration)")
+    print(f"{'Transactions':>12}  {'Ranges':<10} {'Python (ms)':>12} {'NumPy (ms)':>11} {'Speedup':>8}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            config = type("BenchmarkConfig", (get_config(),), {
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(directory, 'benchmark.db')}",
+                "SQLALCHEMY_ECHO": False,
+            })
+            app = create_app(config)
+            with app.app_context():
+                user = seed_database(generate_transactions(size, today))
+                for name, ranges in workloads:
+                    def report(engine):
+                        app.config['PRORATION_ENGINE'] = engine
+                        return utils.calculate_period_stats(user, ranges[0][0], ranges[-1][1], "month", today)
+
+                    python_time, expected = best_time(lambda: report("python"), repeat)
+                    numpy_time, actual = best_time(lambda: report("numpy"), repeat)
+
+                    if actual != expected:
+                        print(f"Engines disagree for {size} transactions, {name}")
+                        sys.exit(1)
+                    print(f"{size:>12}  {name:<10} {python_time * 1000:>12.1f} {numpy_time * 1000:>11.1f} "
+                          f"{python_time / numpy_time:>7.1f}x")
+                db.session.remove()
+                db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the category proration engines")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000],
+                        help="Transaction counts to benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    parser.add_argument("--memory-only", action="store_true", help="Skip the SQLite end-to-end benchmark")
+    args = parser.parse_args()
+
+    if not proration.numpy_available():
+        print("NumPy is not installed; only the pure-Python engine is available")
+        return
+
+    today = date.today()
+    workloads = [("1 month", [year_of_months(today)[-1]]), ("12 months", year_of_months(today))]
+
+    benchmark_in_memory(args.sizes, workloads, today, args.repeat)
+    if not args.memory_only:
+        benchmark_database(args.sizes, workloads, today, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+VELA SYSTEM - Login Burst Check
+
+Starts the production server (src/serve.py) with one worker on a temporary database, fires more
+concurrent logins than the worker has request threads, and meanwhile keeps requesting a non-auth
+route (GET /api/categories). Password hashing is bounded below the request threads, so the
+logins beyond that must be rejected with 503 while the other route keeps answering. Exits with
+status 1 if a non-auth request fails or takes longer than --max-latency seconds.
+
+Usage: python scripts/check_auth_burst.py [--threads 4] [--logins 16] [--duration 5]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+USERNAME = "burst"
+PASSWORD = "auth-burst"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def call(port, method, path, body=None, token=None, timeout=30):
+    """One request on its own connection (an idle keep-alive connection would hold a request thread)."""
+    headers = {"Connection": "close"}
+    if body is not None:
+        headers["Content-Type"] = "application/json"
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def start_server(directory, log_file, args):
+    """Start src/serve.py with one worker; returns the process and its port once it answers."""
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(directory, 'burst.db')}",
+               FLASK_ENV="production", FLASK_DEBUG="false", VELA_SHARD_COUNT="0",
+               PASSWORD_HASH_ITERATIONS=str(args.iterations))
+    # The hashing pool must be sized by the server itself
+    env.pop("PASSWORD_HASH_WORKERS", None)
+    env.pop("PASSWORD_HASH_QUEUE", None)
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(PROJECT_ROOT, "src", "serve.py"), "--bind", f"127.0.0.1:{port}",
+         "--workers", "1", "--threads", str(args.threads)],
+        cwd=PROJECT_ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT
+    )
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server exited with status {process.returncode}")
+        try:
+            if call(port, "GET", "/api/health", timeout=1)[0] == 200:
+                return process, port
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError("The server did not start within 60 s")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that a login burst does not starve the other routes")
+    parser.add_argument("--threads", type=int, default=4, help="Request threads of the server (default: 4)")
+    parser.add_argument("--logins", type=int, default=16,
+                        help="Concurrent login loops, more than --threads (default: 16)")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds the burst lasts (default: 5)")
+    parser.add_argument("--iterations", type=int, default=600000,
+                        help="PBKDF2 iterations, so that each hash takes a noticeable time (default: 600000)")
+    parser.add_argument("--max-latency", type=float, default=2.0,
+                        help="Slowest acceptable non-auth response in seconds (default: 2)")
+    args = parser.parse_args()
+    if args.logins <= args.threads:
+        parser.error("--logins must be more than --threads")
+
+    with tempfile.TemporaryDirectory() as directory, open(os.path.join(directory, "server.log"), "w+") as log_file:
+        process, port = start_server(directory, log_file, args)
+        try:
+            call(port, "POST", "/api/register", {"username": USERNAME, "password": PASSWORD})
+            status, body = call(port, "POST", "/api/login", {"username": USERNAME, "password": PASSWORD})
+            if status != 200:
+                raise RuntimeError(f"Login returned {status}: {body[:200]}")
+            token = json.loads(body)["token"]
+
+            logins = Counter()
+            lock = threading.Lock()
+            stop_at = time.monotonic() + args.duration
+
+            def login_loop():
+                while time.monotonic() < stop_at:
+                    try:
+                        status = call(port, "POST", "/api/login", {"username": USERNAME, "password": PASSWORD})[0]
+                    except OSError as error:
+                        status = type(error).__name__
+                    with lock:
+                        logins[status] += 1
+
+            threads = [threading.Thread(target=login_loop, daemon=True) for _ in range(args.logins)]
+            for thread in threads:
+                thread.start()
+
+            latencies = []
+            failures = []
+            while time.monotonic() < stop_at:
+                started = time.perf_counter()
+                try:
+                    status = call(port, "GET", "/api/categories", token=token, timeout=args.max_latency * 5)[0]
+                except OSError as error:
+                    status = type(error).__name__
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    failures.append(status)
+                time.sleep(0.05)
+
+            for thread in threads:
+                thread.join()
+        finally:
+            stop_server(process)
+
+    slowest = max(latencies)
+    print(f"Logins ({args.logins} concurrent, {args.threads} request threads): "
+          + ", ".join(f"{status}: {count}" for status, count in sorted(logins.items(), key=str)))
+    print(f"GET /api/categories: {len(latencies)} requests, {len(failures)} failed, "
+          f"slowest {slowest * 1000:.0f} ms")
+
+    if failures or slowest > args.max_latency:
+        print("Non-auth requests were starved by the login burst")
+        sys.exit(1)
+    print("Non-auth requests kept answering during the login burst")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+VELA SYSTEM - Query Count Check
+
+Runs the transaction listing and detail routes through the Flask test client for users with 1, 5
+and 50 transactions (each transaction in a category of its own) and counts the SQL statements
+every request issues. Exits with status 1 if a route's count depends on the number of rows,
+which is how an N+1 pattern (e.g. a lazy category load per transaction) shows up.
+
+Usage: python scripts/check_query_counts.py [--sizes 1 5 50]
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+
+from flask import has_request_context  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from config import get_config  # noqa: E402
+from models import db  # noqa: E402
+
+PASSWORD = "query-count"
+
+
+class StatementCounter:
+    """Counts the SQL statements run on an engine while serving requests."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            self.count += 1
+
+    def close(self):
+        event.remove(self.engine, "before_cursor_execute", self.record)
+
+
+def create_user(client, size, today):
+    """Register a user with size transactions, each in its own category; returns (headers, a transaction id)."""
+    username = f"rows_{size}"
+    client.post("/api/register", json={"username": username, "password": PASSWORD})
+    token = client.post("/api/login", json={"username": username, "password": PASSWORD}).get_json()["token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    category_ids = [category["id"] for category in client.get("/api/categories", headers=headers).get_json()["categories"]]
+    for index in range(len(category_ids), size):
+        created = client.post("/api/categories", json={"name": f"Category {index}"}, headers=headers).get_json()
+        category_ids.append(created["category_id"])
+
+    batch = [
+        {"amount": 10 + index, "transaction_type": "expense", "category_id": category_ids[index],
+         "start_date": (today - timedelta(days=index)).isoformat()}
+        for index in range(size)
+    ]
+    results = client.post("/api/transactions/batch", json={"transactions": batch}, headers=headers).get_json()
+    return headers, results["results"][-1]["transaction_id"]
+
+
+def routes(transaction_id):
+    """(name, url) of the routes whose statement count must not depend on the number of rows."""
+    return [
+        ("GET /transactions", "/api/transactions?limit=100"),
+        ("GET /transactions?include_balances", "/api/transactions?limit=100&include_balances=true"),
+        ("GET /transactions/<id>", f"/api/transactions/{transaction_id}"),
+        ("GET /transactions/export", "/api/transactions/export?format=ndjson"),
+    ]
+
+
+def count_statements(client, counter, url, headers):
+    """Statements of one request, after a warm-up request (which fills the token cache)."""
+    client.get(url, headers=headers).get_data()
+    counter.count = 0
+    response = client.get(url, headers=headers)
+    response.get_data()  # Streamed responses run their queries while they are read
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return counter.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the transaction routes run a fixed number of queries")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 5, 50],
+                        help="Transactions per user to compare (default: 1 5 50)")
+    args = parser.parse_args()
+    if min(args.sizes) < 1:
+        parser.error("--sizes must be at least 1")
+
+    from app import create_app
+
+    logging.disable(logging.CRITICAL)
+    counts = {}
+    with tempfile.TemporaryDirectory() as directory:
+        config = type("QueryCountConfig", (get_config(),), {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(directory, 'counts.db')}",
+            "SQLALCHEMY_ECHO": False,
+            "PASSWORD_HASH_ITERATIONS": 1000,
+        })
+        app = create_app(config)
+        client = app.test_client()
+        with app.app_context():
+            counter = StatementCounter(db.engine)
+            for size in args.sizes:
+                headers, transaction_id = create_user(client, size, date.today())
+                for name, url in routes(transaction_id):
+                    counts.setdefault(name, {})[size] = count_statements(client, counter, url, headers)
+            counter.close()
+            db.session.remove()
+            db.engine.dispose()
+
+    print(f"{'Route':<38}" + "".join(f"{f'{size} rows':>10}" for size in args.sizes))
+    failures = []
+    for name, by_size in counts.items():
+        print(f"{name:<38}" + "".join(f"{by_size[size]:>10}" for size in args.sizes))
+        if len(set(by_size.values())) > 1:
+            failures.append(name)
+
+    for name in failures:
+        print(f"Query count of {name} grows with the number of rows")
+    if failures:
+        sys.exit(1)
+    print("Query counts do not depend on the number of rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+VELA SYSTEM - Query Plan Check
+
+Drives every route of the API through the Flask test client against a temporary SQLite database
+seeded with a few users' transactions, then runs EXPLAIN QUERY PLAN on every SQL statement the
+requests issued (and on those of the maintenance jobs in utils.py). Exits with status 1 if any
+statement scans a whole table where it should search an index, or if a route was not exercised,
+so it can run as a regression check after changes to queries or indexes.
+
+Usage: python scripts/check_query_plans.py [--verbose]
+"""
+
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "src"))
+
+from flask import has_request_context, request  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from config import get_config  # noqa: E402
+from models import db  # noqa: E402
+import utils  # noqa: E402
+
+# Statements that explain a query plan (INSERTs only touch the table and its indexes)
+PLANNED_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+# The maintenance jobs go through every user on purpose
+MAINTENANCE_SCANS = {"users"}
+
+
+class StatementRecorder:
+    """Collects the distinct SQL statements run on an engine, labelled with the route that ran them."""
+
+    def __init__(self, app, engine):
+        self.engine = engine
+        self.label = None
+        self.statements = {}  # (label, statement) -> parameters of the first execution
+        self.routes = set()
+        app.before_request(self.route_started)
+        event.listen(engine, "before_cursor_execute", self.record)
+
+    def route_started(self):
+        if request.url_rule is not None:
+            self.routes.add(f"{request.method} {request.url_rule.rule}")
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and request.url_rule is not None:
+            label = f"{request.method} {request.url_rule.rule}"
+        elif self.label is not None:
+            label = self.label
+        else:
+            return
+
+        if statement.lstrip().upper().startswith(PLANNED_STATEMENTS):
+            if executemany:
+                parameters = parameters[0]
+            self.statements.setdefault((label, statement), parameters)
+
+    @contextmanager
+    def labelled(self, label):
+        """Record the statements run outside a request (e.g. by a maintenance job) under a label."""
+        self.label = label
+        try:
+            yield
+        finally:
+            self.label = None
+
+    def close(self):
+        event.remove(self.engine, "before_cursor_execute", self.record)
+
+
+def full_scans(plan, allowed=()):
+    """Tables that a query plan reads in full (SCAN rather than SEARCH), except the allowed ones."""
+    scans = []
+    for _, _, _, detail in plan:
+        if not detail.startswith("SCAN ") or detail.startswith("SCAN CONSTANT ROW"):
+            continue
+        table = detail.split()[1]
+        if table not in allowed:
+            scans.append(detail)
+    return scans
+
+
+def exercise_api(client, today):
+    """Call every route of the API at least once, in an order that leaves data for the next call."""
+    def token(username):
+        response = client.post("/api/login", json={"username": username, "password": "plan-check"})
+        return {"Authorization": f"Bearer {response.get_json()['token']}"}
+
+    for username in ("alice", "bob"):
+        client.post("/api/register", json={"username": username, "password": "plan-check", "initial_balance": 500})
+    client.get("/api/health")
+    client.get("/api/metrics")
+    headers = token("alice")
+    token("bob")
+
+    categories = client.get("/api/categories", headers=headers).get_json()["categories"]
+    category_ids = [category["id"] for category in categories]
+    created = client.post("/api/categories", json={"name": "Travel"}, headers=headers).get_json()
+    client.put(f"/api/categories/{created['category_id']}", json={"description": "Trips"}, headers=headers)
+
+    rng = random.Random(7)
+    batch = []
+    for _ in range(300):
+        transaction = {
+            "amount": round(rng.uniform(1, 500), 2),
+            "transaction_type": rng.choice(["income", "expense"]),
+            "category_id": rng.choice(category_ids),
+            "start_date": (today - timedelta(days=rng.randint(0, 400))).isoformat(),
+        }
+        kind = rng.random()
+        if kind < 0.1:
+            transaction.update(transaction_type="income", transaction_mode="recurring", cycle_days=30)
+        elif kind < 0.2:
+            transaction.update(transaction_type="expense", transaction_mode="continuous",
+                               duration_days=rng.randint(1, 60))
+        batch.append(transaction)
+    client.post("/api/transactions/batch", json={"transactions": batch}, headers=headers)
+
+    single = client.post("/api/transactions", json={
+        "amount": 42.5, "transaction_type": "expense", "category_id": category_ids[3],
+        "start_date": today.isoformat()
+    }, headers=headers).get_json()["transaction_id"]
+    continuous = client.post("/api/transactions", json={
+        "amount": 300, "transaction_type": "expense", "transaction_mode": "continuous", "duration_days": 10,
+        "start_date": today.isoformat()
+    }, headers=headers).get_json()["transaction_id"]
+
+    start, end = (today - timedelta(days=90)).isoformat(), today.isoformat()
+    page = client.get("/api/transactions?limit=20&include_balances=true", headers=headers).get_json()
+    client.get(f"/api/transactions?limit=20&after={page['next_cursor']}", headers=headers)
+    client.get(f"/api/transactions?start={start}&end={end}&category_id={category_ids[0]}", headers=headers)
+    client.get(f"/api/transactions/export?start={start}&end={end}", headers=headers).get_data()
+    client.get("/api/transactions/export?format=ndjson", headers=headers).get_data()
+    client.get(f"/api/transactions/{single}", headers=headers)
+    client.put(f"/api/transactions/{single}", json={"amount": 45, "start_date": start}, headers=headers)
+    client.put(f"/api/transactions/{continuous}", json={"duration_days": 20}, headers=headers)
+    client.put(f"/api/transactions/{single}/category", json={"category_id": category_ids[4]}, headers=headers)
+    client.delete(f"/api/transactions/{single}", headers=headers)
+
+    client.get(f"/api/reports/day_capacity?date={end}", headers=headers)
+    client.get(f"/api/reports/summary?start={start}&end={end}", headers=headers)
+    client.get(f"/api/reports/categories/daily?date={end}", headers=headers)
+    client.get(f"/api/reports/categories/monthly?year={today.year}&month={today.month}", headers=headers)
+    client.get(f"/api/reports/periods?start={start}&end={end}&granularity=month", headers=headers)
+    client.get(f"/api/dashboard?date={end}", headers=headers)
+
+    # Deleting a category moves its transactions to "Other"
+    client.delete(f"/api/categories/{category_ids[0]}", headers=headers)
+
+
+def run_maintenance(recorder):
+    """Run the maintenance jobs of db_manage.py, labelled by function."""
+    for job in (utils.maintain_day_capacity, utils.backfill_category_rollups, utils.check_category_rollups,
+                utils.query_user_balances, utils.reconcile_balances):
+        with recorder.labelled(f"utils.{job.__name__}"):
+            job()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the API's SQL statements use indexes")
+    parser.add_argument("--verbose", action="store_true", help="Print the plan of every statement")
+    args = parser.parse_args()
+
+    from app import create_app
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as directory:
+        config = type("QueryPlanConfig", (get_config(),), {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(directory, 'plans.db')}",
+            "SQLALCHEMY_ECHO": False,
+        })
+        app = create_app(config)
+        with app.app_context():
+            recorder = StatementRecorder(app, db.engine)
+            exercise_api(app.test_client(), date.today())
+            run_maintenance(recorder)
+            recorder.close()
+
+            failures = []
+            with db.engine.connect() as connection:
+                for (label, statement), parameters in recorder.statements.items():
+                    plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+                    allowed = MAINTENANCE_SCANS if label.startswith("utils.") else ()
+                    scans = full_scans(plan, allowed)
+                    if scans:
+                        failures.append((label, statement, scans))
+                    if args.verbose:
+                        print(f"{label}\n    {' '.join(statement.split())}")
+                        for _, _, _, detail in plan:
+                            print(f"      {detail}")
+
+            api_routes = {
+                f"{method} {rule.rule}"
+                for rule in app.url_map.iter_rules() if rule.endpoint.startswith("api.")
+                for method in rule.methods - {"HEAD", "OPTIONS"}
+            }
+            missing = sorted(api_routes - recorder.routes)
+
+            db.session.remove()
+            db.engine.dispose()
+
+    print(f"Checked {len(recorder.statements)} statements from {len(recorder.routes)} routes and "
+          f"{len({label for label, _ in recorder.statements} - recorder.routes)} maintenance jobs")
+    for label, statement, scans in failures:
+        print(f"\nFull table scan in {label}: {', '.join(scans)}\n    {' '.join(statement.split())}")
+    for route in missing:
+        print(f"Route not exercised (add it to exercise_api): {route}")
+
+    if failures or missing:
+        sys.exit(1)
+    print("No full table scans")
+
+
+if __name__ == "__main__":
+    main()
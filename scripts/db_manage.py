@@ -8,6 +8,7 @@ A command-line utility for managing the VELA SYSTEM SQLite database.
 import sqlite3
 import argparse
 import os
+import re
 import sys
 
 # Define paths
@@ -16,6 +17,32 @@ DB_PATH = os.path.join(PROJECT_ROOT, "vela.db")
 SQL_DIR = os.path.join(PROJECT_ROOT, "sql")
 CREATE_SQL_PATH = os.path.join(SQL_DIR, "create_tables.sql")
 DROP_SQL_PATH = os.path.join(SQL_DIR, "drop_tables.sql")
+SRC_DIR = os.path.join(PROJECT_ROOT, "src")
+
+# Columns added after v1.1: (table, column, definition)
+MIGRATION_COLUMNS = [
+    ("users", "single_balance", "INTEGER NOT NULL DEFAULT 0"),
+    ("users", "scheduled_balance", "INTEGER NOT NULL DEFAULT 0"),
+    ("users", "scheduled_as_of", "DATE"),
+    ("users", "scheduled_valid_until", "DATE"),
+    ("users", "data_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("users", "capacity_horizon", "DATE"),
+    ("users", "category_rollup_built", "BOOLEAN NOT NULL DEFAULT 0"),
+]
+
+# Single-column indexes of older schemas, replaced by the composite indexes declared on the models
+SUPERSEDED_INDEXES = [
+    "idx_transactions_user_id",
+    "idx_transactions_date",
+    "idx_transactions_type",
+    "idx_transactions_category",
+]
+
+# Columns holding money: integer cents, FLOAT amounts in older databases
+MONEY_COLUMNS = {
+    "users": ["initial_balance", "single_balance", "scheduled_balance"],
+    "transactions": ["amount"],
+}
 
 
 def read_sql_file(file_path):
@@ -90,6 +117,273 @@ def init_db(db_path):
     return create_tables(db_path)
 
 
+def load_app():
+    """Create the Flask application so the models can be used from this script."""
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    from app import create_app
+    return create_app()
+
+
+def add_missing_columns(db_path):
+    """Add any columns from MIGRATION_COLUMNS that an existing database lacks."""
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        for table, column, definition in MIGRATION_COLUMNS:
+            cursor.execute(f"PRAGMA table_info({table})")
+            existing = [row[1] for row in cursor.fetchall()]
+            if existing and column not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+                print(f"Added column {table}.{column}")
+
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return False
+
+
+def drop_superseded_indexes(db_path):
+    """Drop the indexes listed in SUPERSEDED_INDEXES; the app creates their replacements on startup."""
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        for index in SUPERSEDED_INDEXES:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index,))
+            if cursor.fetchone():
+                cursor.execute(f"DROP INDEX {index}")
+                print(f"Dropped index {index}")
+
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return False
+
+
+def convert_money_columns(db_path):
+    """Rebuild tables whose money columns are still FLOAT so that they store integer cents.
+
+    SQLite cannot change a column's type, so each such table is recreated with INTEGER money
+    columns, its rows copied with the amounts converted, and its indexes restored. Returns the
+    number of tables converted, or None on error. Amounts are converted with models.to_cents, the
+    rounding every write uses, so migrated rows match rows written later.
+    """
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    from models import to_cents
+
+    try:
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        conn.create_function("to_cents", 1, lambda amount: None if amount is None else to_cents(amount),
+                             deterministic=True)
+        cursor = conn.cursor()
+        # Foreign keys must stay put while a referenced table is dropped and replaced
+        cursor.execute("PRAGMA foreign_keys = OFF")
+        cursor.execute("BEGIN")
+
+        converted = 0
+        for table, money_columns in MONEY_COLUMNS.items():
+            cursor.execute(f"PRAGMA table_info({table})")
+            columns = [(row[1], row[2].upper()) for row in cursor.fetchall()]
+            pending = [name for name, declared_type in columns if name in money_columns and declared_type != "INTEGER"]
+            if not pending:
+                continue
+
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            create_sql = cursor.fetchone()[0]
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND tbl_name = ? "
+                           "AND sql IS NOT NULL", (table,))
+            dependent_sql = [row[0] for row in cursor.fetchall()]
+
+            create_sql = re.sub(r'^CREATE TABLE\s+(IF NOT EXISTS\s+)?["`]?\w+["`]?', f'CREATE TABLE new_{table}',
+                                create_sql, flags=re.IGNORECASE)
+            for name in pending:
+                create_sql = re.sub(rf'(["`]?\b{name}\b["`]?\s+)(FLOAT|REAL|DOUBLE PRECISION|DOUBLE|NUMERIC)\b',
+                                    r'\1INTEGER', create_sql, flags=re.IGNORECASE)
+            cursor.execute(create_sql)
+
+            names = ", ".join(name for name, _ in columns)
+            values = ", ".join(f"to_cents({name})" if name in pending else name
+                               for name, _ in columns)
+            cursor.execute(f"INSERT INTO new_{table} ({names}) SELECT {values} FROM {table}")
+            cursor.execute(f"DROP TABLE {table}")
+            cursor.execute(f"ALTER TABLE new_{table} RENAME TO {table}")
+            for statement in dependent_sql:
+                cursor.execute(statement)
+
+            print(f"Converted {', '.join(f'{table}.{name}' for name in pending)} to integer cents")
+            converted += 1
+
+        cursor.execute("PRAGMA foreign_key_check")
+        if cursor.fetchall():
+            cursor.execute("ROLLBACK")
+            print("Foreign key check failed, money columns left unchanged")
+            return None
+
+        cursor.execute("COMMIT")
+        conn.close()
+        return converted
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+
+
+def reconcile(fix=False):
+    """Recompute every user's balances from scratch and report drift from the stored state."""
+    app = load_app()
+    with app.app_context():
+        from utils import reconcile_balances
+        drift = reconcile_balances(fix=fix)
+
+    if not drift:
+        print("Stored balances match recomputed balances for all users")
+    for entry in drift:
+        print(f"User {entry['user_id']} ({entry['username']}): "
+              f"single balance drift {entry['single_drift']}, scheduled balance drift {entry['scheduled_drift']}")
+    if fix:
+        print("Stored balances recomputed for all users")
+    return drift
+
+
+def list_balances():
+    """Print every user's balances, computed in the database in one query."""
+    app = load_app()
+    with app.app_context():
+        from utils import query_user_balances
+        balances = query_user_balances()
+
+    print(f"{'ID':>6}  {'Username':<20} {'Current Balance':>16} {'Long-term Balance':>18}")
+    for entry in balances:
+        print(f"{entry['user_id']:>6}  {entry['username']:<20} "
+              f"{entry['current_total_balance']:>16.2f} {entry['long_term_balance']:>18.2f}")
+    return balances
+
+
+def maintain_capacity(rebuild=False):
+    """Roll the materialized daily_capacity rows of every user forward (or rebuild them)."""
+    app = load_app()
+    with app.app_context():
+        from utils import maintain_day_capacity
+        users, written = maintain_day_capacity(rebuild=rebuild)
+
+    print(f"Day capacity {'rebuilt' if rebuild else 'extended'} for {users} users ({written} rows written)")
+    return users, written
+
+
+def manage_rollups(action):
+    """Build the monthly category rollups, or check them against a full recomputation."""
+    app = load_app()
+    with app.app_context():
+        from utils import backfill_category_rollups, check_category_rollups
+        if action == "check":
+            mismatches = check_category_rollups()
+        else:
+            users, written = backfill_category_rollups(rebuild=action == "rebuild")
+
+    if action != "check":
+        print(f"Category rollups {'rebuilt' if action == 'rebuild' else 'built'} for {users} users "
+              f"({written} rows written)")
+        return True
+
+    if not mismatches:
+        print("Category rollups match the recomputed monthly category reports for all users")
+    for entry in mismatches:
+        print(f"User {entry['user_id']} ({entry['username']}) {entry['month']}: "
+              f"expected {entry['expected']}, rollup gives {entry['actual']}")
+    return not mismatches
+
+
+def table_stats():
+    """Print row counts and columns of every table (of the directory and every shard when sharded)."""
+    app = load_app()
+    from app import table_stats as database_table_stats
+    from models import db
+
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            print(f"{bind_key or 'main'} ({engine.url.database}):")
+            for stats in database_table_stats(engine):
+                print(f"  {stats['table']}: {stats['rows']} rows, columns: {', '.join(stats['columns'])}")
+    return True
+
+
+def shard_db_paths():
+    """SQLite files of the configured shards (empty when sharding is off)."""
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    from config import get_config
+    config = get_config()
+    return [os.path.join(config.SHARD_DIR, f"vela_shard_{shard}.db") for shard in range(config.SHARD_COUNT)]
+
+
+def configured_db_path():
+    """SQLite file of the configured SQLALCHEMY_DATABASE_URI (DATABASE_URL), the database the app uses."""
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    from config import get_config
+    from sqlalchemy.engine import make_url
+    return make_url(get_config().SQLALCHEMY_DATABASE_URI).database
+
+
+def migrate():
+    """Bring the configured database (and any shards) up to the current schema and rebuild derived state."""
+    db_path = configured_db_path()
+    if not db_path or db_path == ":memory:" or not os.path.exists(db_path):
+        print(f"Database not found: {db_path or ':memory:'}")
+        return False
+
+    converted = 0
+    for path in [db_path] + [path for path in shard_db_paths() if os.path.exists(path)]:
+        tables = None
+        if add_missing_columns(path) and drop_superseded_indexes(path):
+            tables = convert_money_columns(path)
+        if tables is None:
+            print(f"Migration failed for {path}")
+            return False
+        converted += tables
+    reconcile(fix=True)
+    # Amounts are now rounded to whole cents, so derived totals are recomputed from them
+    maintain_capacity(rebuild=bool(converted))
+    manage_rollups("rebuild" if converted else "backfill")
+    return True
+
+
+def manage_shards(action, target_count=None):
+    """Create, inspect, import into or rebalance the per-user shard databases."""
+    app = load_app()
+    with app.app_context():
+        import sharding
+        if not sharding.sharding_enabled():
+            print("Sharding is disabled; set VELA_SHARD_COUNT to the number of shards")
+            return False
+
+        if action == "create":
+            # create_app has already created any missing directory and shard tables
+            print(f"Directory and {sharding.shard_count()} shard databases ready in {app.config['SHARD_DIR']}")
+        elif action == "import":
+            imported = sharding.import_users()
+            print(f"Imported {imported} users from the main database into the shards")
+        elif action == "rebalance":
+            try:
+                moves = sharding.rebalance(target_count)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return False
+            for user_id, username, source, target in moves:
+                print(f"Moved user {user_id} ({username}) from shard {source} to shard {target}")
+            print(f"Rebalanced {len(moves)} users")
+
+        for shard, count in sharding.shard_user_counts().items():
+            print(f"  Shard {shard}: {count} users")
+    return True
+
+
 def main():
     """Main function to handle CLI commands."""
     parser = argparse.ArgumentParser(description="VELA SYSTEM Database Management CLI")
@@ -106,6 +400,44 @@ def main():
     # Initialize database command
     init_parser = subparsers.add_parser("init", help="Initialize database (drop if exists and create new)")
 
+    # Migrate database command
+    migrate_parser = subparsers.add_parser("migrate", help="Add new columns and indexes to the configured database (DATABASE_URL) and its shards, convert money to integer cents and rebuild stored balances, day capacity and rollups")
+
+    # Reconcile balances command
+    reconcile_parser = subparsers.add_parser("reconcile", help="Recompute balances from scratch and report drift")
+    reconcile_parser.add_argument("--fix", action="store_true", help="Overwrite stored balances with recomputed values")
+
+    # List balances command
+    balances_parser = subparsers.add_parser("balances", help="List all users with both balances")
+
+    # Day capacity maintenance command
+    capacity_parser = subparsers.add_parser(
+        "capacity",
+        help="Extend the materialized day capacity of every user to the rolling horizon (run daily)"
+    )
+    capacity_parser.add_argument("--rebuild", action="store_true",
+                                 help="Recompute every user's day capacity rows from their transactions")
+
+    # Category rollup command
+    rollups_parser = subparsers.add_parser("rollups", help="Manage the monthly category rollups")
+    rollups_parser.add_argument("action", choices=["backfill", "rebuild", "check"],
+                                help="build rollups for users without one, rebuild them for every user, "
+                                     "or compare them with the reports computed from the transactions")
+
+    # Table statistics command
+    stats_parser = subparsers.add_parser("stats", help="Show row counts and columns of every table")
+
+    # Shard management command
+    shards_parser = subparsers.add_parser(
+        "shards",
+        help="Manage per-user shard databases (requires VELA_SHARD_COUNT); stop the API before importing or rebalancing"
+    )
+    shards_parser.add_argument("action", choices=["create", "status", "import", "rebalance"],
+                               help="create shard databases, show users per shard, import users from the main "
+                                    "database, or move users to shard user_id %% N")
+    shards_parser.add_argument("--target-count", type=int,
+                               help="Number of shards to rebalance onto (default: VELA_SHARD_COUNT)")
+
     # Parse arguments
     args = parser.parse_args()
 
@@ -116,6 +448,20 @@ def main():
         drop_tables(DB_PATH)
     elif args.command == "init":
         init_db(DB_PATH)
+    elif args.command == "migrate":
+        migrate()
+    elif args.command == "reconcile":
+        reconcile(fix=args.fix)
+    elif args.command == "balances":
+        list_balances()
+    elif args.command == "capacity":
+        maintain_capacity(rebuild=args.rebuild)
+    elif args.command == "rollups":
+        manage_rollups(args.action)
+    elif args.command == "stats":
+        table_stats()
+    elif args.command == "shards":
+        manage_shards(args.action, args.target_count)
     else:
         parser.print_help()
 
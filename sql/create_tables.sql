@@ -1,9 +1,18 @@
+-- Money columns (balances, amounts) hold integer cents
+
 -- Create users table
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     username VARCHAR(80) NOT NULL UNIQUE,
     password_hash VARCHAR(128) NOT NULL,
-    initial_balance FLOAT DEFAULT 0.0
+    initial_balance INTEGER DEFAULT 0,
+    single_balance INTEGER NOT NULL DEFAULT 0,
+    scheduled_balance INTEGER NOT NULL DEFAULT 0,
+    scheduled_as_of DATE,
+    scheduled_valid_until DATE,
+    data_version INTEGER NOT NULL DEFAULT 0,
+    capacity_horizon DATE,
+    category_rollup_built BOOLEAN NOT NULL DEFAULT 0
 );
 
 -- Create categories table
@@ -20,7 +29,7 @@ CREATE TABLE IF NOT EXISTS transactions (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER NOT NULL,
     category_id INTEGER,
-    amount FLOAT NOT NULL,
+    amount INTEGER NOT NULL,
     transaction_type VARCHAR(10) NOT NULL,
     description VARCHAR(255),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -33,9 +42,34 @@ CREATE TABLE IF NOT EXISTS transactions (
     FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE SET NULL
 );
 
--- Create indexes for performance
-CREATE INDEX IF NOT EXISTS idx_transactions_user_id ON transactions (user_id);
-CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (start_date, end_date);
-CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions (transaction_type);
-CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions (category_id);
-CREATE INDEX IF NOT EXISTS idx_categories_user_id ON categories (user_id);
\ No newline at end of file
+-- Create daily_capacity table (materialized per-day allocations, see utils.record_day_capacity)
+CREATE TABLE IF NOT EXISTS daily_capacity (
+    user_id INTEGER NOT NULL,
+    date DATE NOT NULL,
+    income_alloc FLOAT NOT NULL DEFAULT 0.0,
+    expense_alloc FLOAT NOT NULL DEFAULT 0.0,
+    PRIMARY KEY (user_id, date),
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+
+-- Create category_month_rollup table (monthly category report totals, see utils.record_category_rollup)
+CREATE TABLE IF NOT EXISTS category_month_rollup (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    category_id INTEGER,
+    month DATE NOT NULL,
+    income FLOAT NOT NULL DEFAULT 0.0,
+    expense FLOAT NOT NULL DEFAULT 0.0,
+    income_count INTEGER NOT NULL DEFAULT 0,
+    expense_count INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+    FOREIGN KEY (category_id) REFERENCES categories (id) ON DELETE SET NULL
+);
+
+-- Create indexes for performance (declared on the models too, see scripts/check_query_plans.py)
+CREATE INDEX IF NOT EXISTS idx_transactions_user_start ON transactions (user_id, start_date, id);
+CREATE INDEX IF NOT EXISTS idx_transactions_category_user ON transactions (category_id, user_id);
+CREATE INDEX IF NOT EXISTS idx_transactions_user_scheduled ON transactions (user_id, start_date) WHERE is_recurring IS 1 OR duration_days != 0;
+CREATE INDEX IF NOT EXISTS idx_categories_user_id ON categories (user_id);
+CREATE INDEX IF NOT EXISTS idx_category_month_rollup_user_month ON category_month_rollup (user_id, month);
+CREATE INDEX IF NOT EXISTS idx_category_month_rollup_category_user ON category_month_rollup (category_id, user_id);
\ No newline at end of file
@@ -4,6 +4,13 @@ DROP INDEX IF EXISTS idx_transactions_date;
 DROP INDEX IF EXISTS idx_transactions_type;
 DROP INDEX IF EXISTS idx_transactions_category;
 DROP INDEX IF EXISTS idx_categories_user_id;
+DROP INDEX IF EXISTS idx_category_month_rollup_user_month;
+
+-- Drop category_month_rollup table (because it references users and categories)
+DROP TABLE IF EXISTS category_month_rollup;
+
+-- Drop daily_capacity table (because it references users)
+DROP TABLE IF EXISTS daily_capacity;
 
 -- Drop transactions table first (because it references users and categories)
 DROP TABLE IF EXISTS transactions;
@@ -12,4 +19,7 @@ DROP TABLE IF EXISTS transactions;
 DROP TABLE IF EXISTS categories;
 
 -- Drop users table
-DROP TABLE IF EXISTS users;
\ No newline at end of file
+DROP TABLE IF EXISTS users;
+
+-- Forget the schema fingerprint, so the app checks the schema again on its next start
+PRAGMA user_version = 0;
@@ -1,11 +1,17 @@
-from flask import Flask
+from flask import Flask, g, has_request_context, request
 from flask_cors import CORS
+from cache import ReportCache, TokenCache
+from config import Config, get_config
+from metrics import RequestMetrics
 from models import db
-from routes import api
-import os
+from passwords import PasswordHasher
+from routes import api, request_metrics
+from sharding import UnmigratedDatabase, create_all_tables, shard_binds
 import logging
 import sqlite3
-from sqlalchemy import text, inspect
+import time
+from sqlalchemy import event, text, inspect
+from sqlalchemy.engine import make_url
 
 # Configure logging
 logging.basicConfig(
@@ -23,13 +29,108 @@ def test_db_connection(db_path):
         cursor.execute("SELECT sqlite_version();")
         version = cursor.fetchone()
         conn.close()
-        logger.info(f"Successfully connected to vela.db (SQLite version: {version[0]})")
+        logger.info(f"Successfully connected to {db_path} (SQLite version: {version[0]})")
         return True
     except sqlite3.Error as e:
         logger.error(f"Database connection error: {e}")
         return False
 
 
+def configure_sqlite(app):
+    """Apply the SQLITE_PRAGMAS profile from the config to every new SQLite connection."""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    if not pragmas:
+        return
+
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', set_sqlite_pragmas)
+
+    logger.info(f"SQLite profile: {', '.join(f'{name}={value}' for name, value in pragmas.items())}")
+
+
+def init_extensions(app):
+    """Create the app's caches, password hashing pool and request metrics from its config."""
+    config = app.config
+    app.extensions['token_cache'] = TokenCache(max_size=config['TOKEN_CACHE_SIZE'], ttl=config['TOKEN_CACHE_TTL'])
+    app.extensions['report_cache'] = ReportCache(max_bytes=config['REPORT_CACHE_MAX_BYTES'])
+    app.extensions['password_hasher'] = PasswordHasher(
+        max_workers=config['PASSWORD_HASH_WORKERS'],
+        max_queue=config['PASSWORD_HASH_QUEUE'],
+        iterations=config['PASSWORD_HASH_ITERATIONS']
+    )
+    if config['PASSWORD_HASH_WORKERS'] + config['PASSWORD_HASH_QUEUE'] >= config['REQUEST_THREADS']:
+        logger.warning(f"Password hashing admits {config['PASSWORD_HASH_WORKERS'] + config['PASSWORD_HASH_QUEUE']} "
+                       f"jobs with {config['REQUEST_THREADS']} request threads: a burst of logins can hold "
+                       f"every request thread; lower PASSWORD_HASH_QUEUE")
+    app.extensions['request_metrics'] = RequestMetrics()
+
+
+def configure_metrics(app):
+    """Record every request's latency and SQL work in request_metrics, served at /api/metrics."""
+    if not app.config.get('METRICS_ENABLED'):
+        return
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+
+    @app.after_request
+    def record_response_status(response):
+        g.response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request_metrics(exc):
+        # Runs after the response (and any streamed body) is complete; a request that raised is a 500
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        status = g.pop('response_status', 500) if exc is None else 500
+        request_metrics.observe_request(request.method, route, status, time.perf_counter() - started,
+                                        g.pop('sql_statements', 0), g.pop('sql_seconds', 0.0))
+
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info['statement_started'] = time.perf_counter()
+
+    def finish_statement(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('statement_started', None)
+        if started is not None and has_request_context() and 'sql_statements' in g:
+            g.sql_statements += 1
+            g.sql_seconds += time.perf_counter() - started
+
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', start_statement)
+        event.listen(engine, 'after_cursor_execute', finish_statement)
+
+
+def table_stats(engine):
+    """Row count and columns of every table in a database, for on-demand reporting."""
+    inspector = inspect(engine)
+    stats = []
+    with engine.connect() as connection:
+        for table_name in inspector.get_table_names():
+            count = connection.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+            columns = [col['name'] for col in inspector.get_columns(table_name)]
+            stats.append({'table': table_name, 'rows': count, 'columns': columns})
+    return stats
+
+
 def log_database_info(app):
     """Log information about the database tables and records."""
     with app.app_context():
@@ -69,29 +170,39 @@ def log_database_info(app):
             logger.error(f"Error querying database metadata: {e}")
 
 
-def create_app():
+def create_app(config_class=None):
+    started = time.perf_counter()
     app = Flask(__name__)
 
-    # Configure database - point to vela.db in the project root directory
-    # Move up one level from the current directory (src)
-    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-    db_path = os.path.join(project_root, "vela.db")
+    # Load settings for the active environment (FLASK_ENV) unless a config class is given
+    app.config.from_object(config_class or get_config())
+    fast_startup = app.config['FAST_STARTUP']
 
-    # Log the database path
-    logger.info(f"Database path: {db_path}")
+    if not app.config.get('SECRET_KEY'):
+        logger.warning("SECRET_KEY is not set, signing tokens with the built-in development key")
+        app.config['SECRET_KEY'] = Config.SECRET_KEY
 
-    # Test the database connection
-    test_db_connection(db_path)
+    # Log the database path; by default vela.db in the project root directory
+    db_path = make_url(app.config['SQLALCHEMY_DATABASE_URI']).database
+    logger.info(f"Database path: {db_path}")
 
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'vela-system-secret-key')
+    # Test the database connection (in fast mode the schema check below is the first connection)
+    if not fast_startup:
+        test_db_connection(db_path or ':memory:')
 
     # Enable CORS with proper configuration
     CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
 
+    # In sharded mode users live in per-shard databases next to a small directory database
+    if app.config.get('SHARD_COUNT'):
+        app.config['SQLALCHEMY_BINDS'] = {**app.config.get('SQLALCHEMY_BINDS', {}), **shard_binds(app.config)}
+        logger.info(f"Sharded mode: {app.config['SHARD_COUNT']} shards in {app.config['SHARD_DIR']}")
+
     # Initialize database
     db.init_app(app)
+    configure_sqlite(app)
+    init_extensions(app)
+    configure_metrics(app)
 
     # Register blueprints
     app.register_blueprint(api, url_prefix='/api')
@@ -99,14 +210,24 @@ def create_app():
     # Create database tables
     with app.app_context():
         try:
-            db.create_all()
-            logger.info("Database tables created or verified successfully")
+            checked = create_all_tables(fast=fast_startup)
+            if checked:
+                logger.info("Database tables created or verified successfully")
+            else:
+                logger.info("Database schema unchanged (fingerprint matches), skipped table creation")
+        except UnmigratedDatabase:
+            # Float dollars read through the cents Money type would be off by a factor of 100
+            raise
         except Exception as e:
             logger.error(f"Error creating database tables: {e}")
 
-    # Log database information
-    log_database_info(app)
+    # Log database information; in fast mode table statistics are on demand (db_manage.py stats)
+    if not fast_startup:
+        log_database_info(app)
 
+    app.config['STARTUP_SECONDS'] = round(time.perf_counter() - started, 3)
+    logger.info(f"App created in {app.config['STARTUP_SECONDS'] * 1000:.0f} ms "
+                f"({'fast' if fast_startup else 'full'} startup)")
     return app
 
 
@@ -114,4 +235,5 @@ if __name__ == '__main__':
     app = create_app()
     logger.info("VELA SYSTEM starting up...")
     logger.info("API endpoints available at http://127.0.0.1:5000/api/")
-    app.run(debug=True)
+    logger.info("Development server only; use src/serve.py to run with multiple workers in production")
+    app.run(debug=app.config['DEBUG'])
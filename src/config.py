@@ -5,9 +5,36 @@ class Config:
     # Database configuration
     BASEDIR = os.path.abspath(os.path.dirname(__file__))
     PARENT_DIR = os.path.dirname(BASEDIR)
-    SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(PARENT_DIR, "vela.db")}'
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', f'sqlite:///{os.path.join(PARENT_DIR, "vela.db")}')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Sharding: 0 keeps every user in SQLALCHEMY_DATABASE_URI; N > 0 spreads users over N SQLite
+    # files (vela_shard_<i>.db) with a vela_directory.db mapping usernames to shards
+    SHARD_COUNT = int(os.environ.get('VELA_SHARD_COUNT', 0))
+    SHARD_DIR = os.environ.get('VELA_SHARD_DIR', PARENT_DIR)
+
+    # Connection pool sizing (SQLAlchemy uses a QueuePool for file-based SQLite)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': 30
+    }
+
+    # SQLite tuning profile, applied to every new connection
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # Readers no longer block behind a writer
+        'synchronous': 'NORMAL',  # Safe with WAL; fsync only at checkpoints
+        'busy_timeout': 5000,  # Milliseconds to wait for the write lock before "database is locked"
+        'cache_size': -20000,  # Negative means KiB, so ~20 MB page cache per connection
+        'mmap_size': 268435456,  # 256 MB memory-mapped I/O
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON'
+    }
+
+    # Fast startup: skip the schema check when the database's stored schema fingerprint matches the
+    # models, and the per-table census (db_manage.py stats reports it on demand)
+    FAST_STARTUP = os.environ.get('VELA_FAST_STARTUP', 'true').lower() in ('true', '1', 't')
+
     # Security
     SECRET_KEY = os.environ.get('SECRET_KEY', 'vela-system-secret-key')
 
@@ -19,6 +46,49 @@ class Config:
     JSON_SORT_KEYS = False
     JSONIFY_PRETTYPRINT_REGULAR = True
 
+    # Authentication cache: decoded tokens and user identity, per process
+    TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 1024))
+    TOKEN_CACHE_TTL = int(os.environ.get('TOKEN_CACHE_TTL', 300))  # Seconds, capped by the token's exp
+
+    # Request threads per serve.py worker (serve.py --threads sets VELA_THREADS)
+    REQUEST_THREADS = int(os.environ.get('VELA_THREADS', 8))
+
+    # Password hashing: PBKDF2 iterations of new hashes (older hashes are upgraded on login), and the
+    # dedicated hashing pool. Callers wait on a request thread, so by default running plus queued hashes
+    # stay within half of REQUEST_THREADS; requests beyond workers + queue are rejected with 503 at once
+    PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 260000))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS',
+                                               max(1, min(4, os.cpu_count() or 1, REQUEST_THREADS // 2))))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE',
+                                             max(0, REQUEST_THREADS // 2 - PASSWORD_HASH_WORKERS)))
+
+    # Report cache: computed report payloads per process, evicted LRU beyond this many bytes
+    REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+    # Request metrics (per-route counts, latency and SQL work per request) and cache gauges served at
+    # /api/metrics; off by default, since the endpoint is unauthenticated
+    METRICS_ENABLED = os.environ.get('VELA_METRICS', 'false').lower() in ('true', '1', 't')
+
+    # Materialized day capacity: rows are kept this many days ahead of today (extend with db_manage.py capacity)
+    CAPACITY_HORIZON_DAYS = int(os.environ.get('CAPACITY_HORIZON_DAYS', 366))
+
+    # Category report proration: 'auto' (NumPy for large inputs when installed), 'numpy' or 'python'
+    PRORATION_ENGINE = os.environ.get('PRORATION_ENGINE', 'auto')
+
+    # Period reports: most periods one /reports/periods request may return
+    REPORT_MAX_PERIODS = 400
+
+    # Dashboard: recent transactions shown (from the last N days) and the longest day capacity trend
+    DASHBOARD_RECENT_TRANSACTIONS = 5
+    DASHBOARD_RECENT_DAYS = 30
+    DASHBOARD_MAX_TREND_DAYS = 366
+
+    # Transaction listing pagination
+    TRANSACTIONS_PAGE_SIZE = 100
+    TRANSACTIONS_MAX_PAGE_SIZE = 500
+    TRANSACTIONS_BATCH_MAX_SIZE = 5000
+    EXPORT_CHUNK_SIZE = 1000  # Rows fetched from the database and flushed to the client at a time
+
     # Version
     API_VERSION = '1.1.0'  # Updated for categories and long-term balance
 
@@ -43,6 +113,7 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # In-memory databases use a single static connection
 
 
 class ProductionConfig(Config):
@@ -61,11 +132,13 @@ config_by_name = {
     'development': DevelopmentConfig,
     'testing': TestingConfig,
     'production': ProductionConfig,
-    'default': DevelopmentConfig
+    # Without FLASK_ENV: no SQL echo or debug mode (FLASK_DEBUG still turns debug on)
+    'default': Config
 }
 
 
 # Active configuration
 def get_config():
+    """Config class of the environment (FLASK_ENV); the app reads its settings from current_app.config."""
     env = os.environ.get('FLASK_ENV', 'default')
     return config_by_name[env]
@@ -0,0 +1,273 @@
+from bisect import bisect_left
+import glob
+import json
+import os
+import threading
+import time
+
+# Upper bounds of the histogram buckets (+Inf is implied)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# (metric name, help text, attribute of RequestMetrics) of the per-request histograms
+HISTOGRAMS = (
+    ('vela_http_request_duration_seconds', 'Request latency.', '_latency'),
+    ('vela_http_request_sql_statements', 'SQL statements executed per request.', '_sql_statements'),
+    ('vela_http_request_sql_seconds', 'Time spent executing SQL per request.', '_sql_seconds')
+)
+
+
+class Histogram:
+    """Prometheus-style histogram: counts per bucket, plus the sum and count of the observations."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def merge(self, counts, total):
+        """Add the bucket counts and sum of another histogram with the same buckets."""
+        for index, count in enumerate(counts):
+            self.counts[index] += count
+        self.sum += total
+        self.count += sum(counts)
+
+
+class RequestMetrics:
+    """Per-route request counts, latency and SQL work per request, rendered in the Prometheus text format.
+
+    Routes are labelled with their URL rule (e.g. /api/transactions/<int:transaction_id>), not the
+    requested path, so the number of series stays bounded; unmatched paths share one label. The
+    statements-per-request histogram is the one to watch for N+1 queries. Behind serve.py every
+    worker shares its metrics through a MetricsStore (see share), so a scrape answered by any
+    worker reports the totals of all of them.
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, statement_buckets=STATEMENT_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.statement_buckets = statement_buckets
+        self.store = None
+        self._requests = {}  # (method, route, status) -> count
+        self._latency = {}  # (method, route) -> Histogram of seconds
+        self._sql_statements = {}  # (method, route) -> Histogram of statements per request
+        self._sql_seconds = {}  # (method, route) -> Histogram of SQL seconds per request
+        self._observed = 0  # Requests observed, to tell whether the shared copy is current
+        self._lock = threading.Lock()
+
+    def _histograms(self, key):
+        if key not in self._latency:
+            self._latency[key] = Histogram(self.latency_buckets)
+            self._sql_statements[key] = Histogram(self.statement_buckets)
+            self._sql_seconds[key] = Histogram(self.latency_buckets)
+        return self._latency[key], self._sql_statements[key], self._sql_seconds[key]
+
+    def observe_request(self, method, route, status, seconds, sql_statements, sql_seconds):
+        with self._lock:
+            self._requests[(method, route, status)] = self._requests.get((method, route, status), 0) + 1
+            latency, statements, sql_time = self._histograms((method, route))
+            latency.observe(seconds)
+            statements.observe(sql_statements)
+            sql_time.observe(sql_seconds)
+            self._observed += 1
+
+    def clear(self):
+        with self._lock:
+            self._requests.clear()
+            self._latency.clear()
+            self._sql_statements.clear()
+            self._sql_seconds.clear()
+            self._observed = 0
+
+    def snapshot(self):
+        """The metrics as a JSON-serializable dict, for merge in another process."""
+        with self._lock:
+            return {
+                'requests': [[*key, count] for key, count in self._requests.items()],
+                'histograms': {
+                    attribute: [[*key, histogram.counts, histogram.sum]
+                                for key, histogram in getattr(self, attribute).items()]
+                    for _, _, attribute in HISTOGRAMS
+                }
+            }
+
+    def merge(self, snapshot):
+        """Add the metrics of a snapshot to these."""
+        with self._lock:
+            for method, route, status, count in snapshot['requests']:
+                self._requests[(method, route, status)] = self._requests.get((method, route, status), 0) + count
+            for _, _, attribute in HISTOGRAMS:
+                for method, route, counts, total in snapshot['histograms'].get(attribute, ()):
+                    self._histograms((method, route))
+                    getattr(self, attribute)[(method, route)].merge(counts, total)
+
+    def share(self, store, interval=1.0):
+        """Publish these metrics to a MetricsStore every interval seconds (when they changed).
+
+        Call in each worker process; render then reports the totals of every process in the store.
+        """
+        self.store = store
+        published = [-1]
+
+        def publish():
+            while True:
+                with self._lock:
+                    observed = self._observed
+                if observed != published[0]:
+                    store.write(self.snapshot())
+                    published[0] = observed
+                time.sleep(interval)
+
+        threading.Thread(target=publish, name='metrics-publisher', daemon=True).start()
+
+    def flush(self):
+        """Publish the current metrics to the store now, e.g. before the process exits."""
+        if self.store is not None:
+            self.store.write(self.snapshot())
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format, summed over the store's processes."""
+        metrics = self
+        if self.store is not None:
+            metrics = RequestMetrics(self.latency_buckets, self.statement_buckets)
+            metrics.merge(self.snapshot())
+            for snapshot in self.store.read_others():
+                metrics.merge(snapshot)
+        return metrics._render()
+
+    def _render(self):
+        lines = []
+        with self._lock:
+            lines += [
+                '# HELP vela_http_requests_total Requests handled, by route and status.',
+                '# TYPE vela_http_requests_total counter'
+            ]
+            for (method, route, status), count in sorted(self._requests.items()):
+                lines.append(f'vela_http_requests_total{labels(method=method, route=route, status=status)} {count}')
+
+            for name, description, attribute in HISTOGRAMS:
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (method, route), histogram in sorted(getattr(self, attribute).items()):
+                    lines += render_histogram(name, histogram, method=method, route=route)
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsStore:
+    """Directory through which the worker processes of serve.py share their request metrics.
+
+    Each worker keeps a snapshot of its metrics in <pid>.<start>.json. When a worker exits the
+    master folds its last snapshot into archive.json (which lists the files it has absorbed), so
+    the totals never go backwards as workers are recycled.
+    """
+
+    ARCHIVE = 'archive.json'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.filename = f'{os.getpid()}.{time.time_ns()}.json'
+
+    def _write_json(self, filename, data):
+        path = os.path.join(self.directory, filename)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(data, file)
+        os.replace(temporary, path)
+
+    def _read_json(self, path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, snapshot):
+        """Replace this process's snapshot."""
+        self._write_json(self.filename, snapshot)
+
+    def read_others(self):
+        """Snapshots of the other processes, including the archive of exited ones."""
+        # Worker files are read before the archive: one archived in between is then counted once,
+        # through the archive, which lists it as absorbed
+        snapshots = {}
+        for path in glob.glob(os.path.join(self.directory, '*.*.json')):
+            filename = os.path.basename(path)
+            if filename != self.filename:
+                snapshot = self._read_json(path)
+                if snapshot is not None:
+                    snapshots[filename] = snapshot
+
+        archive = self._read_json(os.path.join(self.directory, self.ARCHIVE))
+        if archive is None:
+            return list(snapshots.values())
+        absorbed = set(archive['absorbed'])
+        return [archive['metrics']] + [snapshot for filename, snapshot in snapshots.items()
+                                       if filename not in absorbed]
+
+    def archive(self, pid):
+        """Fold the snapshot of an exited worker into the archive; call from the master only."""
+        paths = glob.glob(os.path.join(self.directory, f'{pid}.*.json'))
+        if not paths:
+            return
+
+        archive = self._read_json(os.path.join(self.directory, self.ARCHIVE)) or {'absorbed': [], 'metrics': None}
+        totals = RequestMetrics()
+        if archive['metrics'] is not None:
+            totals.merge(archive['metrics'])
+        for path in paths:
+            snapshot = self._read_json(path)
+            if snapshot is not None:
+                totals.merge(snapshot)
+            archive['absorbed'].append(os.path.basename(path))
+
+        self._write_json(self.ARCHIVE, {'absorbed': archive['absorbed'], 'metrics': totals.snapshot()})
+        for path in paths:
+            os.remove(path)
+
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**values):
+    """A Prometheus label set, with the values escaped."""
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in values.items()) + '}'
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_gauges(component, stats, **label_values):
+    """Gauges vela_<component>_<key> of a stats dict, e.g. TokenCache.stats().
+
+    A nested dict (e.g. 'wait_ms': {'avg': ..., 'p95': ...}) becomes one gauge with a stat label.
+    """
+    lines = []
+    for key, value in stats.items():
+        name = f'vela_{component}_{key}'
+        lines.append(f'# TYPE {name} gauge')
+        if isinstance(value, dict):
+            lines += [f'{name}{labels(**label_values, stat=stat)} {format_value(v)}' for stat, v in value.items()]
+        else:
+            lines.append(f'{name}{labels(**label_values)} {format_value(value)}')
+    return lines
+
+
+def render_histogram(name, histogram, **label_values):
+    lines = []
+    cumulative = 0
+    for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{labels(**label_values, le=format_value(bound))} {cumulative}')
+    lines.append(f'{name}_sum{labels(**label_values)} {format_value(histogram.sum)}')
+    lines.append(f'{name}_count{labels(**label_values)} {histogram.count}')
+    return lines
@@ -1,9 +1,77 @@
+from flask import current_app, g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+import sqlalchemy as sa
 import enum
+import math
 
-db = SQLAlchemy()
+
+class ShardedSession(Session):
+    """Session that routes the default-bind tables to the shard selected for the request.
+
+    With SHARD_COUNT unset this behaves exactly like the Flask-SQLAlchemy session. In sharded
+    mode users, categories and transactions live in per-shard databases and ``g.shard``
+    (set by sharding.bind_shard) decides which one a query goes to.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and current_app.config.get('SHARD_COUNT'):
+            table = None
+            if mapper is not None:
+                table = sa.inspect(mapper).local_table
+            elif isinstance(clause, sa.Table):
+                table = clause
+
+            if table is not None and table.metadata.info.get('bind_key') is None:
+                shard = g.get('shard')
+                if shard is None:
+                    raise sa.exc.UnboundExecutionError(f"No shard selected for table '{table.name}'")
+                return self._db.engines[f'shard_{shard}']
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': ShardedSession})
+
+# Money is stored in minor units: 1.00 is stored as 100
+CENTS = 100
+
+
+class Money(sa.TypeDecorator):
+    """An amount of money, stored as an integer number of cents and used as a float in Python.
+
+    Values are rounded half up to whole cents on the way in, so SQL sums over money columns are
+    exact. SQL expressions computed from these columns are in cents too; wrap them in
+    sa.type_coerce(..., Money) (or use money_sum) to read them back as amounts.
+    """
+    impl = sa.Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return value / CENTS
+
+
+def to_cents(amount):
+    """An amount as whole cents, rounded half up (repr keeps 0.285 from rounding as 0.28499...)."""
+    amount = float(amount)
+    if not math.isfinite(amount):
+        raise ValueError(f'Invalid amount: {amount}')
+    return int((Decimal(repr(amount)) * CENTS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def round_to_cents(amount):
+    """An amount as Money stores it: a float rounded to whole cents."""
+    return to_cents(amount) / CENTS
 
 
 class TransactionTypeAdapter(enum.Enum):
@@ -35,65 +103,289 @@ class TransactionType(enum.Enum):
         return None
 
 
+def single_balance_change(transaction):
+    """Signed effect of a single transaction on the balance (0 for recurring/continuous)."""
+    if transaction.is_recurring or transaction.duration_days:
+        return 0.0
+    if transaction.transaction_type == TransactionType.INCOME:
+        return transaction.amount
+    return -transaction.amount
+
+
+def scheduled_balance_change(transaction, today):
+    """Signed effect of a recurring/continuous transaction on the long-term balance as of today."""
+    if transaction.transaction_type == TransactionType.INCOME:
+        if transaction.is_recurring and transaction.cycle_days:
+            days_since_start = (today - transaction.start_date).days
+            if days_since_start >= 0:
+                return transaction.amount * ((days_since_start // transaction.cycle_days) + 1)
+            return 0.0
+        return transaction.amount
+    if transaction.duration_days:
+        return -transaction.amount if transaction.start_date <= today else 0.0
+    return -transaction.amount
+
+
+def scheduled_balance_next_change(transaction, today):
+    """First date after today on which scheduled_balance_change moves, or None if it never does."""
+    if transaction.start_date > today:
+        if transaction.transaction_type == TransactionType.INCOME:
+            if transaction.is_recurring and transaction.cycle_days:
+                return transaction.start_date
+        elif transaction.duration_days:
+            return transaction.start_date
+        return None
+
+    if transaction.transaction_type == TransactionType.INCOME and transaction.is_recurring and transaction.cycle_days:
+        cycles = ((today - transaction.start_date).days // transaction.cycle_days) + 1
+        return transaction.start_date + timedelta(days=cycles * transaction.cycle_days)
+    return None
+
+
+def single_transaction_sql():
+    """SQL test for a single transaction (neither recurring nor continuous)."""
+    return db.and_(
+        db.func.coalesce(Transaction.is_recurring, False).is_(False),
+        db.func.coalesce(Transaction.duration_days, 0) == 0
+    )
+
+
+def scheduled_transaction_sql():
+    """SQL test for a recurring or continuous transaction; the condition of idx_transactions_user_scheduled."""
+    return db.or_(Transaction.is_recurring.is_(True), Transaction.duration_days != 0)
+
+
+def single_balance_change_sql():
+    """SQL form of single_balance_change, in cents."""
+    return db.case(
+        (db.and_(single_transaction_sql(), Transaction.transaction_type == TransactionType.INCOME),
+         Transaction.amount),
+        (single_transaction_sql(), -Transaction.amount),
+        else_=0
+    )
+
+
+def scheduled_balance_change_sql(today):
+    """SQL form of scheduled_balance_change, in cents; today is a date or an SQL date expression."""
+    days_since_start = db.cast(db.func.julianday(today) - db.func.julianday(Transaction.start_date), db.Integer)
+    is_recurring_income = db.and_(
+        db.func.coalesce(Transaction.is_recurring, False).is_(True),
+        db.func.coalesce(Transaction.cycle_days, 0) != 0
+    )
+
+    return db.case(
+        (
+            Transaction.transaction_type == TransactionType.INCOME,
+            db.case(
+                (
+                    is_recurring_income,
+                    db.case(
+                        (days_since_start >= 0,
+                         Transaction.amount * (days_since_start // Transaction.cycle_days + 1)),
+                        else_=0
+                    )
+                ),
+                else_=Transaction.amount
+            )
+        ),
+        (
+            db.func.coalesce(Transaction.duration_days, 0) != 0,
+            db.case((Transaction.start_date <= today, -Transaction.amount), else_=0)
+        ),
+        else_=-Transaction.amount
+    )
+
+
+def money_sum(cents):
+    """Exact SQL SUM of an integer cents expression, read back as an amount (0 over no rows)."""
+    return sa.type_coerce(db.func.coalesce(db.func.sum(cents), 0), Money)
+
+
 class User(db.Model):
     __tablename__ = 'users'
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
-    initial_balance = db.Column(db.Float, default=0.0)
+    initial_balance = db.Column(Money, default=0.0)
+
+    # Running balance state, kept in step with transaction writes (see record_transaction)
+    single_balance = db.Column(Money, default=0.0, nullable=False)  # Net of all single transactions
+    scheduled_balance = db.Column(Money, default=0.0, nullable=False)  # Recurring/continuous part
+    scheduled_as_of = db.Column(db.Date)  # Date scheduled_balance was computed for, NULL when stale
+    scheduled_valid_until = db.Column(db.Date)  # First date scheduled_balance changes, NULL if never
+
+    # Bumped by every write to the user's transactions or categories; drives the ETags of GET responses
+    data_version = db.Column(db.Integer, default=0, nullable=False)
+
+    # daily_capacity rows are maintained for dates before this; later dates are computed on read
+    capacity_horizon = db.Column(db.Date)
+
+    # Set once the user's category_month_rollup rows are built; until then reports scan transactions
+    category_rollup_built = db.Column(db.Boolean, default=False, nullable=False)
 
     transactions = db.relationship('Transaction', backref='user', lazy=True)
     categories = db.relationship('Category', backref='user', lazy=True)
 
     @hybrid_property
     def current_total_balance(self):
-        """Dynamically calculate the current total balance."""
-        # Initial balance + sum of all single transactions
-        balance = self.initial_balance
+        """Current total balance: initial balance plus all single transactions."""
+        return round((self.initial_balance or 0.0) + (self.single_balance or 0.0), 2)
 
-        for transaction in self.transactions:
-            if not transaction.is_recurring and not transaction.duration_days:
-                # Only add single transactions to the balance
-                if transaction.transaction_type == TransactionType.INCOME:
-                    balance += transaction.amount
-                else:
-                    balance -= transaction.amount
+    @current_total_balance.expression
+    def current_total_balance(cls):
+        """SQL form: initial balance plus an integer SUM over the user's single transactions."""
+        singles = db.select(money_sum(single_balance_change_sql())).where(
+            Transaction.user_id == cls.id
+        ).scalar_subquery()
 
-        return round(balance, 2)
+        return sa.type_coerce(db.func.coalesce(cls.initial_balance, 0) + singles, Money)
 
     @hybrid_property
     def long_term_balance(self):
-        """Calculate the long-term balance including all transactions."""
-        # Start with initial balance
-        balance = self.initial_balance
-
-        # Add all income transactions (including recurring)
-        for transaction in self.transactions:
-            if transaction.transaction_type == TransactionType.INCOME:
-                if transaction.is_recurring and transaction.cycle_days:
-                    # Calculate total cycles from start_date to now
-                    today = datetime.utcnow().date()
-                    days_since_start = (today - transaction.start_date).days
-                    if days_since_start >= 0:  # Only if the recurring income has started
-                        cycles = (days_since_start // transaction.cycle_days) + 1
-                        balance += transaction.amount * cycles
-                else:  # Single income
-                    balance += transaction.amount
-            else:  # Expense transaction
-                if transaction.duration_days:
-                    # Include only if the expense period has started
-                    if transaction.start_date <= datetime.utcnow().date():
-                        balance -= transaction.amount
-                else:  # Single expense
-                    balance -= transaction.amount
-
-        return round(balance, 2)
+        """Long-term balance: current total balance plus recurring income and started continuous expenses."""
+        scheduled_balance = self.scheduled_balance_on(datetime.utcnow().date())
+        return round((self.initial_balance or 0.0) + (self.single_balance or 0.0) + scheduled_balance, 2)
+
+    @long_term_balance.expression
+    def long_term_balance(cls):
+        """SQL form: recurring income counts every cycle started by today, using julianday arithmetic."""
+        changes = db.select(money_sum(scheduled_balance_change_sql(db.func.date('now')))).where(
+            Transaction.user_id == cls.id
+        ).scalar_subquery()
+
+        return sa.type_coerce(db.func.coalesce(cls.initial_balance, 0) + changes, Money)
+
+    def scheduled_balance_is_valid(self, today):
+        """Check whether the stored scheduled_balance still applies on the given date."""
+        if self.scheduled_as_of is None or today < self.scheduled_as_of:
+            return False
+        return self.scheduled_valid_until is None or today < self.scheduled_valid_until
+
+    def scheduled_balance_on(self, today):
+        """scheduled_balance as of a date: the stored value while it is valid, otherwise recomputed.
+
+        A stale value is not written back, so reading a balance never dirties the user (which would
+        take SQLite's write lock on a read-only request); the next transaction write stores it.
+        """
+        if self.scheduled_balance_is_valid(today):
+            return self.scheduled_balance
+        return self.calculate_scheduled_balance(today)[0]
+
+    def sync_scheduled_balance(self, today=None):
+        """Refresh scheduled_balance if it is stale; call before committing a transaction write."""
+        today = today or datetime.utcnow().date()
+        if not self.scheduled_balance_is_valid(today):
+            self.refresh_scheduled_balance(today)
+
+    def calculate_scheduled_balance(self, today):
+        """The recurring/continuous part of the long-term balance on a date, and the first date it changes.
+
+        Computed from the recurring/continuous transactions only; returns (balance, valid_until).
+        """
+        scheduled = db.and_(Transaction.user_id == self.id, scheduled_transaction_sql())
+        balance = db.session.query(money_sum(scheduled_balance_change_sql(today))).filter(scheduled).scalar()
+
+        # Only rows that have not started yet and recurring income can change the balance later
+        upcoming = db.session.query(
+            Transaction.transaction_type, Transaction.is_recurring, Transaction.cycle_days,
+            Transaction.duration_days, Transaction.start_date
+        ).filter(scheduled, db.or_(Transaction.start_date > today, Transaction.is_recurring.is_(True)))
+
+        valid_until = None
+        for transaction in upcoming:
+            next_change = scheduled_balance_next_change(transaction, today)
+            if next_change and (valid_until is None or next_change < valid_until):
+                valid_until = next_change
+        return balance, valid_until
+
+    def refresh_scheduled_balance(self, today):
+        """Recompute and store the recurring/continuous part of the long-term balance."""
+        self.scheduled_balance, self.scheduled_valid_until = self.calculate_scheduled_balance(today)
+        self.scheduled_as_of = today
+
+    def record_transaction(self, transaction, sign=1):
+        """Apply (sign=1) or retract (sign=-1) a transaction's effect on the stored balance state.
+
+        Must be called in the same session as the transaction write so both commit together.
+        The single balance changes by an atomic UPDATE on the next flush, so concurrent writes for
+        the same user cannot overwrite each other's change with a balance read earlier.
+        """
+        if transaction.is_recurring or transaction.duration_days:
+            # Scheduled part is recomputed from the recurring/continuous rows by sync_scheduled_balance
+            self.scheduled_as_of = None
+        else:
+            # Add to a change not flushed yet (e.g. retract then apply in one update)
+            pending = self.__dict__.get('single_balance')
+            balance = pending if isinstance(pending, sa.sql.ClauseElement) else User.single_balance
+            self.single_balance = balance + sign * single_balance_change(transaction)
+
+    def bump_data_version(self):
+        """Mark the user's data as changed; applied as an atomic UPDATE on the next flush."""
+        self.data_version = User.data_version + 1
 
     def __repr__(self):
         return f'<User {self.username}>'
 
 
+class UserDirectory(db.Model):
+    """Maps each user to the shard holding their data (sharded mode only)."""
+    __tablename__ = 'user_directory'
+    __bind_key__ = 'directory'
+
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    shard = db.Column(db.Integer, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<UserDirectory {self.username} -> shard {self.shard}>'
+
+
+class DailyCapacity(db.Model):
+    """Per-day totals of a user's recurring income and continuous expense allocations.
+
+    Kept in step with transaction writes for dates before User.capacity_horizon (see
+    utils.record_day_capacity); a missing row means nothing is allocated on that date.
+    """
+    __tablename__ = 'daily_capacity'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    income_alloc = db.Column(db.Float, default=0.0, nullable=False)
+    expense_alloc = db.Column(db.Float, default=0.0, nullable=False)
+
+    def __repr__(self):
+        return f'<DailyCapacity {self.user_id} {self.date}: {self.income_alloc - self.expense_alloc}>'
+
+
+class CategoryMonthRollup(db.Model):
+    """Per-month category totals of a user's transactions, as shown by the monthly category report.
+
+    Transactions count in the month they start in. Recurring income is valued as of the end of
+    the month; reports correct it for months that are not over yet (see utils.read_monthly_category_stats).
+    The counts record which side of the report a category appears on; a row goes when both are zero.
+    """
+    __tablename__ = 'category_month_rollup'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
+    month = db.Column(db.Date, nullable=False)  # First day of the month
+    income = db.Column(db.Float, default=0.0, nullable=False)
+    expense = db.Column(db.Float, default=0.0, nullable=False)
+    income_count = db.Column(db.Integer, default=0, nullable=False)
+    expense_count = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_category_month_rollup_user_month', 'user_id', 'month'),
+        # Moving a category's rows, and the foreign key check on deleting a category
+        db.Index('idx_category_month_rollup_category_user', 'category_id', 'user_id'),
+    )
+
+    def __repr__(self):
+        return f'<CategoryMonthRollup {self.user_id} {self.category_id} {self.month}>'
+
+
 class Category(db.Model):
     __tablename__ = 'categories'
 
@@ -104,6 +396,10 @@ class Category(db.Model):
 
     transactions = db.relationship('Transaction', backref='category', lazy=True)
 
+    __table_args__ = (
+        db.Index('idx_categories_user_id', 'user_id'),
+    )
+
     def __repr__(self):
         return f'<Category {self.name}>'
 
@@ -114,7 +410,7 @@ class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     transaction_type = db.Column(db.Enum(TransactionType), nullable=False)
     description = db.Column(db.String(255))
 
@@ -132,5 +428,19 @@ class Transaction(db.Model):
     start_date = db.Column(db.Date, default=datetime.utcnow().date)
     end_date = db.Column(db.Date)  # For continuous expenses
 
+    __table_args__ = (
+        # Listings and reports: a user's transactions by start date (newest first or within a range)
+        db.Index('idx_transactions_user_start', 'user_id', 'start_date', 'id'),
+        # A user's transactions in a category; category_id first so that the foreign key check on
+        # deleting a category can use it too
+        db.Index('idx_transactions_category_user', 'category_id', 'user_id'),
+    )
+
     def __repr__(self):
-        return f'<Transaction {self.id}: {self.amount} ({self.transaction_type})>'
\ No newline at end of file
+        return f'<Transaction {self.id}: {self.amount} ({self.transaction_type})>'
+
+
+# Balances and day capacity only need a user's recurring and continuous transactions, usually a
+# small part of them; queries filtering on scheduled_transaction_sql() read just these rows
+db.Index('idx_transactions_user_scheduled', Transaction.user_id, Transaction.start_date,
+         sqlite_where=scheduled_transaction_sql())
\ No newline at end of file
@@ -0,0 +1,111 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from utils import hash_password, verify_password
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full; the request should be retried later."""
+
+
+class PasswordHasher:
+    """Runs password hashing on a small dedicated thread pool with a bounded queue.
+
+    PBKDF2 is deliberately slow. Running it on the request threads lets a burst of logins
+    occupy all of them; here at most max_workers hashes run at once (hashlib releases the GIL,
+    so they do not block other threads either), at most max_queue more wait, and anything
+    beyond that is rejected immediately with PasswordHasherBusy. Callers still wait on their own
+    thread, so max_workers + max_queue must stay below the request threads (see
+    Config.PASSWORD_HASH_QUEUE) for other requests to keep being served during a burst.
+    """
+
+    def __init__(self, max_workers=2, max_queue=32, iterations=260000, latency_samples=1024):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.iterations = iterations
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self._in_flight = 0
+        self._running = 0
+        self._latencies = deque(maxlen=latency_samples)  # (wait, hash) seconds of recent jobs
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hash')
+
+    def _run(self, function, *args):
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHasherBusy('Too many password operations in progress')
+            self._in_flight += 1
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+            try:
+                return function(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self._running -= 1
+                    self._in_flight -= 1
+                    self.completed += 1
+                    self._latencies.append((started - submitted, finished - started))
+
+        try:
+            future = self._executor.submit(job)
+        except RuntimeError:
+            # The executor has been shut down
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        return future.result()
+
+    def hash(self, password):
+        """Hash a password with the configured work factor."""
+        return self._run(hash_password, password, self.iterations)
+
+    def verify(self, stored_hash, password):
+        """Check a password against a stored hash, whatever parameters it was created with."""
+        return self._run(verify_password, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """Whether a stored hash was created with other parameters than the configured ones."""
+        return stored_hash.split('$', 1)[0] != f'pbkdf2:sha256:{self.iterations}'
+
+    def rehash(self, password):
+        """Hash a verified password again with the current parameters (e.g. on login)."""
+        password_hash = self.hash(password)
+        with self._lock:
+            self.rehashed += 1
+        return password_hash
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            samples = list(self._latencies)
+            stats = {
+                'workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'iterations': self.iterations,
+                'running': self._running,
+                'queue_depth': self._in_flight - self._running,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed
+            }
+
+        for name, index in (('wait_ms', 0), ('hash_ms', 1)):
+            values = sorted(sample[index] for sample in samples) or [0.0]
+            stats[name] = {
+                'avg': round(sum(values) / len(values) * 1000, 2),
+                'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 2),
+                'max': round(values[-1] * 1000, 2)
+            }
+        return stats
@@ -0,0 +1,223 @@
+"""Vectorized proration engine for category statistics.
+
+Computes the same per-category totals as utils.category_stats_for, but over NumPy arrays so
+that many transactions and many date ranges are handled with a few array operations. NumPy is
+optional: without it (or with PRORATION_ENGINE = 'python') the reports use the pure-Python path.
+"""
+from flask import current_app, has_app_context
+from config import get_config
+from models import db, Transaction, TransactionType
+from operator import attrgetter
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+# Below this many in-memory transactions building the arrays costs more than it saves
+MIN_VECTORIZED_TRANSACTIONS = 256
+
+# The proration inputs of a user's transactions starting in a date range, already numeric so the
+# rows go straight from the SQLite cursor into an array. julianday(d) - 1721424.5 is date.toordinal().
+ARRAYS_QUERY = """
+    SELECT CAST(julianday(start_date) - 1721424.5 AS INTEGER), amount / 100.0, transaction_type = 'INCOME',
+           COALESCE(is_recurring, 0), COALESCE(cycle_days, 0), COALESCE(duration_days, 0),
+           COALESCE(category_id, -1)
+    FROM transactions
+    WHERE user_id = ? AND start_date >= ? AND start_date <= ?
+    ORDER BY id
+"""
+
+
+def numpy_available():
+    return np is not None
+
+
+def configured_engine():
+    """PRORATION_ENGINE of the current app, or of the environment's config outside an app context."""
+    if has_app_context():
+        return current_app.config['PRORATION_ENGINE']
+    return get_config().PRORATION_ENGINE
+
+
+def enabled():
+    """Whether the configured engine allows the NumPy path at all."""
+    return np is not None and configured_engine() != 'python'
+
+
+def use_vectorized(transaction_count):
+    """Whether to prorate this many already loaded transactions with NumPy."""
+    if not enabled():
+        return False
+    return configured_engine() == 'numpy' or transaction_count >= MIN_VECTORIZED_TRANSACTIONS
+
+
+class TransactionArrays:
+    """Proration inputs of a list of transactions as parallel arrays, in the transactions' order."""
+
+    def __init__(self, start, amount, is_income, is_recurring, cycle, duration, category_ids, category_map):
+        self.start = start
+        self.amount = amount
+        self.is_income = is_income
+        self.is_recurring = is_recurring
+        self.cycle = cycle
+        self.duration = duration
+
+        # Categories are reported by name, so transactions are coded by category name
+        # (transactions without a known category are reported as "Uncategorized")
+        unique_ids, inverse = np.unique(category_ids, return_inverse=True)
+        self.category_names = []
+        codes = {}
+        id_codes = []
+        for category_id in unique_ids.tolist():
+            name = category_map.get(None if category_id == -1 else category_id, "Uncategorized")
+            if name not in codes:
+                codes[name] = len(self.category_names)
+                self.category_names.append(name)
+            id_codes.append(codes[name])
+        self.category = np.array(id_codes, dtype=np.int64)[inverse.reshape(-1)]
+
+    @classmethod
+    def from_transactions(cls, transactions, category_map):
+        """Arrays of already loaded transactions (ORM objects or rows)."""
+        def column(field):
+            return list(map(attrgetter(field), transactions))
+
+        return cls(
+            start=np.array([start_date.toordinal() for start_date in column('start_date')], dtype=np.int64),
+            amount=np.array(column('amount'), dtype=np.float64),
+            is_income=np.array(column('transaction_type'), dtype=object) == TransactionType.INCOME,
+            is_recurring=np.array(column('is_recurring'), dtype=object).astype(bool),
+            cycle=np.array([days or 0 for days in column('cycle_days')], dtype=np.int64),
+            duration=np.array([days or 0 for days in column('duration_days')], dtype=np.int64),
+            category_ids=np.array([-1 if cid is None else cid for cid in column('category_id')], dtype=np.int64),
+            category_map=category_map
+        )
+
+    @classmethod
+    def load(cls, user_id, start_date, end_date, category_map):
+        """Arrays of the user's transactions starting within [start_date, end_date], read with ARRAYS_QUERY.
+
+        The rows are fetched through the session's connection (so the user's shard and the
+        current database transaction apply) but with the driver cursor, skipping ORM row handling.
+        """
+        connection = db.session.connection(bind_arguments={'mapper': Transaction})
+        cursor = connection.connection.driver_connection.cursor()
+        try:
+            rows = cursor.execute(ARRAYS_QUERY, (user_id, start_date.isoformat(), end_date.isoformat())).fetchall()
+        finally:
+            cursor.close()
+
+        matrix = np.array(rows, dtype=np.float64).reshape(-1, 7)
+        integers = matrix[:, [0, 4, 5, 6]].astype(np.int64)
+        return cls(
+            start=integers[:, 0],
+            amount=matrix[:, 1],
+            is_income=matrix[:, 2] != 0,
+            is_recurring=matrix[:, 3] != 0,
+            cycle=integers[:, 1],
+            duration=integers[:, 2],
+            category_ids=integers[:, 3],
+            category_map=category_map
+        )
+
+    def __len__(self):
+        return len(self.start)
+
+
+def prorate(arrays, rows, range_start, range_end, today):
+    """Income and expense contribution of the given rows to the range each one is reported in.
+
+    range_start/range_end are per-row ordinals. Mirrors utils.prorate_for_range; returns
+    (income, expense, counts_income, counts_expense).
+    """
+    start = arrays.start[rows]
+    amount = arrays.amount[rows]
+    is_income = arrays.is_income[rows]
+    cycle = arrays.cycle[rows]
+    duration = arrays.duration[rows]
+
+    single = ~arrays.is_recurring[rows] & (duration == 0)
+    recurring = arrays.is_recurring[rows] & (cycle != 0)
+    continuous = ~single & ~recurring & (duration != 0)
+
+    # Recurring income: amount per cycle run within the range, at least one
+    range_days = np.minimum(range_end, today) - np.maximum(range_start, start) + 1
+    cycles = np.maximum(1, np.floor_divide(range_days, np.where(recurring, cycle, 1)))
+    recurring &= start <= range_end
+
+    # Continuous expense: daily share times the days active within the range
+    expense_end = start + duration
+    continuous &= (start <= range_end) & (expense_end >= range_start)
+    active_days = np.minimum(range_end, expense_end) - np.maximum(range_start, start) + 1
+    daily = amount / np.where(continuous, duration, 1)
+
+    counts_income = (single & is_income) | recurring
+    counts_expense = (single & ~is_income) | continuous
+
+    income = np.where(single, amount, 0.0)
+    income = np.where(recurring, amount * cycles, income)
+    expense = np.where(single, amount, 0.0)
+    expense = np.where(continuous, daily * active_days, expense)
+    return income, expense, counts_income, counts_expense
+
+
+def category_totals_for_ranges(arrays, ranges, today):
+    """Per-category prorated totals of the transactions for each (start, end) range.
+
+    Like utils.category_stats_for, a range only considers the transactions starting within it.
+    Returns one (income_by_category, expense_by_category, total_income, total_expense) per range,
+    with the same summation order, and so the same results, as the pure-Python path.
+    """
+    today = today.toordinal()
+    range_starts = np.array([start.toordinal() for start, _ in ranges], dtype=np.int64)
+    range_ends = np.array([end.toordinal() for _, end in ranges], dtype=np.int64)
+
+    order = np.argsort(range_starts, kind='stable')
+    if np.all(range_starts[order][1:] > range_ends[order][:-1]):
+        # Disjoint ranges: each transaction falls in at most one, found by binary search
+        position = np.searchsorted(range_starts[order], arrays.start, side='right') - 1
+        range_index = order[np.maximum(position, 0)]
+        member = (position >= 0) & (arrays.start <= range_ends[range_index])
+        memberships = [(np.flatnonzero(member), range_index[member])]
+    else:
+        # Overlapping ranges: one membership pass per range
+        memberships = []
+        for index, (start, end) in enumerate(zip(range_starts, range_ends)):
+            rows = np.flatnonzero((arrays.start >= start) & (arrays.start <= end))
+            memberships.append((rows, np.full(len(rows), index, dtype=np.int64)))
+
+    results = [[{}, {}, 0, 0] for _ in ranges]
+    categories = len(arrays.category_names)
+    size = len(ranges) * categories
+
+    for rows, range_index in memberships:
+        if not len(rows):
+            continue
+
+        income, expense, counts_income, counts_expense = prorate(
+            arrays, rows, range_starts[range_index], range_ends[range_index], today
+        )
+        category = arrays.category[rows]
+
+        for amounts, counted, side in ((income, counts_income, 0), (expense, counts_expense, 1)):
+            if not counted.any():
+                continue
+
+            # bincount adds in input order, matching the sequential sums of the Python path
+            key = range_index[counted] * categories + category[counted]
+            sums = np.bincount(key, weights=amounts[counted], minlength=size)
+            totals = np.bincount(range_index[counted], weights=amounts[counted], minlength=len(ranges))
+
+            # Categories are listed in order of first appearance, as the Python dicts are
+            first_seen = np.full(size, len(rows), dtype=np.int64)
+            np.minimum.at(first_seen, key, np.flatnonzero(counted))
+            present = np.flatnonzero(first_seen < len(rows))
+            for flat in present[np.argsort(first_seen[present], kind='stable')]:
+                index, code = divmod(int(flat), categories)
+                results[index][side][arrays.category_names[code]] = float(sums[flat])
+
+            for index in np.unique(range_index[counted]):
+                results[index][2 + side] = float(totals[index])
+
+    return [tuple(result) for result in results]
@@ -1,15 +1,110 @@
-from flask import Blueprint, request, jsonify
-from models import db, User, Transaction, TransactionType, Category
-from utils import hash_password, verify_password, calculate_day_capacity, calculate_category_stats
+from flask import Blueprint, Response, current_app, request, jsonify, make_response, stream_with_context
+from models import db, User, Transaction, TransactionType, Category, round_to_cents
+from sharding import bind_shard, register_in_directory, shard_for_user_id, shard_for_username, sharding_enabled
+from utils import read_day_capacity, read_day_capacity_trend, \
+    record_day_capacity, record_category_rollup, apply_category_rollup, category_rollup_deltas, \
+    move_category_rollup, read_daily_category_stats, read_monthly_category_stats, calculate_period_stats, \
+    period_bounds, PERIOD_GRANULARITIES
+from metrics import render_gauges
+from passwords import PasswordHasherBusy
+from sqlalchemy import event, inspect
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from werkzeug.local import LocalProxy
 from datetime import datetime, timedelta
 from functools import wraps
+import base64
+import binascii
+import csv
+import io
+import json
 import jwt
 import os
 import calendar
 
 api = Blueprint('api', __name__)
-SECRET_KEY = os.environ.get('SECRET_KEY', 'vela-system-secret-key')
+
+# Transaction export: format -> (mimetype, file extension), and column order
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson')
+}
+EXPORT_FIELDS = [
+    'id', 'amount', 'transaction_type', 'transaction_mode', 'category_id', 'category_name', 'description',
+    'created_at', 'start_date', 'end_date', 'is_recurring', 'cycle_days', 'duration_days'
+]
+
+
+
+def app_extension(name):
+    """Proxy to a per-app object that create_app keeps in app.extensions."""
+    return LocalProxy(lambda: current_app.extensions[name])
+
+
+# The current app's caches, password hashing pool and request metrics (see app.init_extensions)
+token_cache = app_extension('token_cache')
+report_cache = app_extension('report_cache')
+password_hasher = app_extension('password_hasher')
+request_metrics = app_extension('request_metrics')
+
+
+@event.listens_for(User, 'after_update')
+def invalidate_cached_user_on_update(mapper, connection, target):
+    """Drop cached tokens when the identity columns of the user row change.
+
+    Balance columns are never cached, so the running-balance updates made by
+    every transaction write do not need to evict the user.
+    """
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('id', 'username', 'password_hash')):
+        token_cache.invalidate_user(target.id)
+
+
+@event.listens_for(User, 'before_update')
+def invalidate_cached_reports_on_update(mapper, connection, target):
+    """Drop cached reports when data_version is about to move, since their keys can no longer match.
+
+    bump_data_version() assigns a SQL expression, which is expired by the time after_update
+    runs, so the check has to happen before the flush.
+    """
+    if inspect(target).attrs.data_version.history.has_changes():
+        report_cache.invalidate_user(target.id)
+
+
+@event.listens_for(User, 'after_delete')
+def invalidate_cached_user_on_delete(mapper, connection, target):
+    token_cache.invalidate_user(target.id)
+    report_cache.invalidate_user(target.id)
+
+
+def encode_cursor(transaction):
+    """Opaque keyset cursor for the position just after a transaction in the listing order."""
+    raw = f"{transaction.start_date.strftime('%Y-%m-%d')}|{transaction.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        start_date, transaction_id = raw.split('|')
+        return datetime.strptime(start_date, '%Y-%m-%d').date(), int(transaction_id)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise ValueError(f'Invalid cursor: {cursor}')
+
+
+def cached_user(user_id, username, shard):
+    """Attach a User with only its identity loaded; other columns load on first access.
+
+    In sharded mode the row is loaded from the cached shard right away instead, so a user moved to
+    another shard since (db_manage.py shards import/rebalance) is a miss: None is returned.
+    """
+    bind_shard(shard)
+    if sharding_enabled():
+        return db.session.get(User, user_id) if shard is not None else None
+    user = User(id=user_id, username=username)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
 
 
 # Authentication decorator
@@ -25,11 +120,22 @@ def token_required(f):
             if token.startswith('Bearer '):
                 token = token[7:]
 
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            current_user = User.query.filter_by(id=data['user_id']).first()
-
-            if not current_user:
-                return jsonify({'message': 'User not found!'}), 401
+            identity = token_cache.get(token)
+            current_user = cached_user(*identity) if identity else None
+            if current_user is None:
+                if identity:
+                    # The user's shard changed; look it up in the directory again
+                    token_cache.invalidate_user(identity[0])
+                data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+                shard = shard_for_user_id(data['user_id'])
+                bind_shard(shard)
+                current_user = User.query.filter_by(id=data['user_id']).first()
+
+                if not current_user:
+                    return jsonify({'message': 'User not found!'}), 401
+
+                if shard is not None or not sharding_enabled():
+                    token_cache.put(token, (current_user.id, current_user.username, shard), data.get('exp'))
         except:
             return jsonify({'message': 'Token is invalid!'}), 401
 
@@ -38,6 +144,54 @@ def token_required(f):
     return decorated
 
 
+def cached_report(current_user, kind, params, build):
+    """Return a report from the report cache, building and caching it on a miss.
+
+    Keys include the user's data_version, so any write to the user's data is a miss, and
+    today's date, since recurring income is prorated up to today.
+    """
+    key = (current_user.id, kind, params, current_user.data_version, datetime.utcnow().date())
+    report = report_cache.get(key)
+    if report is None:
+        report = build()
+        report_cache.put(key, report)
+    return report
+
+
+def conditional_get(f):
+    """Answer If-None-Match with 304 when the user's data has not changed since the ETag was issued.
+
+    The ETag combines the user's data_version (one primary key lookup) with today's date, since
+    balances and default report dates move with the calendar even when no data changes.
+    """
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        etag = '-'.join([
+            current_app.config['API_VERSION'],
+            str(current_user.id),
+            str(current_user.data_version),
+            datetime.utcnow().strftime('%Y%m%d')
+        ])
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(f(current_user, *args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    return decorated
+
+
+def server_busy():
+    """503 for requests rejected because the password hashing queue is full."""
+    return jsonify({'message': 'Server is busy, please retry shortly'}), 503, {'Retry-After': '1'}
+
+
 # Authentication routes
 @api.route('/register', methods=['POST'])
 def register():
@@ -48,19 +202,45 @@ def register():
 
     username = data['username']
     password = data['password']
-    initial_balance = data.get('initial_balance', 0.0)
+    try:
+        # Money is kept in whole cents
+        initial_balance = round_to_cents(data.get('initial_balance') or 0.0)
+    except (TypeError, ValueError):
+        return jsonify({'message': 'Invalid initial_balance'}), 400
 
     # Check if user already exists
-    if User.query.filter_by(username=username).first():
+    if sharding_enabled():
+        if shard_for_username(username) is not None:
+            return jsonify({'message': 'Username already exists'}), 400
+    elif User.query.filter_by(username=username).first():
         return jsonify({'message': 'Username already exists'}), 400
 
+    try:
+        password_hash = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return server_busy()
+
     # Create new user
     new_user = User(
         username=username,
-        password_hash=hash_password(password),
-        initial_balance=initial_balance
+        password_hash=password_hash,
+        initial_balance=initial_balance,
+        # Nothing to materialize yet, so the user's daily_capacity and rollup rows start out complete
+        capacity_horizon=datetime.utcnow().date() + timedelta(days=current_app.config['CAPACITY_HORIZON_DAYS']),
+        category_rollup_built=True
     )
 
+    # In sharded mode the directory assigns the user id and the shard that stores the user
+    if sharding_enabled():
+        try:
+            entry = register_in_directory(username)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'message': 'Username already exists'}), 400
+        new_user.id = entry.id
+        bind_shard(entry.shard)
+
     db.session.add(new_user)
 
     try:
@@ -84,6 +264,10 @@ def register():
         return jsonify({'message': 'User created successfully with default categories'}), 201
     except IntegrityError:
         db.session.rollback()
+        if sharding_enabled():
+            # Release the directory entry so the username can be registered again
+            db.session.delete(entry)
+            db.session.commit()
         return jsonify({'message': 'An error occurred'}), 500
 
 
@@ -94,16 +278,29 @@ def login():
     if not data or not data.get('username') or not data.get('password'):
         return jsonify({'message': 'Missing username or password'}), 400
 
-    user = User.query.filter_by(username=data['username']).first()
+    if sharding_enabled():
+        shard = shard_for_username(data['username'])
+        bind_shard(shard)
+        user = User.query.filter_by(username=data['username']).first() if shard is not None else None
+    else:
+        user = User.query.filter_by(username=data['username']).first()
+
+    try:
+        if not user or not password_hasher.verify(user.password_hash, data['password']):
+            return jsonify({'message': 'Invalid username or password'}), 401
 
-    if not user or not verify_password(user.password_hash, data['password']):
-        return jsonify({'message': 'Invalid username or password'}), 401
+        # Upgrade hashes created with older parameters while the plain password is at hand
+        if password_hasher.needs_rehash(user.password_hash):
+            user.password_hash = password_hasher.rehash(data['password'])
+            db.session.commit()
+    except PasswordHasherBusy:
+        return server_busy()
 
     # Generate JWT token
     token = jwt.encode({
         'user_id': user.id,
         'exp': datetime.utcnow() + timedelta(days=1)  # 1 day expiration
-    }, SECRET_KEY, algorithm="HS256")
+    }, current_app.config['SECRET_KEY'], algorithm="HS256")
 
     return jsonify({
         'token': token,
@@ -117,6 +314,7 @@ def login():
 # Categories routes
 @api.route('/categories', methods=['GET'])
 @token_required
+@conditional_get
 def get_categories(current_user):
     categories = Category.query.filter_by(user_id=current_user.id).all()
 
@@ -147,6 +345,7 @@ def create_category(current_user):
     )
 
     db.session.add(new_category)
+    current_user.bump_data_version()
 
     try:
         db.session.commit()
@@ -177,6 +376,8 @@ def update_category(current_user, category_id):
     if 'description' in data:
         category.description = data['description']
 
+    current_user.bump_data_version()
+
     try:
         db.session.commit()
         return jsonify({
@@ -203,14 +404,17 @@ def delete_category(current_user, category_id):
     # Find default "Other" category to move transactions to
     other_category = Category.query.filter_by(user_id=current_user.id, name="Other").first()
 
-    if other_category:
-        # Move all transactions from deleted category to "Other"
-        transactions = Transaction.query.filter_by(category_id=category_id).all()
-        for transaction in transactions:
-            transaction.category_id = other_category.id
+    # Move all transactions from deleted category to "Other", or leave them uncategorized
+    # when there is no "Other" category (or it is the one being deleted)
+    new_category_id = other_category.id if other_category and other_category.id != category_id else None
+    transactions = Transaction.query.filter_by(user_id=current_user.id, category_id=category_id).all()
+    for transaction in transactions:
+        transaction.category_id = new_category_id
+    move_category_rollup(current_user, category_id, new_category_id)
 
     # Delete category
     db.session.delete(category)
+    current_user.bump_data_version()
 
     try:
         db.session.commit()
@@ -221,70 +425,102 @@ def delete_category(current_user, category_id):
 
 
 # Transaction routes
-@api.route('/transactions', methods=['POST'])
-@token_required
-def create_transaction(current_user):
-    data = request.get_json()
+def build_transaction(current_user, data, category_ids=None):
+    """Validate a create-transaction payload and build the (unsaved) Transaction.
 
-    if not data or 'amount' not in data or 'transaction_type' not in data:
-        return jsonify({'message': 'Missing required fields'}), 400
+    Returns (transaction, None) on success or (None, (message, status_code)) on a validation error.
+    category_ids is the set of the user's category ids; when omitted the category is looked up.
+    """
+    if not isinstance(data, dict) or 'amount' not in data or 'transaction_type' not in data:
+        return None, ('Missing required fields', 400)
 
     # Convert transaction_type to lowercase for database compatibility
-    transaction_type_raw = data['transaction_type'].lower()
+    transaction_type_raw = str(data['transaction_type']).lower()
 
     # Validate transaction type
     try:
         transaction_type = TransactionType(transaction_type_raw)
     except ValueError:
-        return jsonify({'message': 'Invalid transaction type'}), 400
+        return None, ('Invalid transaction type', 400)
 
     # Get transaction mode (single, recurring, or continuous)
     transaction_mode = data.get('transaction_mode', 'single')
 
     # Validate the combination of transaction type and mode
     if transaction_mode not in ['single', 'recurring', 'continuous']:
-        return jsonify({'message': 'Invalid transaction mode. Must be "single", "recurring", or "continuous"'}), 400
+        return None, ('Invalid transaction mode. Must be "single", "recurring", or "continuous"', 400)
 
     if transaction_mode == 'recurring' and transaction_type != TransactionType.INCOME:
-        return jsonify({'message': 'Only income transactions can be recurring'}), 400
+        return None, ('Only income transactions can be recurring', 400)
 
     if transaction_mode == 'continuous' and transaction_type != TransactionType.EXPENSE:
-        return jsonify({'message': 'Only expense transactions can be continuous'}), 400
+        return None, ('Only expense transactions can be continuous', 400)
 
     # Validate required fields based on transaction mode
     if transaction_mode == 'recurring' and not data.get('cycle_days'):
-        return jsonify({'message': 'Cycle days required for recurring transactions'}), 400
+        return None, ('Cycle days required for recurring transactions', 400)
 
     if transaction_mode == 'continuous' and not data.get('duration_days'):
-        return jsonify({'message': 'Duration days required for continuous transactions'}), 400
+        return None, ('Duration days required for continuous transactions', 400)
 
     # Validate category if provided
     category_id = data.get('category_id')
     if category_id:
-        category = Category.query.filter_by(id=category_id, user_id=current_user.id).first()
-        if not category:
-            return jsonify({'message': 'Category not found'}), 404
+        # JSON clients may send the id as a string; both endpoints look it up as an int
+        try:
+            category_id = int(category_id)
+        except (TypeError, ValueError):
+            return None, ('Invalid category_id', 400)
+        if category_ids is None:
+            category_exists = Category.query.filter_by(id=category_id, user_id=current_user.id).first() is not None
+        else:
+            category_exists = category_id in category_ids
+        if not category_exists:
+            return None, ('Category not found', 404)
+
+    try:
+        amount = round_to_cents(data['amount'])
+        start_date = datetime.strptime(data.get('start_date', datetime.utcnow().strftime('%Y-%m-%d')), '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None, ('Invalid amount or start_date format, use YYYY-MM-DD', 400)
 
     # Create new transaction
     new_transaction = Transaction(
         user_id=current_user.id,
         category_id=category_id,
-        amount=float(data['amount']),
+        amount=amount,
         transaction_type=transaction_type,
         description=data.get('description', ''),
         is_recurring=transaction_mode == 'recurring',
         cycle_days=data.get('cycle_days') if transaction_mode == 'recurring' else None,
         duration_days=data.get('duration_days') if transaction_mode == 'continuous' else None,
-        start_date=datetime.strptime(data.get('start_date', datetime.utcnow().strftime('%Y-%m-%d')), '%Y-%m-%d').date()
+        start_date=start_date
     )
 
     # Calculate end_date for continuous expenses
     if transaction_mode == 'continuous' and new_transaction.duration_days:
         new_transaction.end_date = new_transaction.start_date + timedelta(days=new_transaction.duration_days)
 
+    return new_transaction, None
+
+
+@api.route('/transactions', methods=['POST'])
+@token_required
+def create_transaction(current_user):
+    data = request.get_json()
+
+    new_transaction, error = build_transaction(current_user, data)
+    if error:
+        return jsonify({'message': error[0]}), error[1]
+
     db.session.add(new_transaction)
+    current_user.record_transaction(new_transaction)
+    record_day_capacity(current_user, new_transaction)
+    record_category_rollup(current_user, new_transaction)
+    current_user.bump_data_version()
 
     try:
+        current_user.sync_scheduled_balance()
         db.session.commit()
         return jsonify({
             'message': 'Transaction created successfully',
@@ -297,76 +533,65 @@ def create_transaction(current_user):
         return jsonify({'message': f'An error occurred: {str(e)}'}), 500
 
 
-@api.route('/transactions', methods=['GET'])
+@api.route('/transactions/batch', methods=['POST'])
 @token_required
-def get_transactions(current_user):
-    # Get query parameters
-    start_date = request.args.get('start')
-    end_date = request.args.get('end')
-    category_id = request.args.get('category_id')
+def create_transactions_batch(current_user):
+    data = request.get_json()
 
-    query = Transaction.query.filter_by(user_id=current_user.id)
+    if not data or not isinstance(data.get('transactions'), list):
+        return jsonify({'message': 'A list of transactions is required'}), 400
 
-    # Apply date filters if provided
-    if start_date:
-        start = datetime.strptime(start_date, '%Y-%m-%d').date()
-        query = query.filter(Transaction.start_date >= start)
+    items = data['transactions']
+    max_items = current_app.config['TRANSACTIONS_BATCH_MAX_SIZE']
+    if len(items) > max_items:
+        return jsonify({'message': f'At most {max_items} transactions can be created per batch'}), 400
 
-    if end_date:
-        end = datetime.strptime(end_date, '%Y-%m-%d').date()
-        query = query.filter(Transaction.start_date <= end)
+    # Validate every referenced category with a single query
+    category_ids = {
+        category_id for (category_id,) in db.session.query(Category.id).filter_by(user_id=current_user.id)
+    }
 
-    # Apply category filter if provided
-    if category_id:
-        query = query.filter(Transaction.category_id == category_id)
+    results = []
+    new_transactions = []
+    for index, item in enumerate(items):
+        new_transaction, error = build_transaction(current_user, item, category_ids)
+        if error:
+            results.append({'index': index, 'status': error[1], 'message': error[0]})
+            continue
 
-    transactions = query.all()
+        results.append({'index': index, 'status': 201})
+        new_transactions.append((index, new_transaction))
+        current_user.record_transaction(new_transaction)
+        record_day_capacity(current_user, new_transaction)
 
-    result = []
-    for t in transactions:
-        category_name = t.category.name if t.category else None
+    db.session.add_all([t for _, t in new_transactions])
+    apply_category_rollup(current_user, category_rollup_deltas([t for _, t in new_transactions]))
+    current_user.bump_data_version()
 
-        # Determine transaction mode
-        transaction_mode = "single"
-        if t.is_recurring:
-            transaction_mode = "recurring"
-        elif t.duration_days:
-            transaction_mode = "continuous"
+    try:
+        # The flush batches the rows into multi-row INSERTs inside one database transaction
+        db.session.flush()
+        for index, new_transaction in new_transactions:
+            results[index]['transaction_id'] = new_transaction.id
 
-        result.append({
-            'id': t.id,
-            'amount': t.amount,
-            'transaction_type': t.transaction_type.value,
-            'transaction_mode': transaction_mode,
-            'category_id': t.category_id,
-            'category_name': category_name,
-            'description': t.description,
-            'created_at': t.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'start_date': t.start_date.strftime('%Y-%m-%d'),
-            'end_date': t.end_date.strftime('%Y-%m-%d') if t.end_date else None,
-            'is_recurring': t.is_recurring,
-            'cycle_days': t.cycle_days,
-            'duration_days': t.duration_days
-        })
+        current_user.sync_scheduled_balance()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'An error occurred: {str(e)}'}), 500
 
     return jsonify({
-        'transactions': result,
+        'message': f'{len(new_transactions)} of {len(items)} transactions created',
+        'created': len(new_transactions),
+        'failed': len(items) - len(new_transactions),
+        'results': results,
         'current_total_balance': current_user.current_total_balance,
         'long_term_balance': current_user.long_term_balance
-    }), 200
+    }), 201
 
 
-@api.route('/transactions/<int:transaction_id>', methods=['GET'])
-@token_required
-def get_transaction(current_user, transaction_id):
-    transaction = Transaction.query.filter_by(
-        id=transaction_id,
-        user_id=current_user.id
-    ).first()
-
-    if not transaction:
-        return jsonify({'message': 'Transaction not found'}), 404
-
+def transaction_to_dict(transaction, category_name):
+    """Serialize a transaction for API responses and exports."""
     # Determine transaction mode
     transaction_mode = "single"
     if transaction.is_recurring:
@@ -374,8 +599,7 @@ def get_transaction(current_user, transaction_id):
     elif transaction.duration_days:
         transaction_mode = "continuous"
 
-    category_name = transaction.category.name if transaction.category else None
-    result = {
+    return {
         'id': transaction.id,
         'amount': transaction.amount,
         'transaction_type': transaction.transaction_type.value,
@@ -391,6 +615,153 @@ def get_transaction(current_user, transaction_id):
         'duration_days': transaction.duration_days
     }
 
+
+def filter_transactions(query):
+    """Apply the start/end/category_id request filters; raises ValueError on a bad date."""
+    start_date = request.args.get('start')
+    end_date = request.args.get('end')
+    category_id = request.args.get('category_id')
+
+    # Apply date filters if provided
+    try:
+        if start_date:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+            query = query.filter(Transaction.start_date >= start)
+
+        if end_date:
+            end = datetime.strptime(end_date, '%Y-%m-%d').date()
+            query = query.filter(Transaction.start_date <= end)
+    except ValueError:
+        raise ValueError('Invalid date format, use YYYY-MM-DD')
+
+    # Apply category filter if provided
+    if category_id:
+        query = query.filter(Transaction.category_id == category_id)
+
+    return query
+
+
+@api.route('/transactions', methods=['GET'])
+@token_required
+@conditional_get
+def get_transactions(current_user):
+    # Get query parameters
+    after = request.args.get('after')
+    include_balances = request.args.get('include_balances', 'false').lower() in ('true', '1')
+
+    try:
+        limit = int(request.args.get('limit', current_app.config['TRANSACTIONS_PAGE_SIZE']))
+    except ValueError:
+        return jsonify({'message': 'limit must be an integer'}), 400
+
+    max_limit = current_app.config['TRANSACTIONS_MAX_PAGE_SIZE']
+    if limit < 1 or limit > max_limit:
+        return jsonify({'message': f'limit must be between 1 and {max_limit}'}), 400
+
+    # Load category names in the same SELECT instead of one lazy load per row
+    query = Transaction.query.options(joinedload(Transaction.category)).filter_by(user_id=current_user.id)
+
+    try:
+        query = filter_transactions(query)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    # Resume after the cursor position; listing order is newest first, ties broken by id
+    if after:
+        try:
+            after_date, after_id = decode_cursor(after)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+
+        query = query.filter(db.or_(
+            Transaction.start_date < after_date,
+            db.and_(Transaction.start_date == after_date, Transaction.id < after_id)
+        ))
+
+    # Fetch one extra row to know whether another page follows
+    transactions = query.order_by(Transaction.start_date.desc(), Transaction.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        next_cursor = encode_cursor(transactions[-1])
+
+    result = [transaction_to_dict(t, t.category.name if t.category else None) for t in transactions]
+
+    response = {
+        'transactions': result,
+        'next_cursor': next_cursor
+    }
+
+    if include_balances:
+        response['current_total_balance'] = current_user.current_total_balance
+        response['long_term_balance'] = current_user.long_term_balance
+
+    return jsonify(response), 200
+
+
+@api.route('/transactions/export', methods=['GET'])
+@token_required
+@conditional_get
+def export_transactions(current_user):
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'message': 'Invalid format. Must be "csv" or "ndjson"'}), 400
+
+    # Select category names alongside the rows so the stream needs no lazy loads
+    query = db.session.query(Transaction, Category.name).outerjoin(
+        Category, Transaction.category_id == Category.id
+    ).filter(Transaction.user_id == current_user.id)
+
+    try:
+        query = filter_transactions(query)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    chunk_size = current_app.config['EXPORT_CHUNK_SIZE']
+    rows = query.order_by(Transaction.start_date.desc(), Transaction.id.desc()).yield_per(chunk_size)
+
+    def generate():
+        # Rows are fetched from the cursor chunk_size at a time and written out as each chunk fills
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        if export_format == 'csv':
+            writer.writeheader()
+
+        for count, (transaction, category_name) in enumerate(rows, 1):
+            record = transaction_to_dict(transaction, category_name)
+            if export_format == 'csv':
+                writer.writerow(record)
+            else:
+                buffer.write(json.dumps(record) + '\n')
+
+            if count % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    return Response(stream_with_context(generate()), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=transactions.{extension}'
+    })
+
+
+@api.route('/transactions/<int:transaction_id>', methods=['GET'])
+@token_required
+@conditional_get
+def get_transaction(current_user, transaction_id):
+    transaction = Transaction.query.options(joinedload(Transaction.category)).filter_by(
+        id=transaction_id,
+        user_id=current_user.id
+    ).first()
+
+    if not transaction:
+        return jsonify({'message': 'Transaction not found'}), 404
+
+    category_name = transaction.category.name if transaction.category else None
+    result = transaction_to_dict(transaction, category_name)
+
     return jsonify(result), 200
 
 
@@ -406,6 +777,20 @@ def update_transaction(current_user, transaction_id):
         return jsonify({'message': 'Transaction not found'}), 404
 
     data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({'message': 'Missing required fields'}), 400
+
+    # Parse the new amount and start date before anything is retracted
+    try:
+        amount = round_to_cents(data['amount']) if 'amount' in data else None
+        start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date() if 'start_date' in data else None
+    except (TypeError, ValueError):
+        return jsonify({'message': 'Invalid amount or start_date format, use YYYY-MM-DD'}), 400
+
+    # Retract the old values from the stored balances; the new values are applied before commit
+    current_user.record_transaction(transaction, -1)
+    record_day_capacity(current_user, transaction, -1)
+    record_category_rollup(current_user, transaction, -1)
 
     # Check if transaction mode is being updated
     if 'transaction_mode' in data:
@@ -457,8 +842,8 @@ def update_transaction(current_user, transaction_id):
                 transaction.end_date = transaction.start_date + timedelta(days=transaction.duration_days)
 
     # Update other fields if provided
-    if 'amount' in data:
-        transaction.amount = float(data['amount'])
+    if amount is not None:
+        transaction.amount = amount
 
     if 'transaction_type' in data and 'transaction_mode' not in data:
         try:
@@ -508,13 +893,19 @@ def update_transaction(current_user, transaction_id):
         else:
             return jsonify({'message': 'Cannot set duration_days for recurring or income transactions'}), 400
 
-    if 'start_date' in data:
-        transaction.start_date = datetime.strptime(data['start_date'], '%Y-%m-%d').date()
+    if start_date is not None:
+        transaction.start_date = start_date
         # Update end_date if start_date changes and transaction has duration
         if transaction.duration_days:
             transaction.end_date = transaction.start_date + timedelta(days=transaction.duration_days)
 
+    current_user.record_transaction(transaction)
+    record_day_capacity(current_user, transaction)
+    record_category_rollup(current_user, transaction)
+    current_user.bump_data_version()
+
     try:
+        current_user.sync_scheduled_balance()
         db.session.commit()
         return jsonify({
             'message': 'Transaction updated successfully',
@@ -537,9 +928,14 @@ def delete_transaction(current_user, transaction_id):
     if not transaction:
         return jsonify({'message': 'Transaction not found'}), 404
 
+    current_user.record_transaction(transaction, -1)
+    record_day_capacity(current_user, transaction, -1)
+    record_category_rollup(current_user, transaction, -1)
     db.session.delete(transaction)
+    current_user.bump_data_version()
 
     try:
+        current_user.sync_scheduled_balance()
         db.session.commit()
         return jsonify({
             'message': 'Transaction deleted successfully',
@@ -574,9 +970,11 @@ def update_transaction_category(current_user, transaction_id):
         category = Category.query.filter_by(id=category_id, user_id=current_user.id).first()
         if not category:
             return jsonify({'message': 'Category not found'}), 404
-        transaction.category_id = category_id
-    else:
-        transaction.category_id = None
+
+    record_category_rollup(current_user, transaction, -1)
+    transaction.category_id = category_id or None
+    record_category_rollup(current_user, transaction)
+    current_user.bump_data_version()
 
     try:
         db.session.commit()
@@ -589,6 +987,7 @@ def update_transaction_category(current_user, transaction_id):
 # Reports routes
 @api.route('/reports/day_capacity', methods=['GET'])
 @token_required
+@conditional_get
 def get_day_capacity(current_user):
     date = request.args.get('date', datetime.utcnow().strftime('%Y-%m-%d'))
 
@@ -598,7 +997,7 @@ def get_day_capacity(current_user):
     except ValueError:
         return jsonify({'message': 'Invalid date format, use YYYY-MM-DD'}), 400
 
-    day_capacity = calculate_day_capacity(current_user, date)
+    day_capacity = read_day_capacity(current_user, date)
 
     return jsonify({
         'date': date,
@@ -610,6 +1009,7 @@ def get_day_capacity(current_user):
 
 @api.route('/reports/summary', methods=['GET'])
 @token_required
+@conditional_get
 def get_summary(current_user):
     start_date = request.args.get('start')
     end_date = request.args.get('end')
@@ -623,51 +1023,43 @@ def get_summary(current_user):
     except ValueError:
         return jsonify({'message': 'Invalid date format, use YYYY-MM-DD'}), 400
 
-    # Calculate summary
-    total_income = 0
-    total_expense = 0
-
-    # Get all transactions in date range
-    transactions = Transaction.query.filter_by(user_id=current_user.id).filter(
-        Transaction.start_date >= start,
-        Transaction.start_date <= end
-    ).all()
-
-    # Calculate day_capacity for each day in range
-    days = (end - start).days + 1
-    day_capacity_trend = []
-
-    for i in range(days):
-        current_date = start + timedelta(days=i)
-        day_capacity = calculate_day_capacity(current_user, current_date)
-        day_capacity_trend.append({
-            'date': current_date.strftime('%Y-%m-%d'),
-            'day_capacity': day_capacity
-        })
-
-    # Calculate income and expense totals
-    for t in transactions:
-        if not t.is_recurring and not t.duration_days:  # Only count single transactions
-            if t.transaction_type == TransactionType.INCOME:
-                total_income += t.amount
-            else:
-                total_expense += t.amount
+    summary = summary_report(current_user, start, end)
+    return jsonify({'start_date': start_date, 'end_date': end_date, **summary}), 200
+
+
+def summary_report(current_user, start, end):
+    """Single-transaction totals and the day capacity trend of a date range (cached)."""
+    def build_summary():
+        # Only single transactions count towards the totals; sum them per type in SQL
+        totals = dict(db.session.query(Transaction.transaction_type, db.func.sum(Transaction.amount)).filter(
+            Transaction.user_id == current_user.id,
+            Transaction.start_date >= start,
+            Transaction.start_date <= end,
+            db.or_(Transaction.is_recurring.is_(False), Transaction.is_recurring.is_(None)),
+            db.or_(Transaction.duration_days.is_(None), Transaction.duration_days == 0)
+        ).group_by(Transaction.transaction_type).all())
+        total_income = totals.get(TransactionType.INCOME) or 0
+        total_expense = totals.get(TransactionType.EXPENSE) or 0
+
+        # Calculate day_capacity for each day in range
+        day_capacity_trend = read_day_capacity_trend(current_user, start, end)
+
+        return {
+            'total_income': round(total_income, 2),
+            'total_expense': round(total_expense, 2),
+            'net_change': round(total_income - total_expense, 2),
+            'current_total_balance': current_user.current_total_balance,
+            'long_term_balance': current_user.long_term_balance,
+            'day_capacity_trend': day_capacity_trend
+        }
 
-    return jsonify({
-        'start_date': start_date,
-        'end_date': end_date,
-        'total_income': round(total_income, 2),
-        'total_expense': round(total_expense, 2),
-        'net_change': round(total_income - total_expense, 2),
-        'current_total_balance': current_user.current_total_balance,
-        'long_term_balance': current_user.long_term_balance,
-        'day_capacity_trend': day_capacity_trend
-    }), 200
+    return cached_report(current_user, 'summary', (start, end), build_summary)
 
 
 # Category reports
 @api.route('/reports/categories/daily', methods=['GET'])
 @token_required
+@conditional_get
 def get_daily_category_report(current_user):
     date = request.args.get('date', datetime.utcnow().strftime('%Y-%m-%d'))
 
@@ -678,7 +1070,8 @@ def get_daily_category_report(current_user):
         return jsonify({'message': 'Invalid date format, use YYYY-MM-DD'}), 400
 
     # Get category statistics for the day
-    stats = calculate_category_stats(current_user, date_obj, date_obj)
+    stats = cached_report(current_user, 'categories', (date_obj, date_obj),
+                          lambda: read_daily_category_stats(current_user, date_obj))
 
     return jsonify({
         'date': date,
@@ -691,6 +1084,7 @@ def get_daily_category_report(current_user):
 
 @api.route('/reports/categories/monthly', methods=['GET'])
 @token_required
+@conditional_get
 def get_monthly_category_report(current_user):
     year = request.args.get('year')
     month = request.args.get('month')
@@ -711,7 +1105,8 @@ def get_monthly_category_report(current_user):
         return jsonify({'message': 'Invalid year or month format'}), 400
 
     # Get category statistics for the month
-    stats = calculate_category_stats(current_user, first_day, last_day)
+    stats = cached_report(current_user, 'categories', (first_day, last_day),
+                          lambda: read_monthly_category_stats(current_user, first_day, last_day))
 
     return jsonify({
         'year': year,
@@ -723,6 +1118,144 @@ def get_monthly_category_report(current_user):
     }), 200
 
 
+@api.route('/reports/periods', methods=['GET'])
+@token_required
+@conditional_get
+def get_period_report(current_user):
+    start_date = request.args.get('start')
+    end_date = request.args.get('end')
+    granularity = request.args.get('granularity', 'month')
+
+    if not start_date or not end_date:
+        return jsonify({'message': 'Both start and end dates are required'}), 400
+
+    if granularity not in PERIOD_GRANULARITIES:
+        return jsonify({'message': f'Invalid granularity, use one of: {", ".join(PERIOD_GRANULARITIES)}'}), 400
+
+    try:
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format, use YYYY-MM-DD'}), 400
+
+    if start > end:
+        return jsonify({'message': 'Start date cannot be after end date'}), 400
+
+    max_periods = current_app.config['REPORT_MAX_PERIODS']
+    if len(period_bounds(start, end, granularity)) > max_periods:
+        return jsonify({'message': f'At most {max_periods} periods can be reported per request'}), 400
+
+    periods = cached_report(current_user, 'periods', (start, end, granularity),
+                            lambda: calculate_period_stats(current_user, start, end, granularity))
+
+    return jsonify({
+        'start': start_date,
+        'end': end_date,
+        'granularity': granularity,
+        'periods': periods
+    }), 200
+
+
+# Dashboard sections, in response order
+DASHBOARD_SECTIONS = (
+    'balances', 'categories', 'recent_transactions', 'day_capacity', 'monthly_summary', 'day_capacity_trend',
+    'monthly_categories'
+)
+
+
+@api.route('/dashboard', methods=['GET'])
+@token_required
+@conditional_get
+def get_dashboard(current_user):
+    """Everything the dashboard page shows, in one request.
+
+    Sections share the authenticated user, its balances and the report cache entries of the
+    individual /reports endpoints. ?sections= (comma separated) limits the response to some of
+    them; ?date= is the client's today and ?days= the length of the day capacity trend.
+    """
+    sections = request.args.get('sections')
+    sections = [s.strip() for s in sections.split(',') if s.strip()] if sections else list(DASHBOARD_SECTIONS)
+    unknown = [s for s in sections if s not in DASHBOARD_SECTIONS]
+    if unknown:
+        return jsonify({'message': f'Invalid sections: {", ".join(unknown)}; use any of: '
+                                   f'{", ".join(DASHBOARD_SECTIONS)}'}), 400
+
+    try:
+        today = datetime.strptime(request.args['date'], '%Y-%m-%d').date() \
+            if 'date' in request.args else datetime.utcnow().date()
+    except ValueError:
+        return jsonify({'message': 'Invalid date format, use YYYY-MM-DD'}), 400
+
+    max_days = current_app.config['DASHBOARD_MAX_TREND_DAYS']
+    try:
+        days = int(request.args.get('days', 30))
+    except ValueError:
+        return jsonify({'message': 'days must be an integer'}), 400
+    if days < 1 or days > max_days:
+        return jsonify({'message': f'days must be between 1 and {max_days}'}), 400
+
+    first_day = today.replace(day=1)
+    last_day = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    response = {'date': today.strftime('%Y-%m-%d')}
+
+    for section in DASHBOARD_SECTIONS:
+        if section not in sections:
+            continue
+
+        if section == 'balances':
+            response['current_total_balance'] = current_user.current_total_balance
+            response['long_term_balance'] = current_user.long_term_balance
+
+        elif section == 'categories':
+            response['categories'] = [
+                {'id': c.id, 'name': c.name, 'description': c.description}
+                for c in Category.query.filter_by(user_id=current_user.id)
+            ]
+
+        elif section == 'recent_transactions':
+            transactions = Transaction.query.options(joinedload(Transaction.category)).filter(
+                Transaction.user_id == current_user.id,
+                Transaction.start_date >= today - timedelta(days=current_app.config['DASHBOARD_RECENT_DAYS']),
+                Transaction.start_date <= today
+            ).order_by(Transaction.start_date.desc(), Transaction.id.desc()).limit(
+                current_app.config['DASHBOARD_RECENT_TRANSACTIONS']
+            ).all()
+            response['recent_transactions'] = [
+                transaction_to_dict(t, t.category.name if t.category else None) for t in transactions
+            ]
+
+        elif section == 'day_capacity':
+            response['day_capacity'] = read_day_capacity(current_user, today)
+
+        elif section == 'monthly_summary':
+            summary = summary_report(current_user, first_day, last_day)
+            response['monthly_summary'] = {
+                'start_date': first_day.strftime('%Y-%m-%d'),
+                'end_date': last_day.strftime('%Y-%m-%d'),
+                'total_income': summary['total_income'],
+                'total_expense': summary['total_expense'],
+                'net_change': summary['net_change']
+            }
+
+        elif section == 'day_capacity_trend':
+            start = today - timedelta(days=days)
+            response['day_capacity_trend'] = summary_report(current_user, start, today)['day_capacity_trend']
+
+        elif section == 'monthly_categories':
+            stats = cached_report(current_user, 'categories', (first_day, last_day),
+                                  lambda: read_monthly_category_stats(current_user, first_day, last_day))
+            response['monthly_categories'] = {
+                'year': today.year,
+                'month': today.month,
+                'income_categories': stats['income_categories'],
+                'expense_categories': stats['expense_categories'],
+                'total_income': stats['total_income'],
+                'total_expense': stats['total_expense']
+            }
+
+    return jsonify(response), 200
+
+
 # Add this to the routes.py file, right after the imports
 
 # Health check route
@@ -734,3 +1267,20 @@ def health_check():
         'message': 'VELA SYSTEM API is running',
         'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
     }), 200
+
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Request metrics in the Prometheus text format, plus the cache and hashing pool gauges of this process."""
+    if not current_app.config.get('METRICS_ENABLED'):
+        return jsonify({'message': 'Metrics are disabled'}), 404
+
+    # Caches and the hashing pool are per process: labelled with the pid of the worker that answered
+    pid = os.getpid()
+    gauges = [
+        *render_gauges('startup', {'seconds': current_app.config.get('STARTUP_SECONDS') or 0}, pid=pid),
+        *render_gauges('token_cache', token_cache.stats(), pid=pid),
+        *render_gauges('report_cache', report_cache.stats(), pid=pid),
+        *render_gauges('password_hasher', password_hasher.stats(), pid=pid)
+    ]
+    return Response(request_metrics.render() + '\n'.join(gauges) + '\n', content_type=request_metrics.CONTENT_TYPE)
@@ -0,0 +1,331 @@
+"""Production server for VELA SYSTEM: pre-forked worker processes, each with a pool of threads.
+
+Usage: python src/serve.py [--bind 127.0.0.1:5000] [--workers N] [--threads M] [--max-requests K]
+
+The master process creates the app once (creating tables and logging database info), opens the
+listening socket and forks the workers, which all accept connections from that socket. Signals
+to the master:
+
+    TERM, INT   stop: workers finish their in-flight requests, then exit
+    HUP         reload: the master re-executes itself (picking up new code and configuration) on
+                the same socket, starts new workers and then stops the old ones gracefully
+
+Workers that exit (or are recycled after --max-requests) are replaced. The workers share their
+request metrics through a directory the master owns, so /api/metrics reports the totals of all
+workers whichever one answers. POSIX only.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from metrics import MetricsStore
+import argparse
+import itertools
+import logging
+import os
+import random
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+# Passed to the re-executed master on reload
+LISTEN_FD_ENV = 'VELA_LISTEN_FD'
+RETIRING_WORKERS_ENV = 'VELA_RETIRING_WORKERS'
+METRICS_DIR_ENV = 'VELA_METRICS_DIR'
+
+CONTROL_SIGNALS = {signal.SIGTERM, signal.SIGINT, signal.SIGHUP}
+
+logger = logging.getLogger('vela.serve')
+
+
+class RequestHandler(WSGIRequestHandler):
+    # Seconds an idle keep-alive connection may hold a worker thread
+    timeout = 5
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug WSGI server that handles connections on a fixed pool of threads.
+
+    When every thread is busy the accept loop waits, leaving new connections in the shared
+    listen backlog for the other workers.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, fd):
+        super().__init__(host, port, app, handler=RequestHandler, fd=fd)
+        # Every worker accepts from the same socket, so accept must not block when another wins
+        self.socket.setblocking(False)
+        self._slots = threading.BoundedSemaphore(threads)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+
+    def get_request(self):
+        request, client_address = self.socket.accept()
+        request.setblocking(True)
+        return request, client_address
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        self._pool.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+
+    def drain(self):
+        """Wait for the requests in progress; call after serve_forever returns."""
+        self._pool.shutdown(wait=True)
+
+
+def dispose_engines(app, close=True):
+    """Drop the pooled database connections of every engine.
+
+    With close=False (in a forked worker) the connections inherited from the parent are
+    discarded without closing them, so the parent's connections are left alone.
+    """
+    from models import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=close)
+
+
+def run_worker(app, listen_fd, host, port, threads, max_requests, metrics_dir):
+    """Serve requests in a forked worker process until stopped or recycled; never returns."""
+    dispose_engines(app, close=False)
+    metrics = app.extensions['request_metrics']
+    if metrics_dir:
+        metrics.clear()
+        metrics.share(MetricsStore(metrics_dir))
+    server = PooledWSGIServer(host, port, None, threads, fd=listen_fd)
+
+    def stop(*_):
+        # shutdown() waits for serve_forever to return, so it cannot run on the serving thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    requests_served = itertools.count(1)
+
+    def counting_app(environ, start_response):
+        if max_requests and next(requests_served) == max_requests:
+            logger.info(f"Worker {os.getpid()} served {max_requests} requests, recycling")
+            stop()
+        return app(environ, start_response)
+
+    server.app = counting_app
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C reaches the master, which stops the workers
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    exit_code = 0
+    try:
+        server.serve_forever()
+        server.drain()
+        metrics.flush()
+    except Exception:
+        logger.exception(f"Worker {os.getpid()} failed")
+        exit_code = 1
+    finally:
+        logging.shutdown()
+        os._exit(exit_code)
+
+
+class Master:
+    """Keeps the configured number of workers running on one listening socket."""
+
+    def __init__(self, app, sock, args, metrics_dir=None):
+        self.app = app
+        self.sock = sock
+        self.args = args
+        self.metrics_dir = metrics_dir
+        self.metrics_store = MetricsStore(metrics_dir) if metrics_dir else None
+        self.workers = {}  # pid -> start time
+        self.retiring = set()  # Workers of the previous master, stopped once ours are running
+        self.stopping = False
+        self.reloading = False
+
+    def spawn_worker(self):
+        max_requests = self.args.max_requests
+        if max_requests and self.args.max_requests_jitter:
+            # Spread recycling out so that the workers do not all restart at once
+            max_requests += random.randint(0, self.args.max_requests_jitter)
+
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.app, self.sock.fileno(), self.args.host, self.args.port, self.args.threads,
+                       max_requests, self.metrics_dir)
+        self.workers[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def reap_workers(self):
+        """Collect exited workers; returns the start times of ours that exited."""
+        exited = []
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+
+            self.retiring.discard(pid)
+            if self.metrics_store is not None:
+                self.metrics_store.archive(pid)
+            started = self.workers.pop(pid, None)
+            if started is not None:
+                exited.append(started)
+                if not self.stopping:
+                    logger.info(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}")
+        return exited
+
+    def stop_workers(self, pids):
+        """Ask workers to finish their requests and exit, killing those that outlast the timeout."""
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + self.args.graceful_timeout
+        while any(pid in self.workers or pid in self.retiring for pid in pids) and time.monotonic() < deadline:
+            self.reap_workers()
+            time.sleep(0.1)
+
+        for pid in pids:
+            if pid in self.workers or pid in self.retiring:
+                logger.warning(f"Worker {pid} did not stop in {self.args.graceful_timeout}s, killing it")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+        self.reap_workers()
+
+    def reload(self):
+        """Re-execute the master with the same socket; the new master retires the current workers."""
+        logger.info("Reloading")
+        self.sock.set_inheritable(True)
+        os.environ[LISTEN_FD_ENV] = str(self.sock.fileno())
+        os.environ[RETIRING_WORKERS_ENV] = ','.join(str(pid) for pid in [*self.workers, *self.retiring])
+        if self.metrics_dir:
+            os.environ[METRICS_DIR_ENV] = self.metrics_dir
+        logging.shutdown()
+        # The signal mask survives exec, so the new master starts with the signals held
+        signal.pthread_sigmask(signal.SIG_BLOCK, CONTROL_SIGNALS)
+        os.execv(sys.executable, [sys.executable, *sys.argv])
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, CONTROL_SIGNALS)
+
+        for _ in range(self.args.workers):
+            self.spawn_worker()
+
+        # After a reload: the old workers stop once the new ones are serving
+        if self.retiring:
+            logger.info(f"Stopping {len(self.retiring)} workers of the previous master")
+            self.stop_workers(sorted(self.retiring))
+
+        while not self.stopping:
+            if self.reloading:
+                self.reload()
+
+            for started in self.reap_workers():
+                if time.monotonic() - started < 1:
+                    time.sleep(1)  # Do not spin on workers that fail at startup
+                    break
+
+            # Replace exited and recycled workers
+            while len(self.workers) < self.args.workers and not self.stopping:
+                self.spawn_worker()
+            time.sleep(0.2)
+
+        logger.info("Stopping workers")
+        self.stop_workers(list(self.workers))
+        self.sock.close()
+        if self.metrics_dir:
+            shutil.rmtree(self.metrics_dir, ignore_errors=True)
+        logger.info("Stopped")
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        self.reloading = True
+
+
+def open_listen_socket(host, port, backlog):
+    """The listening socket: inherited from the previous master on reload, otherwise a new one."""
+    inherited = os.environ.pop(LISTEN_FD_ENV, None)
+    if inherited is not None:
+        return socket.socket(fileno=int(inherited))
+
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    return socket.create_server((host, port), family=family, backlog=backlog)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the VELA SYSTEM API with pre-forked worker processes")
+    parser.add_argument("--bind", default=os.environ.get('VELA_BIND', '127.0.0.1:5000'),
+                        help="host:port to listen on (default: 127.0.0.1:5000)")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get('VELA_WORKERS', os.cpu_count() or 1)),
+                        help="Worker processes (default: one per CPU)")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get('VELA_THREADS', 8)),
+                        help="Request threads per worker (default: 8)")
+    parser.add_argument("--max-requests", type=int, default=int(os.environ.get('VELA_MAX_REQUESTS', 0)),
+                        help="Recycle a worker after this many requests (default: 0, never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=0,
+                        help="Add up to this many requests to --max-requests per worker")
+    parser.add_argument("--graceful-timeout", type=float, default=30,
+                        help="Seconds workers get to finish their requests when stopping (default: 30)")
+    parser.add_argument("--backlog", type=int, default=2048, help="Listen backlog (default: 2048)")
+    args = parser.parse_args()
+
+    host, _, port = args.bind.rpartition(':')
+    if not host or not port.isdigit():
+        parser.error("--bind must be host:port")
+    args.host, args.port = host.strip('[]'), int(port)
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers and --threads must be at least 1")
+    return args
+
+
+def main():
+    args = parse_args()
+
+    # Hold stop and reload signals until the master can handle them (the default action of HUP
+    # would kill it)
+    signal.pthread_sigmask(signal.SIG_BLOCK, CONTROL_SIGNALS)
+
+    # The app sizes its password hashing pool from the request threads (Config.REQUEST_THREADS)
+    os.environ['VELA_THREADS'] = str(args.threads)
+    from app import create_app
+    app = create_app()
+
+    # Nothing may share a database connection with the workers
+    dispose_engines(app)
+
+    sock = open_listen_socket(args.host, args.port, args.backlog)
+
+    # Kept across reloads, so the metrics totals survive them
+    metrics_dir = os.environ.pop(METRICS_DIR_ENV, None)
+    if metrics_dir is None and app.config.get('METRICS_ENABLED'):
+        metrics_dir = tempfile.mkdtemp(prefix='vela-metrics-')
+
+    master = Master(app, sock, args, metrics_dir)
+    retiring = os.environ.pop(RETIRING_WORKERS_ENV, '')
+    master.retiring = {int(pid) for pid in retiring.split(',') if pid}
+
+    logger.info(f"VELA SYSTEM serving on http://{args.bind}/api/ with {args.workers} workers x "
+                f"{args.threads} threads (master {os.getpid()})")
+    master.run()
+
+
+if __name__ == '__main__':
+    main()
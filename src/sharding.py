@@ -0,0 +1,261 @@
+from contextlib import contextmanager
+from flask import current_app, g
+from sqlalchemy import select, insert, delete
+from sqlalchemy.schema import CreateIndex, CreateTable
+from models import db, Money, UserDirectory
+import hashlib
+import os
+
+DIRECTORY_BIND_KEY = 'directory'
+
+
+class UnmigratedDatabase(RuntimeError):
+    """Raised when a database still stores money as floats; scripts/db_manage.py migrate converts it."""
+
+
+def shard_count():
+    return current_app.config.get('SHARD_COUNT', 0)
+
+
+def sharding_enabled():
+    return shard_count() > 0
+
+
+def shard_bind_key(shard):
+    return f'shard_{shard}'
+
+
+def shard_binds(config):
+    """SQLALCHEMY_BINDS entries for the directory and shard databases described by a config."""
+    shard_dir = config['SHARD_DIR']
+    binds = {DIRECTORY_BIND_KEY: f"sqlite:///{os.path.join(shard_dir, 'vela_directory.db')}"}
+    for shard in range(config['SHARD_COUNT']):
+        binds[shard_bind_key(shard)] = f"sqlite:///{os.path.join(shard_dir, f'vela_shard_{shard}.db')}"
+    return binds
+
+
+def bind_shard(shard):
+    """Route the session's user data queries to a shard for the rest of the app context."""
+    g.shard = shard
+
+
+@contextmanager
+def use_shard(shard):
+    """Temporarily route the session's user data queries to a shard."""
+    previous = g.get('shard')
+    g.shard = shard
+    try:
+        yield shard
+    finally:
+        g.shard = previous
+
+
+def each_shard():
+    """Yield every shard with the session bound to it, or None once when sharding is off.
+
+    Ids are only unique within a shard, so the identity map is cleared between shards;
+    callers must commit their changes before moving on to the next one.
+    """
+    shards = range(shard_count()) if sharding_enabled() else [None]
+    for shard in shards:
+        with use_shard(shard):
+            yield shard
+        db.session.expunge_all()
+
+
+def shard_for_user_id(user_id):
+    """Shard holding a user's data (None when sharding is off or the user is unknown)."""
+    if not sharding_enabled():
+        return None
+    entry = db.session.get(UserDirectory, user_id)
+    return entry.shard if entry else None
+
+
+def shard_for_username(username):
+    if not sharding_enabled():
+        return None
+    entry = UserDirectory.query.filter_by(username=username).first()
+    return entry.shard if entry else None
+
+
+def register_in_directory(username):
+    """Reserve a user id and shard for a new username; the caller commits."""
+    entry = UserDirectory(username=username, shard=0)
+    db.session.add(entry)
+    db.session.flush()
+    entry.shard = entry.id % shard_count()
+    return entry
+
+
+def schema_fingerprint(metadata, dialect):
+    """31-bit hash of the CREATE statements of a metadata's tables and indexes (fits PRAGMA user_version)."""
+    statements = []
+    for table in metadata.sorted_tables:
+        statements.append(str(CreateTable(table).compile(dialect=dialect)))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            statements.append(str(CreateIndex(index).compile(dialect=dialect)))
+    digest = hashlib.sha256('\n'.join(statements).encode()).digest()
+    return int.from_bytes(digest[:4], 'big') & 0x7fffffff
+
+
+def ensure_schema(metadata, engine, fast=False):
+    """Create a database's missing tables; returns whether the schema was checked against the database.
+
+    SQLite databases remember the fingerprint of the schema last created in PRAGMA user_version,
+    so with fast=True an unchanged schema costs one PRAGMA instead of a lookup per table.
+    """
+    if engine.dialect.name != 'sqlite':
+        metadata.create_all(bind=engine)
+        return True
+
+    fingerprint = schema_fingerprint(metadata, engine.dialect)
+    if fast:
+        with engine.connect() as connection:
+            if connection.exec_driver_sql('PRAGMA user_version').scalar() == fingerprint:
+                return False
+
+    metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        # create_all leaves tables that already exist alone, so indexes declared since are added here
+        for table in metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+        unconverted = float_money_columns(metadata, connection)
+        if unconverted:
+            # Not stamped, so the check runs again on the next start
+            raise UnmigratedDatabase(f"{engine.url.database} stores {', '.join(unconverted)} as floats; "
+                               f"run scripts/db_manage.py migrate to convert them to cents")
+        connection.exec_driver_sql(f'PRAGMA user_version = {fingerprint}')
+    return True
+
+
+def float_money_columns(metadata, connection):
+    """Money columns an existing SQLite database still declares with a floating-point type."""
+    found = []
+    for table in metadata.sorted_tables:
+        money = {column.name for column in table.columns if isinstance(column.type, Money)}
+        if not money:
+            continue
+        for _, name, declared_type, *_ in connection.exec_driver_sql(f'PRAGMA table_info("{table.name}")'):
+            if name in money and declared_type.upper() != 'INTEGER':
+                found.append(f'{table.name}.{name}')
+    return found
+
+
+def create_all_tables(fast=False):
+    """Create missing tables in the main database, or in the directory and every shard.
+
+    With fast=True databases whose stored schema fingerprint matches the models are skipped.
+    Returns the number of databases whose schema was checked.
+    """
+    if not sharding_enabled():
+        return int(ensure_schema(db.metadata, db.engine, fast))
+
+    checked = ensure_schema(db.metadatas[DIRECTORY_BIND_KEY], db.engines[DIRECTORY_BIND_KEY], fast)
+    for shard in range(shard_count()):
+        checked += ensure_schema(db.metadata, db.engines[shard_bind_key(shard)], fast)
+    return checked
+
+
+def user_tables():
+    """Tables holding per-user rows, parents first: users, then every table with a user_id column."""
+    return [table for table in db.metadata.sorted_tables if table.name == 'users' or 'user_id' in table.c]
+
+
+def copy_user(user_id, source, target):
+    """Copy a user's rows between engines; returns the number of rows copied.
+
+    The user keeps its id. Rows of other tables get new ids in the target (ids are only
+    unique per shard) and category_id references are remapped accordingly.
+    """
+    copied = 0
+    category_ids = {}
+
+    with source.connect() as src, target.begin() as dst:
+        for table in user_tables():
+            key = table.c.id if table.name == 'users' else table.c.user_id
+            rows = src.execute(select(table).where(key == user_id)).mappings().all()
+
+            for row in rows:
+                values = dict(row)
+                if table.name != 'users' and 'id' in table.c and table.c.id.primary_key:
+                    old_id = values.pop('id')
+                else:
+                    old_id = None
+                if table.name != 'categories' and values.get('category_id') is not None:
+                    values['category_id'] = category_ids.get(values['category_id'])
+
+                result = dst.execute(insert(table).values(**values))
+                if table.name == 'categories':
+                    category_ids[old_id] = result.inserted_primary_key[0]
+                copied += 1
+
+    return copied
+
+
+def delete_user(user_id, engine):
+    """Delete a user's rows from an engine, children first."""
+    with engine.begin() as connection:
+        for table in reversed(user_tables()):
+            key = table.c.id if table.name == 'users' else table.c.user_id
+            connection.execute(delete(table).where(key == user_id))
+
+
+def move_user(entry, target_shard):
+    """Move a user's data to another shard and point the directory at it."""
+    source = db.engines[shard_bind_key(entry.shard)]
+    target = db.engines[shard_bind_key(target_shard)]
+
+    copy_user(entry.id, source, target)
+    entry.shard = target_shard
+    db.session.commit()
+    delete_user(entry.id, source)
+
+
+def rebalance(target_count=None):
+    """Move every user whose shard is not user_id % target_count; returns the moves made."""
+    target_count = target_count or shard_count()
+    if target_count > shard_count():
+        raise ValueError(f'Cannot rebalance onto {target_count} shards, only {shard_count()} are configured')
+
+    moves = []
+    for entry in UserDirectory.query.order_by(UserDirectory.id).all():
+        target_shard = entry.id % target_count
+        if entry.shard != target_shard:
+            moves.append((entry.id, entry.username, entry.shard, target_shard))
+            move_user(entry, target_shard)
+    return moves
+
+
+def import_users():
+    """Distribute users from the unsharded main database into the shards; returns the count.
+
+    Users already present in the directory are skipped, so the import can be re-run.
+    """
+    source = db.engines[None]
+    users = db.metadata.tables['users']
+    with source.connect() as connection:
+        rows = connection.execute(select(users.c.id, users.c.username).order_by(users.c.id)).all()
+
+    imported = 0
+    for user_id, username in rows:
+        if db.session.get(UserDirectory, user_id):
+            continue
+
+        entry = UserDirectory(id=user_id, username=username, shard=user_id % shard_count())
+        copy_user(user_id, source, db.engines[shard_bind_key(entry.shard)])
+        db.session.add(entry)
+        db.session.commit()
+        imported += 1
+
+    return imported
+
+
+def shard_user_counts():
+    """Number of users per shard according to the directory."""
+    counts = {shard: 0 for shard in range(shard_count())}
+    rows = db.session.query(UserDirectory.shard, db.func.count(UserDirectory.id)).group_by(UserDirectory.shard)
+    for shard, count in rows:
+        counts[shard] = count
+    return counts
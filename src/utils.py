@@ -1,14 +1,23 @@
 from werkzeug.security import generate_password_hash, check_password_hash
+from bisect import bisect_right
 from datetime import datetime, timedelta
-from models import TransactionType, Transaction, Category
+from models import db, TransactionType, Transaction, Category, CategoryMonthRollup, User, DailyCapacity, \
+    money_sum, single_transaction_sql, scheduled_transaction_sql, single_balance_change_sql, \
+    scheduled_balance_change_sql
+from sharding import each_shard
+from flask import current_app
+import proration
 from sqlalchemy import func
 
 
-def hash_password(password):
-    """Create a secure hash of the password using SHA-256 (built-in to Werkzeug)."""
+def hash_password(password, iterations=260000):
+    """Create a secure hash of the password using PBKDF2-SHA256 (built-in to Werkzeug).
+
+    The iteration count is stored in the hash, so raising it only affects new hashes.
+    """
     from werkzeug.security import generate_password_hash
     # Use sha256 instead of bcrypt since bcrypt is causing issues
-    return generate_password_hash(password, method='pbkdf2:sha256')
+    return generate_password_hash(password, method=f'pbkdf2:sha256:{iterations}')
 
 
 def verify_password(stored_hash, provided_password):
@@ -17,33 +26,244 @@ def verify_password(stored_hash, provided_password):
     return check_password_hash(stored_hash, provided_password)
 
 
+def scheduled_transactions(user):
+    """The user's recurring and continuous transactions (read through idx_transactions_user_scheduled)."""
+    return Transaction.query.filter(
+        Transaction.user_id == user.id,
+        scheduled_transaction_sql()
+    ).order_by(Transaction.id).all()
+
+
 def calculate_day_capacity(user, date):
-    """Calculate the daily available budget (day_capacity) for a specific date."""
-    total_income_allocation = 0
-    total_expense_allocation = 0
+    """Calculate the daily available budget (day_capacity) for a specific date.
 
+    A one-day calculate_day_capacity_trend, so single dates and ranges come from the same sweep.
+    """
     date_obj = datetime.strptime(date, '%Y-%m-%d').date() if isinstance(date, str) else date
+    return calculate_day_capacity_trend(user, date_obj, date_obj)[0]['day_capacity']
+
 
-    for transaction in user.transactions:
-        # Skip single transactions as they don't affect day_capacity
+def capacity_segments(transactions, start_date, days):
+    """Sweep the recurring/continuous transactions over `days` days from start_date.
+
+    Yields (segment_start, segment_stop, income_allocation, expense_allocation) for each run of
+    day offsets [segment_start, segment_stop) on which the set of active transactions is constant.
+    """
+    if days <= 0:
+        return
+
+    # Collect the active window [first, stop) of each recurring/continuous
+    # transaction as day offsets from start_date, clipped to the range
+    windows = []
+    for index, transaction in enumerate(transactions):
         if not transaction.is_recurring and not transaction.duration_days:
             continue
 
-        # Check if transaction is active on the specified date
-        if not is_transaction_active(transaction, date_obj):
+        first = max((transaction.start_date - start_date).days, 0)
+        stop = days
+        if transaction.duration_days:
+            stop = min((transaction.start_date - start_date).days + transaction.duration_days, days)
+
+        if first >= stop:
             continue
 
-        # Calculate daily allocation based on transaction type
-        daily_allocation = calculate_daily_allocation(transaction)
+        is_income = transaction.transaction_type == TransactionType.INCOME
+        windows.append((first, stop, index, is_income, calculate_daily_allocation(transaction)))
+
+    # The set of active transactions only changes at window boundaries
+    starts_at = {}
+    stops_at = {}
+    for window in windows:
+        starts_at.setdefault(window[0], []).append(window)
+        stops_at.setdefault(window[1], []).append(window)
+    boundaries = sorted(set(starts_at) | set(stops_at) | {0, days})
+
+    active = {}
+    for segment_start, segment_stop in zip(boundaries, boundaries[1:]):
+        for window in stops_at.get(segment_start, []):
+            del active[window[2]]
+        for window in starts_at.get(segment_start, []):
+            active[window[2]] = window
+
+        # Sum in transaction order so every segment rounds the same way
+        total_income_allocation = 0
+        total_expense_allocation = 0
+        for index in sorted(active):
+            _, _, _, is_income, daily_allocation = active[index]
+            if is_income:
+                total_income_allocation += daily_allocation
+            else:
+                total_expense_allocation += daily_allocation
 
-        if transaction.transaction_type == TransactionType.INCOME:
-            total_income_allocation += daily_allocation
-        else:
-            total_expense_allocation += daily_allocation
+        yield segment_start, segment_stop, total_income_allocation, total_expense_allocation
+
+
+def calculate_day_capacity_trend(user, start_date, end_date):
+    """Calculate day_capacity for every date from start_date to end_date in one sweep."""
+    days = (end_date - start_date).days + 1
+
+    trend = []
+    transactions = scheduled_transactions(user)
+    for segment_start, segment_stop, income, expense in capacity_segments(transactions, start_date, days):
+        day_capacity = round(income - expense, 2)
+        for offset in range(segment_start, segment_stop):
+            trend.append({
+                'date': (start_date + timedelta(days=offset)).strftime('%Y-%m-%d'),
+                'day_capacity': day_capacity
+            })
+
+    return trend
 
-    # Day capacity = income allocations - expense allocations
-    day_capacity = total_income_allocation - total_expense_allocation
-    return round(day_capacity, 2)
+
+def read_day_capacity_trend(user, start_date, end_date):
+    """day_capacity for every date from start_date to end_date, read from the daily_capacity table.
+
+    Dates from the user's capacity_horizon on (or every date, if the table has not been built
+    for the user yet) are computed from the transactions instead.
+    """
+    horizon = user.capacity_horizon
+    if horizon is None or start_date >= horizon:
+        return calculate_day_capacity_trend(user, start_date, end_date)
+
+    stored_end = min(end_date, horizon - timedelta(days=1))
+    rows = db.session.execute(
+        db.select(DailyCapacity.date, DailyCapacity.income_alloc, DailyCapacity.expense_alloc).where(
+            DailyCapacity.user_id == user.id,
+            DailyCapacity.date >= start_date,
+            DailyCapacity.date <= stored_end
+        )
+    )
+    # `or 0` also folds the -0.0 left behind by cancelling allocations
+    day_capacities = {date: round(income - expense, 2) or 0 for date, income, expense in rows}
+
+    trend = []
+    for offset in range((stored_end - start_date).days + 1):
+        date = start_date + timedelta(days=offset)
+        trend.append({'date': date.strftime('%Y-%m-%d'), 'day_capacity': day_capacities.get(date, 0)})
+
+    if end_date >= horizon:
+        trend.extend(calculate_day_capacity_trend(user, horizon, end_date))
+    return trend
+
+
+def read_day_capacity(user, date):
+    """day_capacity for a single date, read from the daily_capacity table where it is maintained."""
+    date_obj = datetime.strptime(date, '%Y-%m-%d').date() if isinstance(date, str) else date
+    return read_day_capacity_trend(user, date_obj, date_obj)[0]['day_capacity']
+
+
+def record_day_capacity(user, transaction, sign=1):
+    """Add (sign=1) or remove (sign=-1) a transaction's daily allocation in the daily_capacity rows.
+
+    Only dates before the user's capacity_horizon are touched. Call it next to
+    User.record_transaction, so the rows commit together with the transaction write.
+    """
+    horizon = user.capacity_horizon
+    if horizon is None or (not transaction.is_recurring and not transaction.duration_days):
+        return
+
+    allocation = calculate_daily_allocation(transaction)
+    first = transaction.start_date
+    stop = horizon
+    if transaction.duration_days:
+        stop = min(first + timedelta(days=transaction.duration_days), horizon)
+    if not allocation or first >= stop:
+        return
+
+    in_range = (DailyCapacity.user_id == user.id, DailyCapacity.date >= first, DailyCapacity.date < stop)
+
+    if sign > 0:
+        existing = set(db.session.scalars(db.select(DailyCapacity.date).where(*in_range)))
+        missing = [first + timedelta(days=offset) for offset in range((stop - first).days)]
+        missing = [
+            {'user_id': user.id, 'date': date, 'income_alloc': 0.0, 'expense_alloc': 0.0}
+            for date in missing if date not in existing
+        ]
+        if missing:
+            db.session.execute(db.insert(DailyCapacity), missing)
+
+    if transaction.transaction_type == TransactionType.INCOME:
+        column = DailyCapacity.income_alloc
+    else:
+        column = DailyCapacity.expense_alloc
+    db.session.execute(
+        db.update(DailyCapacity).where(*in_range).values({column: column + sign * allocation})
+        .execution_options(synchronize_session=False)
+    )
+
+    if sign < 0:
+        # Drop the rows nothing is allocated to any more, along with their rounding residue
+        db.session.execute(
+            db.delete(DailyCapacity).where(
+                *in_range,
+                db.func.abs(DailyCapacity.income_alloc) < 1e-9,
+                db.func.abs(DailyCapacity.expense_alloc) < 1e-9
+            ).execution_options(synchronize_session=False)
+        )
+
+
+def materialize_day_capacity(user, start_date, stop_date):
+    """Insert the user's daily_capacity rows for [start_date, stop_date); returns the number of rows."""
+    rows = []
+    days = (stop_date - start_date).days
+    transactions = scheduled_transactions(user)
+    for segment_start, segment_stop, income, expense in capacity_segments(transactions, start_date, days):
+        if not income and not expense:
+            continue
+        rows.extend(
+            {
+                'user_id': user.id,
+                'date': start_date + timedelta(days=offset),
+                'income_alloc': income,
+                'expense_alloc': expense
+            }
+            for offset in range(segment_start, segment_stop)
+        )
+
+    if rows:
+        db.session.execute(db.insert(DailyCapacity), rows)
+    return len(rows)
+
+
+def extend_day_capacity(user, horizon, rebuild=False):
+    """Materialize the user's daily_capacity rows up to (not including) horizon; returns rows written.
+
+    Users without a horizon yet, or with rebuild=True, have their rows rebuilt from scratch.
+    """
+    if rebuild or user.capacity_horizon is None:
+        db.session.execute(db.delete(DailyCapacity).where(DailyCapacity.user_id == user.id))
+        starts = [t.start_date for t in scheduled_transactions(user)]
+        written = materialize_day_capacity(user, min(starts), horizon) if starts else 0
+    elif horizon > user.capacity_horizon:
+        written = materialize_day_capacity(user, user.capacity_horizon, horizon)
+    else:
+        return 0
+
+    user.capacity_horizon = horizon
+    return written
+
+
+def maintain_day_capacity(rebuild=False):
+    """Roll every user's daily_capacity horizon forward to today + CAPACITY_HORIZON_DAYS.
+
+    Returns (users, rows written). Run it regularly (e.g. daily) so reads stay within the
+    materialized range; dates past a user's horizon are still correct, just computed on read.
+    It also stores the scheduled balances that went stale (e.g. as a recurring income cycle
+    started), which balance reads recompute without saving.
+    """
+    today = datetime.utcnow().date()
+    horizon = today + timedelta(days=current_app.config['CAPACITY_HORIZON_DAYS'])
+    users = 0
+    written = 0
+
+    for _ in each_shard():
+        for user in User.query.order_by(User.id).all():
+            written += extend_day_capacity(user, horizon, rebuild)
+            user.sync_scheduled_balance(today)
+            users += 1
+        db.session.commit()
+
+    return users, written
 
 
 def is_transaction_active(transaction, date):
@@ -85,71 +305,46 @@ def calculate_daily_allocation(transaction):
     return 0
 
 
-def calculate_category_stats(user, start_date, end_date):
-    """Calculate category statistics for a given date range."""
-    # Get all transactions in date range
-    transactions = Transaction.query.filter_by(user_id=user.id).filter(
-        Transaction.start_date >= start_date,
-        Transaction.start_date <= end_date
-    ).all()
-
-    # Get all user's categories
-    categories = Category.query.filter_by(user_id=user.id).all()
-    category_map = {c.id: c.name for c in categories}
-
-    # Initialize statistics
-    income_by_category = {}
-    expense_by_category = {}
-    total_income = 0
-    total_expense = 0
-
-    # Process each transaction
-    for t in transactions:
-        # Get category name
-        category_name = category_map.get(t.category_id, "Uncategorized")
-
-        # Calculate the amount to consider for this date range
-        amount = t.amount
-
-        # For single transactions
-        if not t.is_recurring and not t.duration_days:
-            if t.transaction_type == TransactionType.INCOME:
-                total_income += amount
-                income_by_category[category_name] = income_by_category.get(category_name, 0) + amount
-            else:
-                total_expense += amount
-                expense_by_category[category_name] = expense_by_category.get(category_name, 0) + amount
-        # For recurring income, prorate based on cycles in the date range
-        elif t.is_recurring and t.cycle_days:
-            # Only include if transaction has started by the end date
-            if t.start_date <= end_date:
-                # Calculate days in this range where the transaction is active
-                range_days = (min(end_date, datetime.utcnow().date()) -
-                              max(start_date, t.start_date)).days + 1
-                # Calculate cycles in this range
-                cycles_in_range = max(1, range_days // t.cycle_days)
-                prorated_amount = amount * cycles_in_range
-
-                total_income += prorated_amount
-                income_by_category[category_name] = income_by_category.get(category_name, 0) + prorated_amount
-        # For continuous expenses, prorate based on active days in the date range
-        elif t.duration_days:
-            # Calculate end date of expense
-            expense_end_date = t.start_date + timedelta(days=t.duration_days)
-            # Only include if transaction period overlaps with the date range
-            if t.start_date <= end_date and expense_end_date >= start_date:
-                # Calculate days in this range where the expense is active
-                active_start = max(start_date, t.start_date)
-                active_end = min(end_date, expense_end_date)
-                active_days = (active_end - active_start).days + 1
-
-                # Prorate the amount
-                prorated_amount = (amount / t.duration_days) * active_days
-
-                total_expense += prorated_amount
-                expense_by_category[category_name] = expense_by_category.get(category_name, 0) + prorated_amount
-
-    # Calculate percentages
+def prorate_for_range(transaction, start_date, end_date, today):
+    """Amount a transaction contributes to the category statistics of [start_date, end_date].
+
+    Returns ('income' or 'expense', amount), or None if it does not count towards the range.
+    Only transactions starting within the range are considered by the reports.
+    """
+    t = transaction
+    amount = t.amount
+
+    # For single transactions
+    if not t.is_recurring and not t.duration_days:
+        return ('income' if t.transaction_type == TransactionType.INCOME else 'expense'), amount
+    # For recurring income, prorate based on cycles in the date range
+    elif t.is_recurring and t.cycle_days:
+        # Only include if transaction has started by the end date
+        if t.start_date <= end_date:
+            # Calculate days in this range where the transaction is active
+            range_days = (min(end_date, today) - max(start_date, t.start_date)).days + 1
+            # Calculate cycles in this range
+            cycles_in_range = max(1, range_days // t.cycle_days)
+            return 'income', amount * cycles_in_range
+    # For continuous expenses, prorate based on active days in the date range
+    elif t.duration_days:
+        # Calculate end date of expense
+        expense_end_date = t.start_date + timedelta(days=t.duration_days)
+        # Only include if transaction period overlaps with the date range
+        if t.start_date <= end_date and expense_end_date >= start_date:
+            # Calculate days in this range where the expense is active
+            active_start = max(start_date, t.start_date)
+            active_end = min(end_date, expense_end_date)
+            active_days = (active_end - active_start).days + 1
+
+            # Prorate the amount
+            return 'expense', (amount / t.duration_days) * active_days
+
+    return None
+
+
+def summarize_category_stats(income_by_category, expense_by_category, total_income, total_expense):
+    """Build the category report payload: per-category amounts and percentages, largest first."""
     income_categories = []
     expense_categories = []
 
@@ -179,3 +374,464 @@ def calculate_category_stats(user, start_date, end_date):
         'total_income': round(total_income, 2),
         'total_expense': round(total_expense, 2)
     }
+
+
+# Transaction columns needed to prorate a transaction into category statistics
+PRORATION_COLUMNS = (
+    Transaction.id, Transaction.category_id, Transaction.amount, Transaction.transaction_type,
+    Transaction.is_recurring, Transaction.cycle_days, Transaction.duration_days, Transaction.start_date
+)
+
+
+def calculate_category_stats(user, start_date, end_date):
+    """Calculate category statistics for a given date range."""
+    # Get all user's categories
+    categories = Category.query.filter_by(user_id=user.id).all()
+    category_map = {c.id: c.name for c in categories}
+
+    if proration.enabled():
+        arrays = proration.TransactionArrays.load(user.id, start_date, end_date, category_map)
+        totals = proration.category_totals_for_ranges(arrays, [(start_date, end_date)], datetime.utcnow().date())
+        return summarize_category_stats(*totals[0])
+
+    # Get all transactions in date range (only the columns proration needs)
+    transactions = db.session.query(*PRORATION_COLUMNS).filter(
+        Transaction.user_id == user.id,
+        Transaction.start_date >= start_date,
+        Transaction.start_date <= end_date
+    ).order_by(Transaction.id).all()
+
+    return category_stats_for(transactions, category_map, start_date, end_date)
+
+
+def category_stats_for(transactions, category_map, start_date, end_date, today=None):
+    """Category statistics of the given transactions (those starting within the range)."""
+    today = today or datetime.utcnow().date()
+
+    if proration.use_vectorized(len(transactions)):
+        arrays = proration.TransactionArrays.from_transactions(transactions, category_map)
+        totals = proration.category_totals_for_ranges(arrays, [(start_date, end_date)], today)
+        return summarize_category_stats(*totals[0])
+
+    # Initialize statistics
+    income_by_category = {}
+    expense_by_category = {}
+    total_income = 0
+    total_expense = 0
+
+    # Process each transaction
+    for t in transactions:
+        contribution = prorate_for_range(t, start_date, end_date, today)
+        if contribution is None:
+            continue
+
+        # Get category name
+        category_name = category_map.get(t.category_id, "Uncategorized")
+
+        kind, amount = contribution
+        if kind == 'income':
+            total_income += amount
+            income_by_category[category_name] = income_by_category.get(category_name, 0) + amount
+        else:
+            total_expense += amount
+            expense_by_category[category_name] = expense_by_category.get(category_name, 0) + amount
+
+    return summarize_category_stats(income_by_category, expense_by_category, total_income, total_expense)
+
+
+def read_daily_category_stats(user, date):
+    """Category statistics for a single day from one indexed read of that day's transactions.
+
+    On a single day each transaction's contribution does not depend on today's date, so no
+    rollup is needed: categories are joined in instead of being loaded separately.
+    """
+    rows = db.session.query(Transaction, Category.name).outerjoin(
+        Category, Category.id == Transaction.category_id
+    ).filter(
+        Transaction.user_id == user.id,
+        Transaction.start_date == date
+    ).order_by(Transaction.id).all()
+
+    category_map = {t.category_id: name for t, name in rows if name is not None}
+    return category_stats_for([t for t, _ in rows], category_map, date, date)
+
+
+PERIOD_GRANULARITIES = ('week', 'month', 'quarter', 'year')
+
+
+def period_start(date, granularity):
+    """First day of the week (Monday), month, quarter or year containing date."""
+    if granularity == 'week':
+        return date - timedelta(days=date.weekday())
+    if granularity == 'month':
+        return date.replace(day=1)
+    if granularity == 'quarter':
+        return date.replace(month=3 * ((date.month - 1) // 3) + 1, day=1)
+    return date.replace(month=1, day=1)
+
+
+def period_label(date, granularity):
+    """Display label of the period starting on date, e.g. 2024-W05, 2024-02, 2024-Q1 or 2024."""
+    if granularity == 'week':
+        year, week, _ = date.isocalendar()
+        return f'{year}-W{week:02d}'
+    if granularity == 'month':
+        return date.strftime('%Y-%m')
+    if granularity == 'quarter':
+        return f'{date.year}-Q{(date.month - 1) // 3 + 1}'
+    return str(date.year)
+
+
+def period_bounds(start_date, end_date, granularity):
+    """List the (label, first, last) periods covering [start_date, end_date], clipped to the range."""
+    periods = []
+    first = period_start(start_date, granularity)
+    while first <= end_date:
+        if granularity == 'week':
+            following = first + timedelta(days=7)
+        else:
+            step = {'month': 1, 'quarter': 3, 'year': 12}[granularity]
+            month_index = first.month - 1 + step
+            following = first.replace(year=first.year + month_index // 12, month=month_index % 12 + 1)
+
+        periods.append((period_label(first, granularity), max(first, start_date),
+                        min(following - timedelta(days=1), end_date)))
+        first = following
+    return periods
+
+
+def category_stats_for_periods(transactions, category_map, periods, today=None):
+    """Category statistics for each of a sorted list of disjoint (start, end) periods.
+
+    Every transaction is reported in the period it starts in; the NumPy engine handles all
+    periods at once when it is enabled.
+    """
+    today = today or datetime.utcnow().date()
+
+    if proration.use_vectorized(len(transactions)):
+        arrays = proration.TransactionArrays.from_transactions(transactions, category_map)
+        return [
+            summarize_category_stats(*totals)
+            for totals in proration.category_totals_for_ranges(arrays, periods, today)
+        ]
+
+    period_starts = [first for first, _ in periods]
+    buckets = [[] for _ in periods]
+    for transaction in transactions:
+        index = bisect_right(period_starts, transaction.start_date) - 1
+        if index >= 0 and transaction.start_date <= periods[index][1]:
+            buckets[index].append(transaction)
+
+    return [
+        category_stats_for(bucket, category_map, first, last, today)
+        for (first, last), bucket in zip(periods, buckets)
+    ]
+
+
+def calculate_period_stats(user, start_date, end_date, granularity, today=None):
+    """Category statistics for every period of [start_date, end_date] from one scan of the transactions.
+
+    Each period is computed like calculate_category_stats over that period: transactions count
+    in the period they start in and are prorated within it.
+    """
+    today = today or datetime.utcnow().date()
+    periods = period_bounds(start_date, end_date, granularity)
+    ranges = [(first, last) for _, first, last in periods]
+
+    if proration.enabled():
+        # The NumPy engine reads the transactions straight into arrays
+        category_map = {c.id: c.name for c in Category.query.filter_by(user_id=user.id)}
+        arrays = proration.TransactionArrays.load(user.id, start_date, end_date, category_map)
+        stats = [summarize_category_stats(*totals)
+                 for totals in proration.category_totals_for_ranges(arrays, ranges, today)]
+    else:
+        transactions = db.session.query(*PRORATION_COLUMNS, Category.name.label('category_name')).outerjoin(
+            Category, Category.id == Transaction.category_id
+        ).filter(
+            Transaction.user_id == user.id,
+            Transaction.start_date >= start_date,
+            Transaction.start_date <= end_date
+        ).order_by(Transaction.id).all()
+        category_map = {t.category_id: t.category_name for t in transactions if t.category_name is not None}
+        stats = category_stats_for_periods(transactions, category_map, ranges, today)
+
+    return [
+        dict(period=label, start=first.strftime('%Y-%m-%d'), end=last.strftime('%Y-%m-%d'), **period_stats)
+        for (label, first, last), period_stats in zip(periods, stats)
+    ]
+
+
+def month_end(month):
+    """Last day of the month starting on `month`."""
+    return (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def category_rollup_deltas(transactions, sign=1, deltas=None):
+    """Accumulate the category_month_rollup changes for adding (sign=1) or removing (sign=-1) transactions.
+
+    Returns {(category_id, month): [income, expense, income_count, expense_count]}.
+    """
+    deltas = {} if deltas is None else deltas
+    for transaction in transactions:
+        month = transaction.start_date.replace(day=1)
+        last_day = month_end(month)
+        # Valued as of the end of the month, when recurring income has run all its cycles in it
+        contribution = prorate_for_range(transaction, month, last_day, last_day)
+        if contribution is None:
+            continue
+
+        kind, amount = contribution
+        delta = deltas.setdefault((transaction.category_id, month), [0.0, 0.0, 0, 0])
+        if kind == 'income':
+            delta[0] += sign * amount
+            delta[2] += sign
+        else:
+            delta[1] += sign * amount
+            delta[3] += sign
+    return deltas
+
+
+def apply_category_rollup(user, deltas):
+    """Apply rollup deltas (see category_rollup_deltas) to the user's category_month_rollup rows."""
+    if not deltas or not user.category_rollup_built:
+        return
+
+    months = {month for _, month in deltas}
+    rows = {
+        (row.category_id, row.month): row
+        for row in CategoryMonthRollup.query.filter(
+            CategoryMonthRollup.user_id == user.id,
+            CategoryMonthRollup.month.in_(months)
+        )
+    }
+
+    for key, (income, expense, income_count, expense_count) in deltas.items():
+        row = rows.get(key)
+        if row is None:
+            row = CategoryMonthRollup(user_id=user.id, category_id=key[0], month=key[1],
+                                      income=0.0, expense=0.0, income_count=0, expense_count=0)
+            db.session.add(row)
+            rows[key] = row
+
+        row.income += income
+        row.expense += expense
+        row.income_count += income_count
+        row.expense_count += expense_count
+
+        if row.income_count <= 0 and row.expense_count <= 0:
+            if row in db.session.new:
+                db.session.expunge(row)
+            else:
+                db.session.delete(row)
+            del rows[key]
+
+
+def record_category_rollup(user, transaction, sign=1):
+    """Add (sign=1) or remove (sign=-1) a transaction in the user's monthly category rollup.
+
+    Call it next to User.record_transaction, so the rollup commits together with the write.
+    """
+    apply_category_rollup(user, category_rollup_deltas([transaction], sign))
+
+
+def move_category_rollup(user, category_id, new_category_id):
+    """Fold the rollup rows of a category into another one (or into uncategorized, for None)."""
+    if not user.category_rollup_built:
+        return
+
+    deltas = {}
+    for row in CategoryMonthRollup.query.filter_by(user_id=user.id, category_id=category_id).all():
+        deltas[(new_category_id, row.month)] = [row.income, row.expense, row.income_count, row.expense_count]
+        db.session.delete(row)
+    db.session.flush()
+    apply_category_rollup(user, deltas)
+
+
+def read_monthly_category_stats(user, first_day, last_day, today=None):
+    """Category statistics for a calendar month, read from the category_month_rollup table.
+
+    Users whose rollup has not been built yet fall back to calculate_category_stats.
+    """
+    if not user.category_rollup_built:
+        return calculate_category_stats(user, first_day, last_day)
+
+    today = today or datetime.utcnow().date()
+
+    # Recurring income is stored as of the end of the month; revalue it as of today
+    # for a month that is not over yet
+    corrections = {}
+    if last_day > today:
+        recurring = Transaction.query.filter(
+            Transaction.user_id == user.id,
+            Transaction.is_recurring.is_(True),
+            Transaction.start_date >= first_day,
+            Transaction.start_date <= last_day
+        ).all()
+        for t in recurring:
+            current = prorate_for_range(t, first_day, last_day, today)
+            stored = prorate_for_range(t, first_day, last_day, last_day)
+            if current is not None and stored is not None:
+                corrections[t.category_id] = corrections.get(t.category_id, 0) + current[1] - stored[1]
+
+    rows = db.session.query(CategoryMonthRollup, Category.name).outerjoin(
+        Category, Category.id == CategoryMonthRollup.category_id
+    ).filter(
+        CategoryMonthRollup.user_id == user.id,
+        CategoryMonthRollup.month == first_day
+    ).order_by(CategoryMonthRollup.id)
+
+    income_by_category = {}
+    expense_by_category = {}
+    total_income = 0
+    total_expense = 0
+
+    for row, name in rows:
+        category_name = name if name is not None else "Uncategorized"
+        if row.income_count > 0:
+            amount = row.income + corrections.get(row.category_id, 0)
+            total_income += amount
+            income_by_category[category_name] = income_by_category.get(category_name, 0) + amount
+        if row.expense_count > 0:
+            total_expense += row.expense
+            expense_by_category[category_name] = expense_by_category.get(category_name, 0) + row.expense
+
+    return summarize_category_stats(income_by_category, expense_by_category, total_income, total_expense)
+
+
+def rebuild_category_rollup(user):
+    """Rebuild a user's category_month_rollup rows from all of their transactions; returns the row count."""
+    CategoryMonthRollup.query.filter_by(user_id=user.id).delete()
+    user.category_rollup_built = True
+    db.session.flush()
+
+    deltas = category_rollup_deltas(user.transactions)
+    apply_category_rollup(user, deltas)
+    return len(deltas)
+
+
+def backfill_category_rollups(rebuild=False):
+    """Build the category rollup of every user that lacks one (or of every user with rebuild=True).
+
+    Returns (users, rows written).
+    """
+    users = 0
+    written = 0
+
+    for _ in each_shard():
+        for user in User.query.order_by(User.id).all():
+            if rebuild or not user.category_rollup_built:
+                written += rebuild_category_rollup(user)
+                users += 1
+        db.session.commit()
+
+    return users, written
+
+
+def check_category_rollups(today=None):
+    """Compare every month's rollup report with calculate_category_stats; returns the mismatches."""
+    today = today or datetime.utcnow().date()
+    mismatches = []
+
+    def amounts(stats):
+        return {
+            (side, entry['name']): entry['amount']
+            for side in ('income_categories', 'expense_categories')
+            for entry in stats[side]
+        }
+
+    for _ in each_shard():
+        for user in User.query.filter_by(category_rollup_built=True).order_by(User.id).all():
+            months = sorted({t.start_date.replace(day=1) for t in user.transactions})
+            for month in months:
+                expected = amounts(calculate_category_stats(user, month, month_end(month)))
+                actual = amounts(read_monthly_category_stats(user, month, month_end(month), today))
+                if expected.keys() != actual.keys() or any(
+                        abs(expected[key] - actual[key]) > 0.01 for key in expected):
+                    mismatches.append({
+                        'user_id': user.id,
+                        'username': user.username,
+                        'month': month.strftime('%Y-%m'),
+                        'expected': expected,
+                        'actual': actual
+                    })
+
+    return mismatches
+
+
+def calculate_balances(user, today=None):
+    """Recalculate the balance state from scratch with exact integer sums over all of the user's transactions."""
+    today = today or datetime.utcnow().date()
+    single_balance, scheduled_balance = db.session.query(
+        money_sum(single_balance_change_sql()),
+        money_sum(db.case((single_transaction_sql(), 0), else_=scheduled_balance_change_sql(today)))
+    ).filter(Transaction.user_id == user.id).one()
+
+    initial_balance = user.initial_balance or 0.0
+    return {
+        'single_balance': single_balance,
+        'scheduled_balance': scheduled_balance,
+        'current_total_balance': round(initial_balance + single_balance, 2),
+        'long_term_balance': round(initial_balance + single_balance + scheduled_balance, 2)
+    }
+
+
+def query_user_balances(user_ids=None):
+    """Fetch both balances for the given users (or all users) in a single aggregate query per shard."""
+    balances = []
+
+    for _ in each_shard():
+        query = db.session.query(
+            User.id,
+            User.username,
+            User.current_total_balance,
+            User.long_term_balance
+        )
+        if user_ids is not None:
+            query = query.filter(User.id.in_(user_ids))
+
+        balances.extend(
+            {
+                'user_id': user_id,
+                'username': username,
+                'current_total_balance': current_total_balance,
+                'long_term_balance': long_term_balance
+            }
+            for user_id, username, current_total_balance, long_term_balance in query.order_by(User.id)
+        )
+
+    return sorted(balances, key=lambda entry: entry['user_id'])
+
+
+def reconcile_balances(fix=False):
+    """Compare every user's stored balance state with a full recalculation and report drift.
+
+    With fix=True the stored state of every user is overwritten with the recalculated values.
+    """
+    today = datetime.utcnow().date()
+    drift = []
+
+    for _ in each_shard():
+        for user in User.query.order_by(User.id).all():
+            expected = calculate_balances(user, today)
+
+            single_drift = round((user.single_balance or 0.0) - expected['single_balance'], 2)
+            scheduled_drift = 0.0
+            if user.scheduled_balance_is_valid(today):
+                scheduled_drift = round(user.scheduled_balance - expected['scheduled_balance'], 2)
+
+            if single_drift or scheduled_drift:
+                drift.append({
+                    'user_id': user.id,
+                    'username': user.username,
+                    'single_drift': single_drift,
+                    'scheduled_drift': scheduled_drift
+                })
+
+            if fix:
+                user.single_balance = expected['single_balance']
+                user.refresh_scheduled_balance(today)
+
+        if fix:
+            db.session.commit()
+
+    return drift
@@ -186,8 +186,8 @@ const categories = {
  * Transactions API
  */
 const transactions = {
-    // Get all transactions, optionally filtered
-    getAll: async (filters = {}) => {
+    // Get one page of transactions (newest first), optionally filtered
+    getPage: async (filters = {}) => {
         try {
             // Build query string from filters
             const queryParams = new URLSearchParams();
@@ -195,6 +195,9 @@ const transactions = {
             if (filters.start) queryParams.append('start', filters.start);
             if (filters.end) queryParams.append('end', filters.end);
             if (filters.category_id) queryParams.append('category_id', filters.category_id);
+            if (filters.limit) queryParams.append('limit', filters.limit);
+            if (filters.after) queryParams.append('after', filters.after);
+            if (filters.include_balances) queryParams.append('include_balances', 'true');
             
             const queryString = queryParams.toString() ? `?${queryParams.toString()}` : '';
             
@@ -446,6 +449,59 @@ const reports = {
             console.error('Get monthly category report error:', error);
             throw error;
         }
+    },
+
+    // Get the dashboard sections (all by default) in one request; days is the day capacity trend length
+    getDashboard: async (options = {}) => {
+        try {
+            const queryParams = new URLSearchParams();
+
+            if (options.sections) queryParams.append('sections', options.sections.join(','));
+            if (options.date) queryParams.append('date', options.date);
+            if (options.days) queryParams.append('days', options.days);
+
+            const queryString = queryParams.toString() ? `?${queryParams.toString()}` : '';
+
+            const response = await fetch(`${API_BASE_URL}/dashboard${queryString}`, {
+                method: 'GET',
+                headers: createHeaders()
+            });
+
+            const data = await handleResponse(response);
+
+            // Update user balances from response
+            if (data.current_total_balance !== undefined && data.long_term_balance !== undefined) {
+                auth.updateUserData({
+                    current_total_balance: data.current_total_balance,
+                    long_term_balance: data.long_term_balance
+                });
+            }
+
+            return data;
+        } catch (error) {
+            console.error('Get dashboard error:', error);
+            throw error;
+        }
+    },
+
+    // Get per-period category totals (week, month, quarter or year) for a date range in one request
+    getPeriodReport: async (startDate, endDate, granularity = 'month') => {
+        try {
+            if (!startDate || !endDate) {
+                throw new Error('Start and end dates are required');
+            }
+
+            const response = await fetch(
+                `${API_BASE_URL}/reports/periods?start=${startDate}&end=${endDate}&granularity=${granularity}`, {
+                method: 'GET',
+                headers: createHeaders()
+            });
+
+            return handleResponse(response);
+        } catch (error) {
+            console.error('Get period report error:', error);
+            throw error;
+        }
     }
 };
 
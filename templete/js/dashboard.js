@@ -79,6 +79,15 @@ function initDashboardUI() {
     }
 }
 
+/**
+ * Format a date as YYYY-MM-DD in local time
+ */
+function toLocalDateString(date) {
+    const month = String(date.getMonth() + 1).padStart(2, '0');
+    const day = String(date.getDate()).padStart(2, '0');
+    return `${date.getFullYear()}-${month}-${day}`;
+}
+
 /**
  * Load all dashboard data
  */
@@ -87,187 +96,143 @@ async function loadDashboardData() {
         // Show loading states
         document.getElementById('day-capacity').textContent = '...';
         document.getElementById('monthly-net').textContent = '...';
-        
-        // Get categories for transaction forms
-        await loadCategories();
-        
-        // Load recent transactions
-        await loadRecentTransactions();
-        
-        // Load today's day capacity
-        await loadTodayDayCapacity();
-        
-        // Load monthly net change
-        await loadMonthlyNetChange();
-        
-        // Load day capacity trend chart
-        await loadDayCapacityTrend();
-        
-        // Load category distribution charts
-        await loadCategoryCharts();
-        
+
+        // Every section comes from one request, for the user's local date
+        const rangeSelector = document.getElementById('capacity-chart-range');
+        const result = await api.reports.getDashboard({
+            date: toLocalDateString(new Date()),
+            days: rangeSelector ? rangeSelector.value : 30
+        });
+
+        renderBalances(result);
+        renderCategories(result.categories || []);
+        renderRecentTransactions(result.recent_transactions || []);
+        renderDayCapacity(result.day_capacity);
+        renderMonthlyNetChange(result.monthly_summary);
+        await renderDayCapacityTrend(result.day_capacity_trend || []);
+        renderCategoryCharts(result.monthly_categories);
+
     } catch (error) {
         console.error('Error loading dashboard data:', error);
         utils.showNotification('Error loading dashboard data', 'error');
+        document.getElementById('day-capacity').textContent = 'Error';
+        document.getElementById('monthly-net').textContent = 'Error';
     }
 }
 
 /**
- * Load categories for transaction forms
+ * Show the current and long-term balances
  */
-async function loadCategories() {
-    try {
-        const result = await api.categories.getAll();
-        categoriesData = result.categories || [];
-        
-        // Populate category dropdowns
-        const categorySelect = document.getElementById('category');
-        if (categorySelect) {
-            utils.populateSelect(
-                categorySelect,
-                categoriesData,
-                'id',
-                'name',
-                { value: '', text: 'Select a category', disabled: true, selected: true }
-            );
-        }
-    } catch (error) {
-        console.error('Error loading categories:', error);
-        utils.showNotification('Error loading categories', 'error');
+function renderBalances(result) {
+    if (result.current_total_balance !== undefined) {
+        document.getElementById('current-balance').textContent = utils.formatCurrency(result.current_total_balance);
+        document.getElementById('long-term-balance').textContent = utils.formatCurrency(result.long_term_balance);
     }
 }
 
 /**
- * Load recent transactions
+ * Populate the category dropdown of the transaction form
  */
-async function loadRecentTransactions() {
-    try {
-        // Get transactions for the last 30 days
-        const today = new Date();
-        const thirtyDaysAgo = new Date();
-        thirtyDaysAgo.setDate(today.getDate() - 30);
-        
-        const filters = {
-            start: thirtyDaysAgo.toISOString().split('T')[0],
-            end: today.toISOString().split('T')[0]
-        };
-        
-        const result = await api.transactions.getAll(filters);
-        const transactions = result.transactions || [];
-        
-        const tableBody = document.getElementById('recent-transactions-table');
-        const noTransactionsDiv = document.getElementById('no-transactions');
-        
-        if (transactions.length === 0) {
-            // Show no transactions message
-            if (tableBody) tableBody.innerHTML = '';
-            if (noTransactionsDiv) noTransactionsDiv.style.display = 'block';
-            return;
-        }
-        
-        // Hide no transactions message
-        if (noTransactionsDiv) noTransactionsDiv.style.display = 'none';
-        
-        // Sort transactions by date (newest first)
-        transactions.sort((a, b) => new Date(b.start_date) - new Date(a.start_date));
-        
-        // Get only the 5 most recent transactions
-        const recentTransactions = transactions.slice(0, 5);
+function renderCategories(categories) {
+    categoriesData = categories;
+
+    const categorySelect = document.getElementById('category');
+    if (categorySelect) {
+        utils.populateSelect(
+            categorySelect,
+            categoriesData,
+            'id',
+            'name',
+            { value: '', text: 'Select a category', disabled: true, selected: true }
+        );
+    }
+}
+
+/**
+ * Show the most recent transactions (newest first)
+ */
+function renderRecentTransactions(transactions) {
+    const tableBody = document.getElementById('recent-transactions-table');
+    const noTransactionsDiv = document.getElementById('no-transactions');
+    
+    if (transactions.length === 0) {
+        // Show no transactions message
+        if (tableBody) tableBody.innerHTML = '';
+        if (noTransactionsDiv) noTransactionsDiv.style.display = 'block';
+        return;
+    }
+    
+    // Hide no transactions message
+    if (noTransactionsDiv) noTransactionsDiv.style.display = 'none';
+    
+    // Sort transactions by date (newest first)
+    transactions.sort((a, b) => new Date(b.start_date) - new Date(a.start_date));
+    
+    // Get only the 5 most recent transactions
+    const recentTransactions = transactions.slice(0, 5);
+    
+    // Populate the table
+    if (tableBody) {
+        tableBody.innerHTML = '';
         
-        // Populate the table
-        if (tableBody) {
-            tableBody.innerHTML = '';
+        recentTransactions.forEach(transaction => {
+            const row = document.createElement('tr');
+            const amountClass = transaction.transaction_type === 'income' ? 'amount-positive' : 'amount-negative';
+            const typeClass = transaction.transaction_type === 'income' ? 'transaction-type-income' : 'transaction-type-expense';
             
-            recentTransactions.forEach(transaction => {
-                const row = document.createElement('tr');
-                const amountClass = transaction.transaction_type === 'income' ? 'amount-positive' : 'amount-negative';
-                const typeClass = transaction.transaction_type === 'income' ? 'transaction-type-income' : 'transaction-type-expense';
-                
-                // Add transaction mode indicator
-                let modeIndicator = '';
-                if (transaction.transaction_mode === 'recurring') {
-                    modeIndicator = '<i class="fas fa-sync-alt text-primary ml-1" title="Recurring Income"></i>';
-                } else if (transaction.transaction_mode === 'continuous') {
-                    modeIndicator = '<i class="fas fa-hourglass-half text-info ml-1" title="Installment Plan"></i>';
-                }
+            // Add transaction mode indicator
+            let modeIndicator = '';
+            if (transaction.transaction_mode === 'recurring') {
+                modeIndicator = '<i class="fas fa-sync-alt text-primary ml-1" title="Recurring Income"></i>';
+            } else if (transaction.transaction_mode === 'continuous') {
+                modeIndicator = '<i class="fas fa-hourglass-half text-info ml-1" title="Installment Plan"></i>';
+            }
 
-                row.innerHTML = `
-                    <td>${utils.formatDate(transaction.start_date)}</td>
-                    <td>${transaction.description} ${modeIndicator}</td>
-                    <td>${transaction.category_name || 'Uncategorized'}</td>
-                    <td><span class="transaction-type ${typeClass}">${transaction.transaction_type}</span></td>
-                    <td class="text-right"><span class="amount ${amountClass}">${utils.formatCurrency(transaction.amount)}</span></td>
-                `;
+            row.innerHTML = `
+                <td>${utils.formatDate(transaction.start_date)}</td>
+                <td>${transaction.description} ${modeIndicator}</td>
+                <td>${transaction.category_name || 'Uncategorized'}</td>
+                <td><span class="transaction-type ${typeClass}">${transaction.transaction_type}</span></td>
+                <td class="text-right"><span class="amount ${amountClass}">${utils.formatCurrency(transaction.amount)}</span></td>
+            `;
 
-                tableBody.appendChild(row);
-            });
-        }
-    } catch (error) {
-        console.error('Error loading recent transactions:', error);
-        utils.showNotification('Error loading recent transactions', 'error');
+            tableBody.appendChild(row);
+        });
     }
 }
 
 /**
- * Load today's day capacity
+ * Show today's day capacity
  */
-async function loadTodayDayCapacity() {
-    try {
-        const result = await api.reports.getDayCapacity();
-
-        const dayCapacityElement = document.getElementById('day-capacity');
-        if (dayCapacityElement) {
-            dayCapacityElement.textContent = utils.formatCurrency(result.day_capacity);
-
-            // Add color class based on value
-            dayCapacityElement.className = 'stat-card-value';
-            if (result.day_capacity > 0) {
-                dayCapacityElement.classList.add('text-success');
-            } else if (result.day_capacity < 0) {
-                dayCapacityElement.classList.add('text-danger');
-            }
-        }
-    } catch (error) {
-        console.error('Error loading day capacity:', error);
-        const dayCapacityElement = document.getElementById('day-capacity');
-        if (dayCapacityElement) {
-            dayCapacityElement.textContent = 'Error';
+function renderDayCapacity(dayCapacity) {
+    const dayCapacityElement = document.getElementById('day-capacity');
+    if (dayCapacityElement) {
+        dayCapacityElement.textContent = utils.formatCurrency(dayCapacity);
+
+        // Add color class based on value
+        dayCapacityElement.className = 'stat-card-value';
+        if (dayCapacity > 0) {
+            dayCapacityElement.classList.add('text-success');
+        } else if (dayCapacity < 0) {
+            dayCapacityElement.classList.add('text-danger');
         }
     }
 }
 
 /**
- * Load monthly net change
+ * Show the net change of the current month
  */
-async function loadMonthlyNetChange() {
-    try {
-        // Get first and last day of current month
-        const today = new Date();
-        const firstDay = new Date(today.getFullYear(), today.getMonth(), 1);
-        const lastDay = new Date(today.getFullYear(), today.getMonth() + 1, 0);
-
-        const result = await api.reports.getSummary(
-            firstDay.toISOString().split('T')[0],
-            lastDay.toISOString().split('T')[0]
-        );
-
-        const monthlyNetElement = document.getElementById('monthly-net');
-        if (monthlyNetElement) {
-            monthlyNetElement.textContent = utils.formatCurrency(result.net_change);
-
-            // Add color class based on value
-            monthlyNetElement.className = 'stat-card-value';
-            if (result.net_change > 0) {
-                monthlyNetElement.classList.add('text-success');
-            } else if (result.net_change < 0) {
-                monthlyNetElement.classList.add('text-danger');
-            }
-        }
-    } catch (error) {
-        console.error('Error loading monthly net change:', error);
-        const monthlyNetElement = document.getElementById('monthly-net');
-        if (monthlyNetElement) {
-            monthlyNetElement.textContent = 'Error';
+function renderMonthlyNetChange(summary) {
+    const monthlyNetElement = document.getElementById('monthly-net');
+    if (monthlyNetElement) {
+        monthlyNetElement.textContent = utils.formatCurrency(summary.net_change);
+
+        // Add color class based on value
+        monthlyNetElement.className = 'stat-card-value';
+        if (summary.net_change > 0) {
+            monthlyNetElement.classList.add('text-success');
+        } else if (summary.net_change < 0) {
+            monthlyNetElement.classList.add('text-danger');
         }
     }
 }
@@ -277,78 +242,13 @@ async function loadMonthlyNetChange() {
  */
 async function loadDayCapacityTrend(days = 30) {
     try {
-        // Calculate date range
-        const today = new Date();
-        const startDate = new Date();
-        startDate.setDate(today.getDate() - days);
-
-        const result = await api.reports.getSummary(
-            startDate.toISOString().split('T')[0],
-            today.toISOString().split('T')[0]
-        );
-
-        const trendData = result.day_capacity_trend || [];
-
-        // Prepare chart data
-        const labels = [];
-        const capacityData = [];
-
-        trendData.forEach(day => {
-            labels.push(utils.formatDate(day.date));
-            capacityData.push(day.day_capacity);
+        const result = await api.reports.getDashboard({
+            sections: ['day_capacity_trend'],
+            date: toLocalDateString(new Date()),
+            days: days
         });
 
-        // Get chart canvas
-        const chartCanvas = document.getElementById('day-capacity-chart');
-        if (!chartCanvas) return;
-
-        // Use the chart loader to ensure Chart.js is available
-        await window.chartReadyPromise;
-
-        // Create or update chart
-        if (dayCapacityChart) {
-            dayCapacityChart.data.labels = labels;
-            dayCapacityChart.data.datasets[0].data = capacityData;
-            dayCapacityChart.update();
-        } else {
-            // Create gradient fill
-            const ctx = chartCanvas.getContext('2d');
-            const gradient = ctx.createLinearGradient(0, 0, 0, 300);
-            gradient.addColorStop(0, 'rgba(212, 175, 55, 0.5)');
-            gradient.addColorStop(1, 'rgba(212, 175, 55, 0.0)');
-
-            // Create chart
-            dayCapacityChart = new Chart(chartCanvas, {
-                type: 'line',
-                data: {
-                    labels: labels,
-                    datasets: [{
-                        label: 'Day Capacity',
-                        data: capacityData,
-                        borderColor: '#D4AF37',
-                        backgroundColor: gradient,
-                        borderWidth: 2,
-                        pointBackgroundColor: '#D4AF37',
-                        pointBorderColor: '#ffffff',
-                        pointBorderWidth: 1,
-                        pointRadius: 3,
-                        tension: 0.3,
-                        fill: true
-                    }]
-                },
-                options: utils.createChartOptions('line', {
-                    plugins: {
-                        tooltip: {
-                            callbacks: {
-                                label: function(context) {
-                                    return utils.formatCurrency(context.parsed.y);
-                                }
-                            }
-                        }
-                    }
-                })
-            });
-        }
+        await renderDayCapacityTrend(result.day_capacity_trend || []);
     } catch (error) {
         console.error('Error loading day capacity trend:', error);
         utils.showNotification('Error loading day capacity trend chart', 'error');
@@ -356,34 +256,85 @@ async function loadDayCapacityTrend(days = 30) {
 }
 
 /**
- * Load category distribution charts
+ * Draw the day capacity trend chart
  */
-async function loadCategoryCharts() {
-    try {
-        // Get category data for current month
-        const today = new Date();
-        const firstDay = new Date(today.getFullYear(), today.getMonth(), 1);
+async function renderDayCapacityTrend(trendData) {
+    // Prepare chart data
+    const labels = [];
+    const capacityData = [];
 
-        const result = await api.reports.getMonthlyCategoryReport(
-            today.getFullYear(),
-            today.getMonth() + 1
-        );
+    trendData.forEach(day => {
+        labels.push(utils.formatDate(day.date));
+        capacityData.push(day.day_capacity);
+    });
 
-        const incomeCategories = result.income_categories || [];
-        const expenseCategories = result.expense_categories || [];
+    // Get chart canvas
+    const chartCanvas = document.getElementById('day-capacity-chart');
+    if (!chartCanvas) return;
 
-        // Load income categories chart
-        loadIncomeCategoriesChart(incomeCategories);
+    // Use the chart loader to ensure Chart.js is available
+    await window.chartReadyPromise;
 
-        // Load expense categories chart
-        loadExpenseCategoriesChart(expenseCategories);
+    // Create or update chart
+    if (dayCapacityChart) {
+        dayCapacityChart.data.labels = labels;
+        dayCapacityChart.data.datasets[0].data = capacityData;
+        dayCapacityChart.update();
+    } else {
+        // Create gradient fill
+        const ctx = chartCanvas.getContext('2d');
+        const gradient = ctx.createLinearGradient(0, 0, 0, 300);
+        gradient.addColorStop(0, 'rgba(212, 175, 55, 0.5)');
+        gradient.addColorStop(1, 'rgba(212, 175, 55, 0.0)');
 
-    } catch (error) {
-        console.error('Error loading category charts:', error);
-        utils.showNotification('Error loading category charts', 'error');
+        // Create chart
+        dayCapacityChart = new Chart(chartCanvas, {
+            type: 'line',
+            data: {
+                labels: labels,
+                datasets: [{
+                    label: 'Day Capacity',
+                    data: capacityData,
+                    borderColor: '#D4AF37',
+                    backgroundColor: gradient,
+                    borderWidth: 2,
+                    pointBackgroundColor: '#D4AF37',
+                    pointBorderColor: '#ffffff',
+                    pointBorderWidth: 1,
+                    pointRadius: 3,
+                    tension: 0.3,
+                    fill: true
+                }]
+            },
+            options: utils.createChartOptions('line', {
+                plugins: {
+                    tooltip: {
+                        callbacks: {
+                            label: function(context) {
+                                return utils.formatCurrency(context.parsed.y);
+                            }
+                        }
+                    }
+                }
+            })
+        });
     }
 }
 
+/**
+ * Show the income and expense category charts of the current month
+ */
+function renderCategoryCharts(report) {
+    const incomeCategories = report.income_categories || [];
+    const expenseCategories = report.expense_categories || [];
+
+    // Load income categories chart
+    loadIncomeCategoriesChart(incomeCategories);
+
+    // Load expense categories chart
+    loadExpenseCategoriesChart(expenseCategories);
+}
+
 /**
  * Load income categories chart
  */
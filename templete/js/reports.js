@@ -3,8 +3,9 @@
  * Handles reports interface and charts
  */
 
-// Global variable for chart
+// Global variables for charts
 let dayCapacityChart = null;
+let periodChart = null;
 
 // Global variable for data
 let summaryData = null;
@@ -40,6 +41,14 @@ function setupEventListeners() {
         });
     }
 
+    // Period report granularity
+    const granularitySelect = document.getElementById('period-granularity');
+    if (granularitySelect) {
+        granularitySelect.addEventListener('change', () => {
+            loadReportData('overview');
+        });
+    }
+
     // Date presets
     const presetButtons = document.querySelectorAll('.date-preset');
     presetButtons.forEach(button => {
@@ -146,6 +155,10 @@ function loadReportData(reportType) {
 
     // Load overview report
     loadOverviewReport(startDate, endDate);
+
+    // Load the per-period totals (e.g. the twelve months of a year) with a single request
+    const granularitySelect = document.getElementById('period-granularity');
+    loadPeriodReport(startDate, endDate, granularitySelect ? granularitySelect.value : 'month');
 }
 
 /**
@@ -264,4 +277,69 @@ function createDayCapacityChart(trendData) {
             })
         });
     }
-}
\ No newline at end of file
+}
+
+/**
+ * Load income and expense totals per period
+ */
+async function loadPeriodReport(startDate, endDate, granularity) {
+    const noData = document.getElementById('period-no-data');
+
+    try {
+        const result = await api.reports.getPeriodReport(startDate, endDate, granularity);
+        const periods = result.periods || [];
+
+        noData.style.display = periods.length ? 'none' : 'block';
+        createPeriodChart(periods);
+    } catch (error) {
+        console.error('Error loading period report:', error);
+        utils.showNotification('Error loading period report', 'error');
+        noData.style.display = 'block';
+    }
+}
+
+/**
+ * Create income/expense by period chart
+ */
+function createPeriodChart(periods) {
+    const chartCanvas = document.getElementById('period-chart');
+    if (!chartCanvas) return;
+
+    const labels = periods.map(period => period.period);
+    const incomeData = periods.map(period => period.total_income);
+    const expenseData = periods.map(period => period.total_expense);
+
+    if (periodChart) {
+        periodChart.data.labels = labels;
+        periodChart.data.datasets[0].data = incomeData;
+        periodChart.data.datasets[1].data = expenseData;
+        periodChart.update();
+    } else {
+        periodChart = new Chart(chartCanvas, {
+            type: 'bar',
+            data: {
+                labels: labels,
+                datasets: [{
+                    label: 'Income',
+                    data: incomeData,
+                    backgroundColor: 'rgba(40, 167, 69, 0.7)'
+                }, {
+                    label: 'Expenses',
+                    data: expenseData,
+                    backgroundColor: 'rgba(220, 53, 69, 0.7)'
+                }]
+            },
+            options: utils.createChartOptions('bar', {
+                plugins: {
+                    tooltip: {
+                        callbacks: {
+                            label: function(context) {
+                                return `${context.dataset.label}: ${utils.formatCurrency(context.parsed.y)}`;
+                            }
+                        }
+                    }
+                }
+            })
+        });
+    }
+}
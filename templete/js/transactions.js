@@ -3,10 +3,15 @@
  * Handles transaction listing and filtering
  */
 
+// Transactions fetched per page (newest first); older pages load on demand
+const TRANSACTIONS_PAGE_SIZE = 50;
+
 // Global variables
 let categoriesData = [];
 let allTransactions = [];
 let filteredTransactions = [];
+let currentFilters = {};
+let nextCursor = null;
 
 /**
  * Initialize transactions page
@@ -55,6 +60,12 @@ function setupEventListeners() {
         clearFiltersBtn.addEventListener('click', resetFilters);
     }
 
+    // Load more button
+    const loadMoreBtn = document.getElementById('load-more-btn');
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', loadMoreTransactions);
+    }
+
     // Sort dropdown
     const sortSelect = document.getElementById('sort-by');
     if (sortSelect) {
@@ -108,7 +119,7 @@ async function loadCategories() {
 }
 
 /**
- * Load transactions based on current filters
+ * Load the first page of transactions based on current filters
  */
 async function loadTransactions() {
     try {
@@ -138,9 +149,16 @@ async function loadTransactions() {
             filters.category_id = categoryFilter.value;
         }
 
-        // Get transactions from API
-        const result = await api.transactions.getAll(filters);
+        // Get the first page from the API; older pages are fetched with the load more button
+        currentFilters = filters;
+        const result = await api.transactions.getPage({
+            ...filters,
+            limit: TRANSACTIONS_PAGE_SIZE,
+            include_balances: true
+        });
         allTransactions = result.transactions || [];
+        nextCursor = result.next_cursor || null;
+        updateLoadMoreButton();
 
         // Apply any additional client-side filters
         applyFilters();
@@ -151,6 +169,8 @@ async function loadTransactions() {
     } catch (error) {
         console.error('Error loading transactions:', error);
         utils.showNotification('Error loading transactions', 'error');
+        nextCursor = null;
+        updateLoadMoreButton();
 
         // Hide loading state
         const loadingDiv = document.getElementById('transactions-loading');
@@ -162,6 +182,43 @@ async function loadTransactions() {
     }
 }
 
+/**
+ * Load the next page of transactions and append it to the list
+ */
+async function loadMoreTransactions() {
+    if (!nextCursor) return;
+
+    const loadMoreBtn = document.getElementById('load-more-btn');
+    if (loadMoreBtn) loadMoreBtn.disabled = true;
+
+    try {
+        const result = await api.transactions.getPage({
+            ...currentFilters,
+            limit: TRANSACTIONS_PAGE_SIZE,
+            after: nextCursor
+        });
+        allTransactions = allTransactions.concat(result.transactions || []);
+        nextCursor = result.next_cursor || null;
+        applyFilters();
+    } catch (error) {
+        console.error('Error loading more transactions:', error);
+        utils.showNotification('Error loading transactions', 'error');
+    } finally {
+        if (loadMoreBtn) loadMoreBtn.disabled = false;
+        updateLoadMoreButton();
+    }
+}
+
+/**
+ * Show the load more button while older transactions remain
+ */
+function updateLoadMoreButton() {
+    const loadMoreBtn = document.getElementById('load-more-btn');
+    if (loadMoreBtn) {
+        loadMoreBtn.style.display = nextCursor ? 'inline-block' : 'none';
+    }
+}
+
 /**
  * Apply filters to transactions
  */